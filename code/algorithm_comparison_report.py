@@ -4,11 +4,18 @@ from __future__ import division
 from collections import defaultdict
 from os import linesep
 
+import numpy as np
+
 from downward.reports import PlanningReport
 
+from custom_report import CustomReport
+from merged_data import algorithm_key
+import bootstrap
+
 """
 Comparison map format:
-    left_alg and right_alg: algorithms to compare
+    left_alg and right_alg: algorithms to compare, (experiment, algorithm)
+        tuples are allowed for merged data
     min_improvement, quantile: replace parameter if present
 """
 def _make_comparison_map(comp):
@@ -17,6 +24,8 @@ def _make_comparison_map(comp):
             raise ValueError("Comparison has no first algorithm")
         if not "right_alg" in comp:
             raise ValueError("Comparison has no second algorithm")
+        comp = dict(comp, left_alg=algorithm_key(comp["left_alg"]),
+            right_alg=algorithm_key(comp["right_alg"]))
         if comp["left_alg"] == comp["right_alg"]:
             raise ValueError("Cannot compare algorithm to itself")
         return comp
@@ -24,16 +33,21 @@ def _make_comparison_map(comp):
         # accept a tuple of algorithm names
         if comp[0] == comp[1]:
             raise ValueError("Cannot compare algorithm to itself")
-        result = {"left_alg": comp[0], "right_alg": comp[1]}
+        result = {"left_alg": algorithm_key(comp[0]), "right_alg": algorithm_key(comp[1])}
         return result
 
-class AlgorithmComparisonReport(PlanningReport):
+class AlgorithmComparisonReport(CustomReport, PlanningReport):
     """
     Creates a TeX file comparing a number of algorithm pairs.
+
+    If *bootstrap* is positive, a bootstrap confidence interval (with
+    that many resamples) of the difference between the two win rates is
+    added for each comparison; intervals excluding 0 are set in bold.
     """
-    def __init__(self, comparison, min_improvement=0, quantile=0.5, **kwargs):
+    def __init__(self, comparison, min_improvement=0, quantile=0.5,
+            bootstrap=0, confidence=0.95, seed=0, **kwargs):
         kwargs["format"] = "tex"
-        PlanningReport.__init__(self, **kwargs)
+        super(AlgorithmComparisonReport, self).__init__(**kwargs)
         if len(self.attributes) != 1:
             raise ValueError("Report needs exactly one attribute")
         if len(comparison) == 0:
@@ -42,8 +56,20 @@ class AlgorithmComparisonReport(PlanningReport):
         self.attribute = self.attributes[0]
         self.min_improvement = min_improvement
         self.quantile = quantile
+        self.bootstrap = bootstrap
+        self.confidence = confidence
+        self.seed = seed
     
-    def _format_row(self, name, row):
+    def _format_interval(self, interval):
+        lower, upper = interval
+        if np.isnan(lower):
+            return ""
+        cell = "[{:.2f}, {:.2f}]".format(lower, upper)
+        if bootstrap.is_significant(lower, upper):
+            cell = r"\textbf{%s}" % cell
+        return cell
+    
+    def _format_row(self, name, row, intervals=None):
         line = [r"\textbf{%s}" % name.replace("_", r"{\_}")]
         for (iComp, curr) in row.items():
             if curr[2] > 0:
@@ -62,20 +88,44 @@ class AlgorithmComparisonReport(PlanningReport):
                         right = r"\textcolor{{green!{1}!blue}}{{{0}}}".format(right, int(100 * right_win))
                     line.append("%s %s" % (left, right))
                 else:
-                    line.append("{0:.2f} {0:.2f}".format(left_win, right_win))
+                    line.append("{0:.2f} {1:.2f}".format(left_win, right_win))
+                if self.bootstrap:
+                    line.append(self._format_interval(intervals[iComp]))
             else:
                 # no data => no output
                 line.append("")
                 line.append("")
                 line.append("")
+                if self.bootstrap:
+                    line.append("")
         return " & ".join(line)
     
+    def _get_intervals(self, outcomes):
+        """
+        Compute the confidence intervals of the win rate difference of
+        all comparisons at once. *outcomes* maps each task to a dict from
+        comparison ids to -1, 0 or 1 (right better, tie, left better).
+        """
+        comp_ids = list(self.comparison.keys())
+        diffs = np.zeros((len(outcomes), len(comp_ids)))
+        mask = np.zeros(diffs.shape, dtype=bool)
+        for i, outcome in enumerate(outcomes):
+            for j, iComp in enumerate(comp_ids):
+                if iComp in outcome:
+                    diffs[i, j] = outcome[iComp]
+                    mask[i, j] = True
+        lower, upper = bootstrap.confidence_interval(diffs, mask,
+            self.bootstrap, self.confidence, self.seed)
+        return {iComp: (lower[j], upper[j]) for j, iComp in enumerate(comp_ids)}
+    
     def get_text(self):
         return self.get_markup()
     
     def get_markup(self):
         # cannot use Table() because we have duplicate columns (by name, not their contents)
         results = defaultdict(dict)
+        # per-task outcomes for the bootstrap, indexed by domain and problem
+        outcomes = defaultdict(lambda: defaultdict(dict))
         for domain in self.domains:
             for comp in self.comparison.values():
                 curr = [0, 0, 0]
@@ -86,34 +136,47 @@ class AlgorithmComparisonReport(PlanningReport):
                     if self.attribute in run and run["problem"] in other_runs:
                         left_val, right_val = run[self.attribute], other_runs[run["problem"]][self.attribute]
                         curr[2] += 1
+                        outcome = 0
                         if left_val != right_val:
                             improvement = (left_val - right_val) / max(left_val, right_val)
                             if improvement > min_improvement:
                                 curr[0] += 1
+                                outcome = 1
                             if -improvement > min_improvement:
                                 curr[1] += 1
+                                outcome = -1
+                        outcomes[domain][run["problem"]][id(comp)] = outcome
                 results[domain][id(comp)] = curr
         # aggregate over all domains
         total = {id(comp): tuple(sum(x) for x in zip(*(row[id(comp)] for row in results.values())))
             for comp in self.comparison.values()}
+        intervals = defaultdict(lambda: None)
+        if self.bootstrap:
+            for domain, problems in outcomes.items():
+                intervals[domain] = self._get_intervals(list(problems.values()))
+            intervals["Total"] = self._get_intervals(
+                [outcome for problems in outcomes.values() for outcome in problems.values()])
         
         # generate output
         lines = []
-        lines.append(r"\begin{center}\begin{tabular}{@{}l" + "|ccc" * len(self.comparison) + "@{}}")
+        columns = "|cccc" if self.bootstrap else "|ccc"
+        lines.append(r"\begin{center}\begin{tabular}{@{}l" + columns * len(self.comparison) + "@{}}")
         # emit header
         line = [""]
         for comp in self.comparison.values():
             line.append(r"\textbf{%s}" % comp["left_alg"].replace("_", r"{\_}"))
             line.append(r"\textbf{%s}" % comp["right_alg"].replace("_", r"{\_}"))
             line.append(r"\textbf{win balance}")
+            if self.bootstrap:
+                line.append(r"\textbf{{{:.0f}\% CI}}".format(100 * self.confidence))
         lines.append(" & ".join(line) + r"\\")
         # emit by-domain info
         lines.append(r"\midrule")
         for (domain, row) in results.items():
             if any(map(lambda curr: curr[2] > 0, row.values())):
-                lines.append(self._format_row(domain, row) + r"\\")
+                lines.append(self._format_row(domain, row, intervals[domain]) + r"\\")
         # emit totals
         lines.append(r"\midrule")
-        lines.append(self._format_row("Total", total))
+        lines.append(self._format_row("Total", total, intervals["Total"]))
         lines.append(r"\end{tabular}\end{center}")
         return linesep.join(lines)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from merged_data import algorithm_key
+from series_tools import pack_series, resample, summarize
+
+# progress attributes written by progress-parser.py
+SERIES = {"expanded": "progress_expanded", "memory": "progress_memory"}
+
+class AnytimeReport(CustomReport, PlanningReport):
+    """
+    Creates a CSV with curves over time for every algorithm: the number
+    of solved runs up to each point in time (coverage) and the mean and
+    quantiles of the expansions and memory of the progress lines.
+
+    Solve times come from *time_attribute*, or from the last progress
+    line if a solved run lacks it. Coverage is counted by binning all
+    solve times with NumPy. The time grid has *num_points* points,
+    logarithmically spaced unless *log_time* is False. After its last
+    progress line, a run keeps its final expansions and memory while it
+    is solved, and no longer contributes otherwise.
+
+    For algorithms run with several seeds, a task counts with the
+    fraction of seeds that solved it (see seeds.aggregate_seeds) at the
+    mean solve time of these seeds. Its progress lines come from the
+    smallest seed's run, so they only hold their final values if all
+    seeds solved the task.
+    """
+    def __init__(self, algorithms=None, series=("expanded", "memory"), time_attribute="total_time",
+            quantiles=(0.5,), num_points=100, log_time=True, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "txt"
+        elif kwargs["format"] != "txt":
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        for name in series:
+            if name not in SERIES:
+                raise ValueError("unknown series: {}".format(name))
+        kwargs["attributes"] = ["coverage", time_attribute, "progress_time"] + [SERIES[name] for name in series]
+        super(AnytimeReport, self).__init__(**kwargs)
+        if num_points < 2:
+            raise ValueError("Grid needs at least two points")
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.series = list(series)
+        self.time_attribute = time_attribute
+        self.quantiles = list(quantiles)
+        self.num_points = num_points
+        self.log_time = log_time
+
+    def _solve_time(self, run):
+        if not run.get("coverage"):
+            return None
+        time = run.get(self.time_attribute)
+        if time is None and run.get("progress_time"):
+            time = run["progress_time"][-1]
+        return time
+
+    def _collect(self, algorithms):
+        """
+        Return dicts from algorithms to lists of (solve time, coverage)
+        pairs and to lists of runs with progress lines.
+        """
+        wanted = set(algorithms)
+        solve_times, progress = defaultdict(list), defaultdict(list)
+        for run in self.props.values():
+            if run["algorithm"] not in wanted:
+                continue
+            time = self._solve_time(run)
+            if time is not None:
+                solve_times[run["algorithm"]].append((time, run["coverage"]))
+            if run.get("progress_time"):
+                progress[run["algorithm"]].append(run)
+        return solve_times, progress
+
+    def _make_grid(self, solve_times, progress):
+        times = [t for values in solve_times.values() for t, _ in values]
+        times += [run["progress_time"][-1] for runs in progress.values() for run in runs]
+        positive = [t for t in times if t > 0]
+        if not positive:
+            return np.linspace(0, 1, self.num_points)
+        if self.log_time:
+            low = max(min(positive), 1e-3)
+            return np.logspace(np.log10(low), np.log10(max(max(positive), 2 * low)), self.num_points)
+        return np.linspace(0, max(positive), self.num_points)
+
+    def _coverage(self, solves, grid):
+        """Coverage of the (solve time, coverage) pairs with solve times <= each grid point."""
+        # bin edges just above the grid points, so a run solved exactly at a grid point counts
+        edges = np.concatenate([[-np.inf], np.nextafter(grid, np.inf)])
+        solves = np.asarray(solves, dtype=float).reshape(-1, 2)
+        counts, _ = np.histogram(solves[:, 0], bins=edges, weights=solves[:, 1])
+        return np.cumsum(counts)
+
+    def _curves(self, runs, grid):
+        x, _, offsets = pack_series([(run["progress_time"], run["progress_time"]) for run in runs])
+        # aggregated seeds take the series from one seed, which need not have solved the task
+        solved = np.array([run.get("coverage") == 1 for run in runs])
+        columns = []
+        for name in self.series:
+            y = np.concatenate([np.asarray(run[SERIES[name]], dtype=float) for run in runs])
+            # solved runs keep their final value, unsolved runs stop contributing
+            values = resample(x, y, offsets, grid, hold_last=True)
+            running = resample(x, y, offsets, grid, hold_last=False)
+            values[~solved] = running[~solved]
+            _, mean, quantiles = summarize(values, self.quantiles)
+            columns.append((name + "_mean", mean))
+            for q, row in zip(self.quantiles, quantiles):
+                columns.append(("{}_q{:g}".format(name, 100 * q), row))
+        return columns
+
+    def _format_value(self, value):
+        return "" if np.isnan(value) else "{:g}".format(value)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            solve_times, progress = self._collect(algorithms)
+        if not solve_times and not progress:
+            return ""
+        grid = self._make_grid(solve_times, progress)
+        header, columns = ["time"], [grid]
+        with self.phase("resample"):
+            for algorithm in algorithms:
+                header.append(algorithm + "_coverage")
+                columns.append(self._coverage(solve_times[algorithm], grid))
+                if progress[algorithm]:
+                    for name, values in self._curves(progress[algorithm], grid):
+                        header.append(algorithm + "_" + name)
+                        columns.append(values)
+        lines = [",".join(header)]
+        for row in np.column_stack(columns):
+            lines.append(",".join(self._format_value(value) for value in row))
+        return "\n".join(lines)
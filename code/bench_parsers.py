@@ -0,0 +1,198 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the custom log parsers on synthetic Fast Downward/CEGAR logs.
+
+Every parser is run the same way lab runs it: as a separate process in
+a run directory containing run.log and properties. We report wall time,
+throughput and peak RSS per parser and for the combined pipeline, and
+exit with status 1 if a result regresses against the stored baseline.
+
+    ./bench_parsers.py --sizes 1 10 50
+    ./bench_parsers.py --update-baseline
+"""
+from __future__ import division, print_function
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from lab import tools
+
+import benchmark_tools
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+PARSERS = ["start-parser.py", "average-split-parser.py",
+    "split-time-parser.py", "heuristic-stats-parser.py", "progress-parser.py",
+    "memory-parser.py"]
+DEFAULT_BASELINE = os.path.join(DIR, "bench_parsers_baseline.json")
+
+HEADER = """\
+INFO     Running translator.
+Translator variables: {variables}
+Translator facts: {facts}
+Translator operators: {operators}
+INFO     Running search (release).
+reading input... [t=0.01s]
+Building successor generator...done! [t=0.02s]
+Initializing CEGAR heuristic...
+Start building abstraction.
+Maximum number of states: 10000
+"""
+
+FOOTER = """\
+Reached maximum number of states.
+Done building abstraction.
+Average number of possible splits: {split_options:.4f}
+Average number of distinct ratings: {distinct_rated:.4f}
+Time for picking split: {split_time:.4f}s
+Time for building abstraction: {build_time:.4f}s
+Initial heuristic value for cegar: {initial_h}
+[g=0, 1 evaluated, 0 expanded, t={start_time:.2f}s, {start_memory} KB]
+f = {initial_h} [1 evaluated, 0 expanded, t={start_time:.2f}s, {start_memory} KB]
+"""
+
+TRAILER = """\
+Solution found!
+Actual search time: {search_time:.2f}s [t={total_time:.2f}s]
+Plan length: {g} step(s).
+Plan cost: {g}
+Expanded until last jump: {expanded}
+Expanded {expanded} state(s).
+Evaluated {evaluated} state(s).
+Search time: {search_time:.2f}s
+Total time: {total_time:.2f}s
+Solution found.
+Peak memory: {memory} KB
+"""
+
+
+def generate_log(path, size_mb, seed=0):
+    """
+    Write a synthetic run.log of roughly *size_mb* megabytes. The bulk
+    consists of interleaved refinement statistics and search progress
+    lines in the proportions we see in real CEGAR runs.
+    """
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+    with open(path, "w") as f:
+        def write(text):
+            f.write(text)
+            return len(text)
+        written += write(HEADER.format(variables=rng.randint(10, 200),
+            facts=rng.randint(50, 2000), operators=rng.randint(100, 20000)))
+        states, h_value = 1, 0.0
+        body_target = target // 2
+        while written < body_target:
+            states += 1
+            h_value += rng.random() * 0.1
+            written += write("Best heuristic value (N = {}): {:.6f} ({} distinct)\n".format(
+                states, h_value, rng.randint(1, 20)))
+            if states % 10 == 0:
+                written += write("Time for picking split: {:.6f}s\n".format(rng.random() * 1e-3))
+        written += write(FOOTER.format(split_options=rng.random() * 10,
+            distinct_rated=rng.random() * 5, split_time=rng.random() * 10,
+            build_time=rng.random() * 100, initial_h=int(h_value),
+            start_time=rng.random() * 100, start_memory=rng.randint(10000, 500000)))
+        g, evaluated, expanded, t, memory = 0, 1, 0, 0.0, 50000
+        while written < target:
+            g += 1
+            step = rng.randint(1, 1000)
+            expanded += step
+            evaluated += rng.randint(step, 3 * step)
+            t += rng.random()
+            memory += rng.randint(0, 200)
+            written += write("New best heuristic value for cegar: {}\n".format(rng.randint(0, 100)))
+            written += write("[g={}, {} evaluated, {} expanded, t={:.2f}s, {} KB]\n".format(
+                g, evaluated, expanded, t, memory))
+        write(TRAILER.format(search_time=t, total_time=t + 1, g=g,
+            expanded=expanded, evaluated=evaluated, memory=memory))
+
+
+def _make_run_dir(log_path):
+    run_dir = tempfile.mkdtemp(prefix="bench-run-")
+    shutil.copy(log_path, os.path.join(run_dir, "run.log"))
+    with open(os.path.join(run_dir, "properties"), "w") as f:
+        json.dump({}, f)
+    return run_dir
+
+
+def benchmark(log_path, parsers, repeat):
+    """
+    Return (best wall time, peak RSS) of running *parsers* one after
+    another on a fresh copy of *log_path*.
+    """
+    python = tools.get_python_executable()
+    best_time, peak_rss = float("inf"), 0
+    for _ in range(repeat):
+        run_dir = _make_run_dir(log_path)
+        try:
+            total = 0.0
+            for parser in parsers:
+                wall, rss = benchmark_tools.run_timed(
+                    [python, os.path.join(DIR, parser)], cwd=run_dir)
+                total += wall
+                peak_rss = max(peak_rss, rss)
+        finally:
+            shutil.rmtree(run_dir)
+        best_time = min(best_time, total)
+    return best_time, peak_rss
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--sizes", type=float, nargs="+", default=[1, 10],
+        help="sizes of the synthetic logs in MB (default: %(default)s)")
+    argparser.add_argument("--repeat", type=int, default=3,
+        help="runs per measurement, the fastest one counts (default: %(default)s)")
+    argparser.add_argument("--baseline", default=DEFAULT_BASELINE,
+        help="baseline file (default: %(default)s)")
+    argparser.add_argument("--tolerance", type=float, default=0.25,
+        help="allowed relative slowdown before failing (default: %(default)s)")
+    argparser.add_argument("--update-baseline", action="store_true",
+        help="store the results as new baseline instead of comparing")
+    args = argparser.parse_args()
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        # timings depend on the machine, so there is no committed baseline
+        print("No baseline at {}, create one with --update-baseline".format(args.baseline),
+            file=sys.stderr)
+        return 2
+
+    results = {}
+    log_dir = tempfile.mkdtemp(prefix="bench-logs-")
+    try:
+        print("{:<28} {:>8} {:>10} {:>10} {:>12}".format(
+            "parser", "MB", "time [s]", "MB/s", "peak RSS [KB]"))
+        for size in args.sizes:
+            log_path = os.path.join(log_dir, "run-{}.log".format(size))
+            generate_log(log_path, size)
+            actual_mb = os.path.getsize(log_path) / (1024 * 1024)
+            benchmarks = [(parser, [parser]) for parser in PARSERS]
+            benchmarks.append(("pipeline", PARSERS))
+            for name, parsers in benchmarks:
+                wall, rss = benchmark(log_path, parsers, args.repeat)
+                print("{:<28} {:>8.1f} {:>10.3f} {:>10.2f} {:>12}".format(
+                    name, actual_mb, wall, actual_mb / wall, rss))
+                results["{}@{}MB".format(name, size)] = {"time": wall, "peak_rss": rss}
+    finally:
+        shutil.rmtree(log_dir)
+
+    if args.update_baseline:
+        benchmark_tools.write_baseline(args.baseline, results)
+        print("Wrote baseline to {}".format(args.baseline))
+        return 0
+    regressions = benchmark_tools.find_regressions(
+        results, benchmark_tools.load_baseline(args.baseline), args.tolerance)
+    for regression in regressions:
+        print("REGRESSION: " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
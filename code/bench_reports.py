@@ -0,0 +1,239 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the custom reports on synthetic lab properties.
+
+For every scale factor we write a properties file with the requested
+number of domains, problems and algorithms, run every report on it and
+record wall time and peak (Python heap) memory. The resulting scaling
+curves are written as CSV, and reports whose time grows clearly faster
+than the number of runs are flagged as superlinear.
+
+    ./bench_reports.py --algorithms 15 --scales 1 2 4 8
+    ./bench_reports.py --algorithms 50 --problems 20 --scales 1 2 4 --out curves.csv
+"""
+from __future__ import division, print_function
+
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from domain_groups import DOMAIN_RENAMINGS, DOMAIN_GROUPING
+from per_task_comparison import PerTaskComparison
+from relativescatter import RelativeScatterPlotReport
+from histogram_report import HistogramReport
+from best_tabular import BestTabularReport
+from algorithm_comparison_report import AlgorithmComparisonReport
+from domain_comparison_report import (DomainComparisonReport, OptimalStrategyEvaluator,
+        IdealProblemsEvaluator, AttributeStatisticsEvaluator)
+from h_stats_report import HeuristicStatisticsReport
+from custom_report import FORCE_ENV
+
+# slope of log(time) over log(runs) above which a report counts as superlinear
+SUPERLINEAR_SLOPE = 1.2
+
+
+def generate_properties(path, domains, problems, algorithms, missing_rate,
+        h_stats_length, seed=0):
+    """
+    Write a lab properties file with one run per (domain, problem,
+    algorithm). Each attribute is missing with probability
+    *missing_rate*, unsolved runs lack all search attributes.
+    """
+    rng = random.Random(seed)
+    domain_names = sorted(DOMAIN_RENAMINGS)[:domains]
+    algorithm_names = ["alg{:02d}".format(i) for i in range(algorithms)]
+    props = {}
+    for domain in domain_names:
+        for index in range(problems):
+            problem = "p{:03d}.pddl".format(index + 1)
+            task = {
+                "domain": domain,
+                "problem": problem,
+                "translator_operators": rng.randint(10, 100000),
+                "translator_variables": rng.randint(5, 500),
+                "translator_facts": rng.randint(10, 5000),
+            }
+            difficulty = rng.lognormvariate(8, 3)
+            for algorithm in algorithm_names:
+                run = dict(task)
+                run_id = [algorithm, domain, problem]
+                run.update({"id": run_id, "algorithm": algorithm,
+                    "run_dir": "runs-00001-00100/{:05d}".format(len(props) + 1)})
+                solved = rng.random() > missing_rate
+                run["coverage"] = int(solved)
+                if solved:
+                    values = {
+                        "expansions_until_last_jump": int(difficulty * rng.uniform(0.5, 2)),
+                        "initial_h_value": rng.randint(0, 100),
+                        "search_start_time": rng.uniform(0.01, 100),
+                        "search_start_memory": rng.randint(10000, 2000000),
+                        "split_time": rng.uniform(0, 10),
+                        "average_split_options": rng.uniform(1, 10),
+                        "average_distinct_rated": rng.uniform(1, 5),
+                    }
+                    for attribute, value in values.items():
+                        if rng.random() >= missing_rate:
+                            run[attribute] = value
+                    h_value = 0.0
+                    statistics = []
+                    for n in range(1, h_stats_length + 1):
+                        h_value += rng.random()
+                        statistics.append([n, h_value, rng.randint(1, 20)])
+                    run["h_split_statistics"] = statistics
+                else:
+                    run["error"] = "search-out-of-memory"
+                props["-".join(run_id)] = run
+    with open(path, "w") as f:
+        json.dump(props, f)
+    return algorithm_names, len(props)
+
+
+def make_reports(algorithms):
+    """Return (name, report factory, outfile name) for every report under test."""
+    first, second = algorithms[0], algorithms[1 % len(algorithms)]
+    comparisons = [(first, alg) for alg in algorithms[1:]] or [(first, second)]
+    return [
+        ("PerTaskComparison", lambda: PerTaskComparison(
+            sort=True, attributes=["expansions_until_last_jump"]), "task_comparison.html"),
+        ("DomainComparisonReport-optimal", lambda: DomainComparisonReport(
+            algorithms, OptimalStrategyEvaluator(optimum_bound=0.05),
+            attributes=["expansions_until_last_jump"], format="tex", group_by=DOMAIN_GROUPING),
+            "optimality_comparison.tex"),
+        ("DomainComparisonReport-ideal", lambda: DomainComparisonReport(
+            algorithms, IdealProblemsEvaluator("expansions_until_last_jump"),
+            attributes=["expansions_until_last_jump", "translator_operators",
+                "translator_variables", "translator_facts"],
+            format="txt", group_by=DOMAIN_GROUPING), "problem_statistics.csv"),
+        ("DomainComparisonReport-statistics", lambda: DomainComparisonReport(
+            algorithms, AttributeStatisticsEvaluator(),
+            attributes=["average_split_options", "average_distinct_rated"],
+            format="tex", group_by=DOMAIN_GROUPING), "attribute_statistics.tex"),
+        ("AlgorithmComparisonReport", lambda: AlgorithmComparisonReport(
+            comparisons, attributes=["expansions_until_last_jump"]), "algorithm_comparison.tex"),
+        ("HistogramReport", lambda: HistogramReport(
+            attributes=["average_split_options"], group_by=DOMAIN_GROUPING), "hist.csv"),
+        ("BestTabularReport", lambda: BestTabularReport(
+            10, total=True, attributes=["coverage"]), "best_coverage.tex"),
+        ("HeuristicStatisticsReport", lambda: HeuristicStatisticsReport(
+            first, n_best=5, n_worst=0), "h-best.csv"),
+        ("RelativeScatterPlotReport", lambda: RelativeScatterPlotReport(
+            attributes=["expansions_until_last_jump"], filter_algorithm=[first, second],
+            xlim_left=1e-1, ylim_bottom=1e-4, ylim_top=1e4), "scatter.png"),
+    ]
+
+
+def measure(factory, eval_dir, outfile):
+    """
+    Return (wall time, peak memory in KB) of creating and running a
+    report. Tracing slows down allocations, so the time comes from an
+    untraced run and the memory from a second, traced one.
+    """
+    gc.collect()
+    start = time.time()
+    factory()(eval_dir, outfile)
+    wall = time.time() - start
+    peak = 0
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            factory()(eval_dir, outfile)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return wall, peak // 1024
+
+
+def scaling_slope(points):
+    """Least-squares slope of log(time) over log(runs)."""
+    points = [(math.log(n), math.log(t)) for n, t in points if n > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--domains", type=int, default=40,
+        help="number of domains (default: %(default)s)")
+    argparser.add_argument("--problems", type=int, default=10,
+        help="problems per domain at scale 1 (default: %(default)s)")
+    argparser.add_argument("--algorithms", type=int, default=15,
+        help="number of algorithms (default: %(default)s)")
+    argparser.add_argument("--missing-rate", type=float, default=0.2,
+        help="probability of an unsolved run or missing attribute (default: %(default)s)")
+    argparser.add_argument("--h-stats-length", type=int, default=100,
+        help="entries of h_split_statistics per run (default: %(default)s)")
+    argparser.add_argument("--scales", type=float, nargs="+", default=[1, 2, 4],
+        help="multipliers for the number of problems (default: %(default)s)")
+    argparser.add_argument("--reports", nargs="+",
+        help="only run reports whose name starts with one of these prefixes")
+    argparser.add_argument("--out", default="bench_reports.csv",
+        help="CSV file for the scaling curves (default: %(default)s)")
+    args = argparser.parse_args()
+    # every report runs twice per scale, don't let the second run be skipped
+    os.environ[FORCE_ENV] = "1"
+
+    curves = []
+    work_dir = tempfile.mkdtemp(prefix="bench-reports-")
+    try:
+        for scale in args.scales:
+            eval_dir = os.path.join(work_dir, "scale-{}".format(scale))
+            os.makedirs(eval_dir)
+            problems = max(1, int(round(args.problems * scale)))
+            algorithms, num_runs = generate_properties(
+                os.path.join(eval_dir, "properties"), args.domains, problems,
+                args.algorithms, args.missing_rate, args.h_stats_length)
+            print("Scale {}: {} runs".format(scale, num_runs))
+            for name, factory, outfile in make_reports(algorithms):
+                if args.reports and not any(name.startswith(p) for p in args.reports):
+                    continue
+                try:
+                    wall, peak = measure(factory, eval_dir, os.path.join(eval_dir, outfile))
+                except Exception:
+                    print("  {:<36} failed:".format(name))
+                    traceback.print_exc()
+                    continue
+                print("  {:<36} {:>9.3f}s {:>10} KB".format(name, wall, peak))
+                curves.append((name, scale, num_runs, wall, peak))
+    finally:
+        shutil.rmtree(work_dir)
+
+    with open(args.out, "w") as f:
+        f.write("report,scale,runs,time,peak_memory_kb\n")
+        for name, scale, runs, wall, peak in curves:
+            f.write("{},{},{},{:.6f},{}\n".format(name, scale, runs, wall, peak))
+    print("Wrote scaling curves to {}".format(args.out))
+
+    print("\nScaling exponents (time ~ runs^k):")
+    for name in sorted(set(curve[0] for curve in curves)):
+        slope = scaling_slope([(runs, wall) for n, _, runs, wall, _ in curves if n == name])
+        if slope is None:
+            continue
+        flag = "  SUPERLINEAR" if slope > SUPERLINEAR_SLOPE else ""
+        print("  {:<36} k = {:.2f}{}".format(name, slope, flag))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
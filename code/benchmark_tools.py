@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by the benchmark scripts: timing of subprocesses with
+their peak memory, and comparison of results against a stored baseline.
+"""
+from __future__ import division
+
+import json
+import os
+import subprocess
+import time
+
+
+def run_timed(command, cwd=None):
+    """
+    Run *command* and return (wall time in seconds, peak RSS in KB).
+    Raises subprocess.CalledProcessError if the command fails.
+    """
+    with open(os.devnull, "w") as devnull:
+        start = time.time()
+        process = subprocess.Popen(command, cwd=cwd, stdout=devnull)
+        # wait4 gives us the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.time() - start
+    if status != 0:
+        returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        raise subprocess.CalledProcessError(returncode, command)
+    # ru_maxrss is reported in KB on Linux
+    return wall, usage.ru_maxrss
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compare *results* against *baseline*. Both map benchmark names to
+    dicts of metrics where lower is better (e.g. "time", "peak_rss").
+    Returns a list of human readable regression messages.
+    """
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric, value in sorted(metrics.items()):
+            expected = reference.get(metric)
+            if expected and value > expected * (1 + tolerance):
+                regressions.append("{} {}: {:.3f} > {:.3f} (+{:.0%})".format(
+                    name, metric, value, expected, value / expected - 1))
+    return regressions
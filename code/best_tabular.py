@@ -1,54 +1,126 @@
 # -*- coding: utf-8 -*-
+from __future__ import division
 
 from collections import defaultdict
 
+import numpy as np
+
 from downward.reports import PlanningReport
 
-class BestTabularReport(PlanningReport):
+from custom_report import CustomReport
+from domain_groups import make_group_key
+
+AGGREGATIONS = {"sum": np.sum, "mean": np.mean, "median": np.median}
+
+class BestTabularReport(CustomReport, PlanningReport):
     """
-    Creates a CSV containing a histogram of a specific attribute.
-    This file can then be used via PGFPlots to create an image.
+    Creates a TeX table per attribute with the *nbest* domains and the
+    aggregated value of every algorithm on them.
+
+    Values are aggregated per domain (or group, see
+    domain_groups.make_group_key) by *aggregation* ("sum", "mean" or
+    "median"). Missing values are skipped, unless *missing* gives a value
+    to use instead. Domains are sorted by their average value per task
+    (*sort*="total") or by the spread between the best and the worst
+    algorithm per task (*sort*="spread"), which shows where the choice
+    of the algorithm matters most. With *total*, a final row aggregates
+    all domains.
     """
-    def __init__(self, nbest=5, total=False, **kwargs):
+    def __init__(self, nbest=5, total=False, aggregation="sum", sort="total", missing=None,
+            group_by=None, **kwargs):
         if "format" not in kwargs:
             kwargs["format"] = "tex"
         elif kwargs["format"] != "tex":
             raise ValueError("unsupported format: {}".format(kwargs["format"]))
-        PlanningReport.__init__(self, **kwargs)
-        if len(self.attributes) != 1:
-            raise ValueError("Report needs exactly one attribute")
+        if aggregation not in AGGREGATIONS:
+            raise ValueError("unknown aggregation: {}".format(aggregation))
+        if sort not in ["total", "spread"]:
+            raise ValueError("unknown sort order: {}".format(sort))
+        super(BestTabularReport, self).__init__(**kwargs)
+        if not self.attributes:
+            raise ValueError("Report needs at least one attribute")
         self.attribute = self.attributes[0]
         self.nbest = nbest
         self.total = total
+        self.aggregation = aggregation
+        self.sort = sort
+        self.missing = missing
+        self.group_key = make_group_key(group_by)
     
-    def get_text(self):
-        return self.get_markup()
+    def _build_index(self, algorithms):
+        """
+        Return (tasks, index) in one pass over all runs: the set of tasks
+        per domain and a dict from (attribute, domain, algorithm) to the
+        list of reported values.
+        """
+        wanted = set(algorithms)
+        tasks = defaultdict(set)
+        index = defaultdict(list)
+        for run in self.props.values():
+            if run["algorithm"] not in wanted:
+                continue
+            domain, task = self.group_key(run)
+            tasks[domain].add(task)
+            for attribute in self.attributes:
+                value = run.get(attribute)
+                if value is None:
+                    value = self.missing
+                if value is not None:
+                    index[attribute, domain, run["algorithm"]].append(value)
+        return tasks, index
     
-    def get_markup(self):
+    def _aggregate(self, values):
+        if not values:
+            return None
+        return AGGREGATIONS[self.aggregation](values)
+    
+    def _sort_key(self, values, size):
+        present = [value for value in values if value is not None]
+        if not present:
+            return float("inf")
+        if self.sort == "spread":
+            return -(max(present) - min(present)) / size
+        return -sum(present) / size
+    
+    def _format_value(self, value):
+        if value is None:
+            return "--"
+        if float(value).is_integer():
+            return str(int(value))
+        return "{:.2f}".format(value)
+    
+    def _table(self, attribute, algorithms, tasks, index):
         lines = []
-        algorithms = list(self.algorithms)
         # generate header
         lines.append(r"\begin{tabular}{@{}l|" + 'c' * len(algorithms) + "@{}}")
         line = ["Domain"] + algorithms
         lines.append(" & ".join(line) + r"\\")
         lines.append(r"\midrule")
         # generate content
-        domains = {}
-        for domain in self.domains:
-            getattr = lambda algo: sum(item[self.attribute] for item in self.domain_algorithm_runs[domain, algo])
-            domains[domain] = [getattr(algo) for algo in algorithms]
-        sortfunc = lambda x: -sum(x[1]) / float(len(self.domains[x[0]]))
-        domains = sorted(domains.items(), key=sortfunc)
-        for i in range(min(self.nbest, len(domains))):
-            domain, values = domains[i]
-            line = [r"\textbf{{{}}} ({})".format(domain, len(self.domains[domain]))] + [str(val) for val in values]
+        domains = []
+        for domain in tasks:
+            values = [self._aggregate(index.get((attribute, domain, algo))) for algo in algorithms]
+            domains.append((self._sort_key(values, len(tasks[domain])), domain, values))
+        domains.sort()
+        for _, domain, values in domains[:self.nbest]:
+            line = [r"\textbf{{{}}} ({})".format(domain, len(tasks[domain]))] + [self._format_value(val) for val in values]
             lines.append(" & ".join(line) + r"\\")
         # generate total (if enabled)
         if self.total:
-            totals = [sum(values[i] for domain, values in domains) for i in range(len(self.algorithms))]
-            line = [r"\textbf{Total}"] + [str(val) for val in totals]
+            totals = [self._aggregate([value for domain in tasks for value in index.get((attribute, domain, algo), [])])
+                for algo in algorithms]
+            line = [r"\textbf{Total}"] + [self._format_value(val) for val in totals]
             lines.append(" & ".join(line) + r"\\")
         if lines[-1].endswith(r"\\"):
             lines[-1] = lines[-1][:-2]
         lines.append(r"\end{tabular}")
         return "\n".join(lines)
+    
+    def get_text(self):
+        return self.get_markup()
+    
+    def get_markup(self):
+        algorithms = list(self.algorithms)
+        with self.phase("aggregate"):
+            tasks, index = self._build_index(algorithms)
+        return "\n\n".join(self._table(attribute, algorithms, tasks, index) for attribute in self.attributes)
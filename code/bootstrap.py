@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized bootstrap confidence intervals over tasks.
+
+All functions take a (tasks x columns) matrix of per-task values, where
+columns are e.g. algorithms or algorithm pairs. Resampling draws task
+indices with replacement; instead of materializing the resampled
+matrices we draw multinomial task weights, so every resample of every
+column is a single matrix product.
+"""
+from __future__ import division
+
+import numpy as np
+
+
+def resample_weights(num_tasks, num_resamples, seed=0):
+    """
+    Return a (num_resamples x num_tasks) matrix in which row i states
+    how often each task is drawn in resample i.
+    """
+    rng = np.random.RandomState(seed)
+    return rng.multinomial(num_tasks, np.full(num_tasks, 1.0 / num_tasks), size=num_resamples)
+
+
+def bootstrap_means(values, mask=None, num_resamples=1000, seed=0):
+    """
+    Return a (num_resamples x columns) matrix of resampled column means.
+    If *mask* is given, only tasks with a true mask entry count for the
+    respective column; columns without any such task yield NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    if mask is None:
+        mask = np.ones(values.shape, dtype=bool)
+    mask = np.asarray(mask, dtype=bool)
+    weights = resample_weights(values.shape[0], num_resamples, seed).astype(float)
+    sums = weights.dot(np.where(mask, values, 0.0))
+    counts = weights.dot(mask.astype(float))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def confidence_interval(values, mask=None, num_resamples=1000, confidence=0.95, seed=0):
+    """
+    Return (lower, upper) arrays with the percentile bootstrap interval
+    of the mean of each column. Empty inputs yield NaN intervals.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 2 or values.shape[0] == 0:
+        columns = values.shape[1] if values.ndim == 2 else 0
+        return np.full(columns, np.nan), np.full(columns, np.nan)
+    means = bootstrap_means(values, mask, num_resamples, seed)
+    alpha = (1 - confidence) / 2
+    lower, upper = np.nanpercentile(means, [100 * alpha, 100 * (1 - alpha)], axis=0)
+    return lower, upper
+
+
+def is_significant(lower, upper, reference=0):
+    """True for intervals that don't contain *reference*."""
+    return (lower > reference) | (upper < reference)
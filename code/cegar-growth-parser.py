@@ -0,0 +1,62 @@
+#! /usr/bin/env python
+
+import re
+
+from lab.parser import Parser
+
+SECONDS = r"([\d.]+(?:e[+-]?\d+)?)s"
+# newer planners prefix every line with "[t=..., ... KB] "
+PREFIX = r"^(?:\[t=[^\]]*\] )?"
+ABSTRACTION_DONE = re.compile(r"^.*Done building abstraction.*$", re.M)
+# statistics printed after an abstraction is complete
+BUILD_TIME = re.compile(PREFIX + r"Time for building abstraction: " + SECONDS, re.M)
+STATES = re.compile(PREFIX + r"(?:Abstract s|S)tates: (\d+)$", re.M)
+TRANSITIONS = re.compile(PREFIX + r"(?:Non-looping|Abstract) transitions: (\d+)$", re.M)
+INIT_H = re.compile(PREFIX + r"Init h: (\d+)$", re.M)
+# reasons to stop refining, printed before "Done building abstraction"
+LIMITS = [
+	("states", re.compile(PREFIX + r"Reached maximum number of states\.$", re.M)),
+	("transitions", re.compile(PREFIX + r"Reached maximum number of transitions\.$", re.M)),
+	("time", re.compile(PREFIX + r"Reached time limit\.$", re.M)),
+	("memory", re.compile(PREFIX + r"Reached memory limit\.$", re.M)),
+	("solved", re.compile(PREFIX + r"Found concrete solution", re.M)),
+	("unsolvable", re.compile(PREFIX + r"Abstract (?:problem|task) is unsolvable", re.M)),
+]
+
+def first(pattern, text, type):
+	match = pattern.search(text)
+	return None if match is None else type(match.group(1))
+
+def growth(content, props):
+	done = [match.end() for match in ABSTRACTION_DONE.finditer(content)]
+	if not done:
+		return
+	subtasks = []
+	for i, end in enumerate(done):
+		before = content[done[i - 1] if i > 0 else 0:end]
+		after = content[end:done[i + 1] if i + 1 < len(done) else len(content)]
+		limit = next((name for name, pattern in LIMITS if pattern.search(before)), None)
+		subtasks.append((first(STATES, after, int), first(TRANSITIONS, after, int),
+			first(BUILD_TIME, after, float), first(INIT_H, after, int), limit))
+	states, transitions, times, init_h, limits = [list(values) for values in zip(*subtasks)]
+	props["cegar_subtasks"] = len(subtasks)
+	props["cegar_subtask_states"] = states
+	props["cegar_subtask_transitions"] = transitions
+	props["cegar_subtask_time"] = times
+	props["cegar_subtask_init_h"] = init_h
+	props["cegar_subtask_limit"] = limits
+	# every refinement splits one abstract state into two
+	refinements = [None if n is None else n - 1 for n in states]
+	props["cegar_subtask_refinements"] = refinements
+	props["cegar_subtask_limit_time"] = [time if limit == "states" else None
+		for time, limit in zip(times, limits)]
+	if None not in refinements:
+		props["cegar_refinements"] = sum(refinements)
+	if None not in times:
+		props["cegar_build_time"] = sum(times)
+	props["cegar_state_limit_hits"] = limits.count("states")
+
+print("Running CEGAR abstraction growth parser")
+parser = Parser()
+parser.add_function(growth)
+parser.parse()
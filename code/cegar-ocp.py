@@ -13,13 +13,16 @@ from experiment import CEGARExperiment
 from downward.reports.absolute import AbsoluteReport
 from downward.reports.scatter import ScatterPlotReport
 
-from domain_groups import group_domains
+from domain_groups import DOMAIN_GROUPING
 from per_task_comparison import PerTaskComparison
 from relativescatter import RelativeScatterPlotReport
 from histogram_report import HistogramReport
 from domain_comparison_report import (DomainComparisonReport, OptimalStrategyEvaluator,
         IdealProblemsEvaluator, AttributeStatisticsEvaluator)
 from h_stats_report import HeuristicStatisticsReport
+from seed_report import SeedComparisonReport
+from scp_report import ScpThroughputReport
+from score_report import ScoreReport
 
 def mean(list):
     return sum(list) / len(list)
@@ -43,15 +46,20 @@ BENCHMARKS_DIR = os.environ["DOWNWARD_BENCHMARKS"]
 REVISION_CACHE = os.path.expanduser('~/lab/revision-cache')
 
 exp = CEGARExperiment(soft_limit=20*1024, hard_limit=50*1024, environment=ENV, revision_cache=REVISION_CACHE)
+DIR = os.path.dirname(os.path.abspath(__file__))
+exp.add_parser(os.path.join(DIR, "scp-parser.py"))
 exp.add_suite(BENCHMARKS_DIR, SUITE)
 
 algorithms = ["RANDOM", "MIN_UNWANTED", "MAX_UNWANTED",
 	"MIN_REFINED", "MAX_REFINED", "MIN_HADD", "MAX_HADD",
 	"MIN_CG", "MAX_CG", "MIN_GOAL_DIST", "MAX_GOAL_DIST",
 	"MIN_HIGHER_DIST", "MAX_HIGHER_DIST", "MIN_ACTIVE_OPS", "MAX_ACTIVE_OPS"]
+# run three seeds per task, more where they disagree (see the seeds steps)
 for alg in algorithms:
-	exp.add_algorithm(alg.lower(), REPO, 'scp-refinement-strategies',
-		['--search', 'astar(saturated_cost_partitioning([cartesian([landmarks(order=random, random_seed=0), goals(order=random, random_seed=0)], pick=' + alg + ')], max_time=200, max_orders=infinity, diversify=true, max_optimization_time=0))'])
+	exp.add_seeded_algorithm(alg.lower(), REPO, 'scp-refinement-strategies',
+		['--search', 'astar(saturated_cost_partitioning([cartesian([landmarks(order=random, random_seed={seed}), goals(order=random, random_seed={seed})], pick=' + alg + ')], max_time=200, max_orders=infinity, diversify=true, max_optimization_time=0))'],
+		seeds=range(10), min_seeds=3)
+alg_names = [alg.lower() for alg in algorithms]
 
 # Add step that writes experiment files to disk.
 exp.add_step('build', exp.build)
@@ -63,9 +71,17 @@ exp.add_step('start', exp.start_runs)
 # writes them to *-eval/properties.
 exp.add_fetcher(name='fetch')
 
+# Add steps that run further seeds on tasks with unstable results.
+exp.add_seed_steps(attribute="expansions_until_last_jump")
+
 # Add report step (AbsoluteReport is the standard report).
 exp.add_report(
 	AbsoluteReport(attributes=ATTRIBUTES), outfile='report.html')
+exp.add_report(
+	SeedComparisonReport(attributes=["coverage", "expansions_until_last_jump"]), outfile='seeds.tex')
+for fmt in ["tex", "txt"]:
+	exp.add_report(ScpThroughputReport(format=fmt), outfile='scp_throughput.' + fmt)
+	exp.add_report(ScoreReport(alg_names, format=fmt, group_by=DOMAIN_GROUPING), outfile='scores.' + fmt)
 exp.add_report(
 	PerTaskComparison(sort=True, attributes=["expansions_until_last_jump"]), outfile='task_comparison.html')
 exp.add_report(
@@ -73,10 +89,9 @@ exp.add_report(
 exp.add_report(
     HistogramReport(attributes=["average_distinct_rated"]), outfile='hist_distinct_rated.csv')
 
-alg_names = [alg.lower() for alg in algorithms]
 exp.add_report(
     DomainComparisonReport(alg_names, OptimalStrategyEvaluator(optimum_bound=0.05), min_group_size=1,
-        attributes=["expansions_until_last_jump"], format="tex", filter=group_domains),
+        attributes=["expansions_until_last_jump"], format="tex", group_by=DOMAIN_GROUPING),
     outfile='optimality_comparison.tex')
 exp.add_report(
     DomainComparisonReport(alg_names, IdealProblemsEvaluator("expansions_until_last_jump"),
@@ -85,12 +100,12 @@ exp.add_report(
             "translator_operators",
             "translator_variables",
             "translator_facts"],
-        format="txt", filter=group_domains),
+        format="txt", group_by=DOMAIN_GROUPING),
     outfile='problem_statistics.csv')
 exp.add_report(
     DomainComparisonReport(alg_names, AttributeStatisticsEvaluator(),
         attributes=["average_split_options", "average_distinct_rated"],
-        format="tex", filter=group_domains),
+        format="tex", group_by=DOMAIN_GROUPING),
     outfile='attribute_statistics.tex')
 
 # Add scatter plot report step.
@@ -6,20 +6,32 @@ import os
 import os.path
 import platform
 
-from lab.environments import LocalEnvironment, BaselSlurmEnvironment
+from lab.environments import BaselSlurmEnvironment
 
 from lab.reports import Attribute
 from experiment import CEGARExperiment
+from local_scheduler import MemoryAwareLocalEnvironment
 from downward.reports.absolute import AbsoluteReport
 from downward.reports.scatter import ScatterPlotReport
 
-from domain_groups import group_domains
+from domain_groups import DOMAIN_GROUPING
 from per_task_comparison import PerTaskComparison
 from relativescatter import RelativeScatterPlotReport
 from histogram_report import HistogramReport
+from heatmap_report import HeatmapReport
 from domain_comparison_report import (DomainComparisonReport, OptimalStrategyEvaluator,
         IdealProblemsEvaluator, AttributeStatisticsEvaluator)
 from h_stats_report import HeuristicStatisticsReport
+from heuristic_series_report import HeuristicSeriesReport
+from portfolio_report import PortfolioReport
+from strategy_selector import StrategySelectorReport
+from anytime_report import AnytimeReport
+from memory_report import MemoryReport
+from split_time_report import SplitTimeReport
+from rank_report import RankAggregationReport
+from resource_report import ResourceReport, ResourceProfileReport
+from refinement_report import RefinementThroughputReport
+from score_report import ScoreReport
 
 def mean(list):
     return sum(list) / len(list)
@@ -36,7 +48,8 @@ else:
 	SUITE = ['depot:p01.pddl', 'depot:p02.pddl',
 		'gripper:prob01.pddl', 'gripper:prob02.pddl', 'gripper:prob03.pddl',
 		'mystery:prob01.pddl', 'mystery:prob03.pddl']
-	ENV = LocalEnvironment(processes=6)
+	# admit runs by their memory limits, so the workstation doesn't swap
+	ENV = MemoryAwareLocalEnvironment(processes=6)
 # Use path to your Fast Downward repository.
 REPO = os.environ["DOWNWARD_REPO"]
 BENCHMARKS_DIR = os.environ["DOWNWARD_BENCHMARKS"]
@@ -45,7 +58,12 @@ REVISION_CACHE = os.path.expanduser('~/lab/revision-cache')
 exp = CEGARExperiment(soft_limit=20*1024, hard_limit=50*1024, environment=ENV, revision_cache=REVISION_CACHE)
 DIR = os.path.dirname(os.path.abspath(__file__))
 exp.add_parser(os.path.join(DIR, "heuristic-stats-parser.py"))
+exp.add_parser(os.path.join(DIR, "progress-parser.py"))
+exp.add_parser(os.path.join(DIR, "memory-parser.py"))
+exp.add_parser(os.path.join(DIR, "cegar-growth-parser.py"))
 exp.add_suite(BENCHMARKS_DIR, SUITE)
+# Sample the resource usage of every planner run.
+exp.add_resource_sampling()
 
 algorithms = ["RANDOM", "MIN_UNWANTED", "MAX_UNWANTED",
 	"MIN_REFINED", "MAX_REFINED", "MIN_HADD", "MAX_HADD",
@@ -61,9 +79,20 @@ exp.add_step('build', exp.build)
 # Add step that executes all runs.
 exp.add_step('start', exp.start_runs)
 
-# Add step that collects properties from run directories and
+# Add step that packs finished runs into one archive per run batch.
+exp.add_pack_step(name='pack')
+
+# Add step that collects properties from packed runs and
 # writes them to *-eval/properties.
-exp.add_fetcher(name='fetch')
+exp.add_archive_fetcher(name='fetch')
+
+# Add steps that rerun the runs which failed on memory or output limits
+# with escalated limits and merge them into *-eval/properties.
+exp.add_retry_steps()
+
+# Add step that exports the properties as columnar table, which the
+# custom reports read instead of the properties file.
+exp.add_export_step(name='export')
 
 # Add report step (AbsoluteReport is the standard report).
 exp.add_report(
@@ -71,14 +100,17 @@ exp.add_report(
 exp.add_report(
 	PerTaskComparison(sort=True, attributes=["expansions_until_last_jump"]), outfile='task_comparison.html')
 exp.add_report(
-    HistogramReport(attributes=["average_split_options"], filter=group_domains), outfile='hist_split_options.csv')
+    HistogramReport(attributes=["average_split_options"], group_by=DOMAIN_GROUPING), outfile='hist_split_options.csv')
+exp.add_report(
+    HistogramReport(attributes=["average_distinct_rated"], group_by=DOMAIN_GROUPING), outfile='hist_distinct_rated.csv')
 exp.add_report(
-    HistogramReport(attributes=["average_distinct_rated"], filter=group_domains), outfile='hist_distinct_rated.csv')
+    HeatmapReport(attributes=["average_distinct_rated", "average_split_options"], log=(True, True),
+        group_by=DOMAIN_GROUPING), outfile='heatmap_split_options.csv')
 
 alg_names = [alg.lower() for alg in algorithms]
 exp.add_report(
     DomainComparisonReport(alg_names, OptimalStrategyEvaluator(optimum_bound=0.05), min_group_size=1,
-        attributes=["expansions_until_last_jump"], format="tex", filter=group_domains),
+        attributes=["expansions_until_last_jump"], format="tex", group_by=DOMAIN_GROUPING),
     outfile='optimality_comparison.tex')
 exp.add_report(
     DomainComparisonReport(alg_names, IdealProblemsEvaluator("expansions_until_last_jump"),
@@ -87,13 +119,43 @@ exp.add_report(
             "translator_operators",
             "translator_variables",
             "translator_facts"],
-        format="txt", filter=group_domains),
+        format="txt", group_by=DOMAIN_GROUPING),
     outfile='problem_statistics.csv')
 exp.add_report(
     DomainComparisonReport(alg_names, AttributeStatisticsEvaluator(),
         attributes=["average_split_options", "average_distinct_rated"],
-        format="tex", filter=group_domains),
+        format="tex", group_by=DOMAIN_GROUPING),
     outfile='attribute_statistics.tex')
+for fmt in ["tex", "txt"]:
+    exp.add_report(
+        PortfolioReport(alg_names, max_size=5,
+            attributes=[Attribute("coverage", min_wins=False), "expansions_until_last_jump"],
+            format=fmt, group_by=DOMAIN_GROUPING),
+        outfile='portfolios.' + fmt)
+    exp.add_report(
+        StrategySelectorReport(alg_names, k=5, format=fmt, group_by=DOMAIN_GROUPING),
+        outfile='strategy_selector.' + fmt)
+    exp.add_report(
+        MemoryReport(alg_names, format=fmt, group_by=DOMAIN_GROUPING),
+        outfile='memory.' + fmt)
+    exp.add_report(
+        SplitTimeReport(alg_names, format=fmt),
+        outfile='split_time.' + fmt)
+    exp.add_report(
+        RankAggregationReport(alg_names,
+            attributes=[Attribute("coverage", min_wins=False), "expansions_until_last_jump",
+                "search_start_time", "search_start_memory"],
+            format=fmt, group_by=DOMAIN_GROUPING),
+        outfile='ranks.' + fmt)
+    exp.add_report(
+        ResourceReport(alg_names, format=fmt),
+        outfile='resources.' + fmt)
+    exp.add_report(
+        RefinementThroughputReport(alg_names, format=fmt, group_by=DOMAIN_GROUPING),
+        outfile='refinement_throughput.' + fmt)
+    exp.add_report(
+        ScoreReport(alg_names, format=fmt, group_by=DOMAIN_GROUPING),
+        outfile='scores.' + fmt)
 
 # Add scatter plot report step.
 def addScatterPlot(attrib, algorithm, compare="random"):
@@ -126,6 +188,14 @@ exp.add_report(HeuristicStatisticsReport(
 exp.add_report(HeuristicStatisticsReport(
         "max_goal_dist", n_best=0, n_worst=5),
     outfile="h-worst-max_goal_dist.csv")
+exp.add_report(AnytimeReport(alg_names),
+    outfile="anytime.csv")
+exp.add_report(HeuristicSeriesReport(alg_names),
+    outfile="h-series.csv")
+exp.add_report(HeuristicSeriesReport(alg_names, progress=True, group_by=DOMAIN_GROUPING),
+    outfile="h-series-progress.csv")
+exp.add_report(ResourceProfileReport(alg_names),
+    outfile="resource-profiles.csv")
 
 # Parse the commandline and show or run experiment steps.
 exp.run_steps()
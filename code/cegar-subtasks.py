@@ -13,7 +13,7 @@ from experiment import CEGARExperiment
 from downward.reports.absolute import AbsoluteReport
 from downward.reports.scatter import ScatterPlotReport
 
-from domain_groups import group_domains
+from domain_groups import DOMAIN_GROUPING
 from per_task_comparison import PerTaskComparison
 from relativescatter import RelativeScatterPlotReport
 from histogram_report import HistogramReport
@@ -76,7 +76,7 @@ exp.add_report(
 alg_names = [alg.lower() for alg in algorithms]
 exp.add_report(
     DomainComparisonReport(alg_names, OptimalStrategyEvaluator(optimum_bound=0.05), min_group_size=1,
-        attributes=["expansions_until_last_jump"], format="tex", filter=group_domains),
+        attributes=["expansions_until_last_jump"], format="tex", group_by=DOMAIN_GROUPING),
     outfile='optimality_comparison.tex')
 exp.add_report(
     DomainComparisonReport(alg_names, IdealProblemsEvaluator("expansions_until_last_jump"),
@@ -85,12 +85,12 @@ exp.add_report(
             "translator_operators",
             "translator_variables",
             "translator_facts"],
-        format="txt", filter=group_domains),
+        format="txt", group_by=DOMAIN_GROUPING),
     outfile='problem_statistics.csv')
 exp.add_report(
     DomainComparisonReport(alg_names, AttributeStatisticsEvaluator(),
         attributes=["average_split_options", "average_distinct_rated"],
-        format="tex", filter=group_domains),
+        format="tex", group_by=DOMAIN_GROUPING),
     outfile='attribute_statistics.tex')
 
 # Add scatter plot report step.
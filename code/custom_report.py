@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Functionality shared by all custom reports in this directory.
+"""
+from __future__ import division
+
+import contextlib
+import json
+import logging
+import os
+import resource
+import time
+
+import cProfile
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from lab import tools
+
+from merged_data import algorithm_key
+import fingerprint
+import run_table
+import seeds
+
+# Comma-separated profiling modes used if a report doesn't set its own,
+# e.g. REPORT_PROFILE=timing,tracemalloc ./cegar-splits.py 7
+PROFILE_ENV = "REPORT_PROFILE"
+PROFILE_MODES = ["timing", "tracemalloc", "cprofile"]
+# Set to rebuild reports even if their fingerprint is up to date,
+# e.g. REPORT_FORCE=1 ./cegar-splits.py 7
+FORCE_ENV = "REPORT_FORCE"
+# attributes of a report that don't influence its output
+UNSTABLE_STATE = ["source", "profile", "_timer", "_run_table"]
+# columns read by PlanningReport while scanning the runs
+SCANNED_COLUMNS = ["algorithm", "domain", "problem"]
+
+# (phase name, method of lab's Report called for that phase)
+PHASES = [
+    ("load", "_load_data"),
+    ("filter", "_apply_filter"),
+    ("scan", "_scan_data"),
+    ("format", "get_text"),
+    ("write", "write"),
+]
+
+
+def _parse_profile(profile):
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV, "")
+    if isinstance(profile, str):
+        profile = [mode.strip() for mode in profile.split(",") if mode.strip()]
+    modes = set(profile)
+    for mode in modes:
+        if mode not in PROFILE_MODES:
+            raise ValueError("unknown profiling mode: {}".format(mode))
+    if modes:
+        # every other mode implies timing
+        modes.add("timing")
+    return modes
+
+
+class PhaseTimer(object):
+    """
+    Records wall time, peak memory and run counts per report phase.
+    """
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory and tracemalloc is not None
+        self.phases = []
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.trace_memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        start = time.time()
+        start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        try:
+            yield
+        finally:
+            # ru_maxrss is the peak of the whole process, so only its
+            # growth can be attributed to the phase
+            entry = {"phase": name, "time": time.time() - start,
+                "max_rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss}
+            if self.trace_memory:
+                entry["peak_traced_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+            self.phases.append(entry)
+
+    def wrap(self, name, method):
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return method(*args, **kwargs)
+        return timed
+
+
+class CustomReport(object):
+    """
+    Mixin for the reports in this directory; it has to precede the lab
+    report class in the list of base classes.
+
+    *profile* enables instrumentation and is a list or comma-separated
+    string of the modes "timing", "tracemalloc" and "cprofile". If it
+    isn't given, the REPORT_PROFILE environment variable is used. With
+    instrumentation, per-phase wall time, peak memory and run counts are
+    written to "<outfile>.timing.json" and the cProfile statistics (if
+    enabled) to "<outfile>.prof".
+
+    *source* replaces the properties file of the eval dir as input, e.g.
+    by a merged_data.MergedDataset. Algorithms may then be given as
+    (experiment, algorithm) tuples. Without a source, a table exported
+    by run_table.export_table is preferred to the properties file if it
+    is up to date; *columns* restricts the attributes loaded from it.
+
+    Like make, a report is skipped if its outfile exists and its
+    fingerprint in "<outfile>.fingerprint" is still valid. The
+    fingerprint covers the constructor arguments (including filters and
+    group_by functions with the globals they use), the code of the
+    report classes and of the modules of this directory they use, and
+    the input: the size and modification time of properties files, or
+    for a run table the hashes of the columns the report read. Set the
+    REPORT_FORCE environment variable to rebuild all reports.
+
+    Runs of algorithms added by CEGARExperiment.add_seeded_algorithm
+    are merged into one run per task and replicated algorithm (see
+    seeds.aggregate_seeds), so reports compare the means over the seeds.
+    Set *aggregate_seeds* to False to report every seed on its own.
+    """
+    def __init__(self, *args, **kwargs):
+        self.profile = _parse_profile(kwargs.pop("profile", None))
+        self.source = kwargs.pop("source", None)
+        self.columns = kwargs.pop("columns", None)
+        self.aggregate_seeds = kwargs.pop("aggregate_seeds", True)
+        self._timer = None
+        self._run_table = None
+        if kwargs.get("filter_algorithm"):
+            kwargs["filter_algorithm"] = [
+                algorithm_key(algo) for algo in tools.make_list(kwargs["filter_algorithm"])]
+        super(CustomReport, self).__init__(*args, **kwargs)
+
+    def _load_data(self):
+        if self.source is not None:
+            if isinstance(self.source, run_table.RunTable):
+                self._run_table = self.source
+                self._run_table.accessed = set()
+            self.props = self.source.props()
+        else:
+            path = run_table.find_table(self.eval_dir)
+            if path is not None:
+                logging.info("Reading run table {}".format(path))
+                self._run_table = run_table.RunTable(path, columns=self.columns)
+                self._run_table.accessed = set()
+                self.props = self._run_table.props()
+            else:
+                super(CustomReport, self)._load_data()
+        if self.aggregate_seeds:
+            self.props = seeds.aggregate_seeds(self.props)
+
+    def _apply_filter(self):
+        if self._run_table is None:
+            return super(CustomReport, self)._apply_filter()
+        filters = self.run_filter.filters
+        self.run_filter.filters = [run_table.dict_filter(filter_) for filter_ in filters]
+        try:
+            super(CustomReport, self)._apply_filter()
+        finally:
+            self.run_filter.filters = filters
+
+    def _scan_data(self):
+        if self._run_table is None:
+            return super(CustomReport, self)._scan_data()
+        # scanning looks at all columns, but only their names and types
+        # matter, which the schema in the fingerprint covers
+        accessed, self._run_table.accessed = self._run_table.accessed, None
+        try:
+            super(CustomReport, self)._scan_data()
+        finally:
+            self._run_table.accessed = accessed
+        accessed.update(SCANNED_COLUMNS)
+
+    def phase(self, name):
+        """
+        Context manager for timing a part of get_markup, e.g.
+        aggregation. Does nothing unless instrumentation is enabled.
+        """
+        if self._timer is None:
+            return _null_context()
+        return self._timer.phase(name)
+
+    def _count_runs(self, name):
+        if self._timer is not None:
+            self._timer.counts[name] = len(self.props)
+
+    def __call__(self, eval_dir, outfile):
+        if self.source is not None:
+            # lab expects the eval dir to exist even if we don't read from it
+            tools.makedirs(eval_dir)
+        fingerprint_file = outfile + ".fingerprint"
+        current = self._input_fingerprint(eval_dir)
+        if current is not None and not os.environ.get(FORCE_ENV) and \
+                self._is_up_to_date(outfile, fingerprint.read(fingerprint_file), current):
+            logging.info("Report {} is up to date, skipping it".format(outfile))
+            return
+        if os.path.exists(fingerprint_file):
+            os.remove(fingerprint_file)
+        try:
+            result = self._make_report(eval_dir, outfile)
+        finally:
+            table, self._run_table = self._run_table, None
+        if current is not None:
+            if table is not None:
+                hashes = self._column_hashes(current["table"])
+                current["columns"] = {name: hashes.get(name) for name in table.accessed}
+                table.accessed = None
+            fingerprint.write(fingerprint_file, current)
+        return result
+
+    def _input_fingerprint(self, eval_dir):
+        """
+        Return the fingerprint of the report's parameters, code and
+        input (without the columns, which are only known after the
+        report ran), or None if the input can't be fingerprinted.
+        Not named _fingerprint, which fingerprint.describe() would call.
+        """
+        state = {name: value for name, value in vars(self).items() if name not in UNSTABLE_STATE}
+        current = {
+            "report": type(self).__name__,
+            # back-references to the report (e.g. DomainComparisonReport's
+            # evaluator) are described as cycles, i.e. left out
+            "parameters": fingerprint.digest(fingerprint.describe(state, (id(self),))),
+            "code": fingerprint.code_digest(type(self)),
+        }
+        if self.source is None:
+            path = run_table.find_table(eval_dir)
+            if path is None:
+                current["files"] = fingerprint.file_stats([os.path.join(eval_dir, "properties")])
+                return current
+        elif isinstance(self.source, run_table.RunTable):
+            path = self.source.path
+        elif hasattr(self.source, "files"):
+            current["files"] = fingerprint.file_stats(self.source.files())
+            return current
+        else:
+            return None
+        info = self._column_info(path)
+        if any(column["hash"] is None for column in info.values()):
+            # exported without column hashes, rebuild the table to use them
+            return None
+        current["table"] = os.path.abspath(path)
+        current["schema"] = fingerprint.digest(sorted([name, column["kind"]] for name, column in info.items()))
+        return current
+
+    def _column_info(self, path):
+        info = run_table.column_info(path)
+        if self.columns is None:
+            return info
+        return {name: info[name] for name in self.columns if name in info}
+
+    def _column_hashes(self, path):
+        return {name: info["hash"] for name, info in self._column_info(path).items()}
+
+    def _is_up_to_date(self, outfile, stored, current):
+        if stored is None or not os.path.exists(outfile):
+            return False
+        if any(stored.get(key) != value for key, value in current.items()):
+            return False
+        if "table" not in current:
+            return True
+        hashes = self._column_hashes(current["table"])
+        # columns missing from the table are stored with hash None
+        return all(hashes.get(name) == digest for name, digest in stored.get("columns", {}).items())
+
+    def _make_report(self, eval_dir, outfile):
+        if not self.profile:
+            return super(CustomReport, self).__call__(eval_dir, outfile)
+        self._timer = PhaseTimer("tracemalloc" in self.profile)
+        for name, method in PHASES:
+            setattr(self, method, self._timer.wrap(name, getattr(self, method)))
+        load_data, apply_filter = self._load_data, self._apply_filter
+        def counted_load():
+            load_data()
+            self._count_runs("loaded_runs")
+        def counted_filter():
+            apply_filter()
+            self._count_runs("filtered_runs")
+        self._load_data, self._apply_filter = counted_load, counted_filter
+
+        profiler = None
+        if "cprofile" in self.profile:
+            profiler = cProfile.Profile()
+        if "tracemalloc" in self.profile and tracemalloc is not None:
+            tracemalloc.start()
+        start = time.time()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            result = super(CustomReport, self).__call__(eval_dir, outfile)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            total = time.time() - start
+            if "tracemalloc" in self.profile and tracemalloc is not None:
+                tracemalloc.stop()
+            for name, method in PHASES:
+                delattr(self, method)
+            self._write_timing(outfile, total, profiler)
+            self._timer = None
+        return result
+
+    def _write_timing(self, outfile, total, profiler):
+        timing = {
+            "report": type(self).__name__,
+            "outfile": os.path.abspath(outfile),
+            "total_time": total,
+            "phases": self._timer.phases,
+            "counts": self._timer.counts,
+        }
+        if profiler is not None:
+            profile_file = outfile + ".prof"
+            profiler.dump_stats(profile_file)
+            timing["cprofile"] = os.path.abspath(profile_file)
+        timing_file = outfile + ".timing.json"
+        with open(timing_file, "w") as f:
+            json.dump(timing, f, indent=2)
+        logging.info("Wrote report timing to {}".format(timing_file))
+
+
+@contextlib.contextmanager
+def _null_context():
+    yield
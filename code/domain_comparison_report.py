@@ -6,14 +6,25 @@ from math import sqrt
 
 from downward.reports import PlanningReport
 
+import bootstrap
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
 class OptimalStrategyEvaluator:
     OUTPUT_FORMATS = "tex txt".split()
     """
     Creates a table listing how often a strategy is optimal for each group.
+    If *bootstrap* is positive, confidence intervals of the optimality
+    fractions are computed from that many resamples of the problems.
     """
-    def __init__(self, optimum_bound=0, quantile=0.1):
+    def __init__(self, optimum_bound=0, quantile=0.1, bootstrap=0, confidence=0.95, seed=0):
         self.optimum_bound = optimum_bound
         self.quantile = quantile
+        self.bootstrap = bootstrap
+        self.confidence = confidence
+        self.seed = seed
     
     def setReport(self, report):
         self.report = report
@@ -28,6 +39,27 @@ class OptimalStrategyEvaluator:
         required = min(*values) + self.optimum_bound * max(*values)
         return tuple((1 if v <= required else 0) for v in values)
     
+    def _get_intervals(self, optimals):
+        if not self.bootstrap:
+            return None
+        return bootstrap.confidence_interval(optimals, num_resamples=self.bootstrap,
+            confidence=self.confidence, seed=self.seed)
+    
+    def _format_tex_row(self, name, optimals):
+        intervals = self._get_intervals(optimals)
+        line = [self._format_cell(x) for x in [sum(x) / len(x) for x in zip(*optimals)]]
+        if intervals is not None:
+            line = [r"%s {\scriptsize[%.2f, %.2f]}" % (cell, lower, upper)
+                for cell, lower, upper in zip(line, *intervals)]
+        return " & ".join([name] + line)
+    
+    def _format_txt_row(self, name, count, optimals):
+        line = ["{:.7f}".format(sum(x) / len(x)) for x in zip(*optimals)]
+        intervals = self._get_intervals(optimals)
+        if intervals is not None:
+            line += ["{:.7f}".format(x) for bound in intervals for x in bound]
+        return ",".join([name, str(count)] + line)
+    
     def _format_cell(self, cell):
         if cell != 0:
             if cell > 1 - self.quantile or cell < self.quantile:
@@ -52,38 +84,36 @@ class OptimalStrategyEvaluator:
                 optimals = []
                 for problem, algorithms in problems.items():
                     optimals.append(self._get_optimal(list(map(lambda run: run[self.attribute], algorithms))))
-                optimals = [sum(x) / len(x) for x in zip(*optimals)]
-                line = [self._format_cell(x) for x in optimals]
-                lines.append(" & ".join(["{} ({})".format(group, len(problems))] + line) + r"\\")
+                lines.append(self._format_tex_row("{} ({})".format(group, len(problems)), optimals) + r"\\")
             # emit totals
             lines.append(r"\midrule")
             optimals = []
             for group, problems in groups.items():
                 for problem, algorithms in problems.items():
                     optimals.append(self._get_optimal(list(map(lambda run: run[self.attribute], algorithms))))
-            optimals = [sum(x) / len(x) for x in zip(*optimals)]
-            line = [self._format_cell(x) for x in optimals]
-            lines.append(" & ".join(["Total ({})".format(sum(map(len, groups.values())))] + line))
+            lines.append(self._format_tex_row("Total ({})".format(sum(map(len, groups.values()))), optimals))
             lines.append(r"\end{tabular}\end{center}")
             return "\n".join(lines)
         else:
             return r"\textbf{NO DATA}"
     
     def _format_txt(self, groups):
-        lines = [",".join(["domain", "count"] + self.report.algorithm_names)]
+        header = ["domain", "count"] + self.report.algorithm_names
+        if self.bootstrap:
+            header += [alg + "_lower" for alg in self.report.algorithm_names]
+            header += [alg + "_upper" for alg in self.report.algorithm_names]
+        lines = [",".join(header)]
         if len(groups) > 0:
             for group, problems in groups.items():
                 optimals = []
                 for problem, algorithms in problems.items():
                     optimals.append(self._get_optimal(list(map(lambda run: run[self.attribute], algorithms))))
-                line = ["{:.7f}".format(sum(x) / len(x)) for x in zip(*optimals)]
-                lines.append(",".join([group, str(len(problems))] + line))
+                lines.append(self._format_txt_row(group, len(problems), optimals))
             optimals = []
             for group, problems in groups.items():
                 for problem, algorithms in problems.items():
                     optimals.append(self._get_optimal(list(map(lambda run: run[self.attribute], algorithms))))
-            line = ["{:.7f}".format(sum(x) / len(x)) for x in zip(*optimals)]
-            lines.append(",".join(["_total", str(sum(map(len, groups.values())))] + line))
+            lines.append(self._format_txt_row("_total", sum(map(len, groups.values())), optimals))
         return "\n".join(lines)
     
     def format(self, groups):
@@ -93,7 +123,8 @@ class IdealProblemsEvaluator:
     OUTPUT_FORMATS = "txt".split()
     """
     Creates a table of all problems, with a selection of attributes
-    and the performance of strategies for comparison.
+    and the performance of strategies for comparison. The last column
+    names the ideal strategy for each problem.
     """
     def __init__(self, eval_attribute):
         self.eval_attribute = eval_attribute
@@ -108,7 +139,7 @@ class IdealProblemsEvaluator:
         lines = []
         attrib_names = list(self.report.attributes)
         attrib_names.remove(self.eval_attribute)
-        lines.append(",".join(["domain", "problem"] + attrib_names + self.report.algorithm_names))
+        lines.append(",".join(["domain", "problem"] + attrib_names + self.report.algorithm_names + ["ideal"]))
         if len(groups) > 0:
             for group, problems in groups.items():
                 for problem, algorithms in problems.items():
@@ -117,6 +148,7 @@ class IdealProblemsEvaluator:
                     line = [group, problem]
                     line += list(map(lambda attrib: str(algorithms[0][attrib]), attrib_names))
                     line += list(map(lambda alg: str(alg[self.eval_attribute]), algorithms))
+                    line.append(ideal)
                     lines.append(",".join(line))
         return "\n".join(lines)
     
@@ -165,13 +197,15 @@ class AttributeStatisticsEvaluator:
     def format(self, groups):
         return getattr(self, "_format_" + self.report.output_format)(groups)
 
-class DomainComparisonReport(PlanningReport):
+class DomainComparisonReport(CustomReport, PlanningReport):
     """
     Creates a TeX file determining how often an algorithm
     is optimal with respect to a given attribute.
+    Problems are grouped by *group_by* (see domain_groups.make_group_key).
     """
-    def __init__(self, algorithms, evaluator, min_group_size=1, **kwargs):
-        PlanningReport.__init__(self, **kwargs)
+    def __init__(self, algorithms, evaluator, min_group_size=1, group_by=None, **kwargs):
+        super(DomainComparisonReport, self).__init__(**kwargs)
+        algorithms = [algorithm_key(alg) for alg in algorithms]
         if len(set(self.attributes)) != len(self.attributes):
             raise ValueError("Attributes may not appear multiple times")
         if len(algorithms) < 1:
@@ -181,6 +215,7 @@ class DomainComparisonReport(PlanningReport):
         self.algorithm_names = algorithms
         self.algorithm_idx = {alg: i for i, alg in enumerate(algorithms)}
         self.evaluator = evaluator
+        self.group_key = make_group_key(group_by)
         # values less than one imply no bound
         self.min_group_size = min_group_size
         evaluator.setReport(self)
@@ -194,19 +229,22 @@ class DomainComparisonReport(PlanningReport):
         return self.get_markup()
     
     def get_markup(self):
-        # gather runs indexed by group, problem into a list of algorithms
-        groups = defaultdict(lambda: defaultdict(lambda: [None] * len(self.algorithm_names)))
-        for run in self.props.values():
-            if self._is_run_valid(run):
-                groups[run["domain"]][run["problem"]][self.algorithm_idx[run["algorithm"]]] = run
-        # remove problems which aren't solved by all algorithms
-        for group, problems in groups.items():
-            for problem, algorithms in list(problems.items()):
-                if not all(algorithms):
-                    del problems[problem]
-        # remove domains which don't meet the min_group_size
-        for group, problems in list(groups.items()):
-            if len(problems) < self.min_group_size:
-                del groups[group]
+        with self.phase("aggregate"):
+            # gather runs indexed by group, problem into a list of algorithms
+            groups = defaultdict(lambda: defaultdict(lambda: [None] * len(self.algorithm_names)))
+            for run in self.props.values():
+                if self._is_run_valid(run):
+                    group, problem = self.group_key(run)
+                    groups[group][problem][self.algorithm_idx[run["algorithm"]]] = run
+            # remove problems which aren't solved by all algorithms
+            for group, problems in groups.items():
+                for problem, algorithms in list(problems.items()):
+                    if not all(algorithms):
+                        del problems[problem]
+            # remove domains which don't meet the min_group_size
+            for group, problems in list(groups.items()):
+                if len(problems) < self.min_group_size:
+                    del groups[group]
         # call evaluator to sample data of interest
-        return self.evaluator.format(groups)
+        with self.phase("evaluate"):
+            return self.evaluator.format(groups)
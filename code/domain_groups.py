@@ -1,5 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import re
+import sys
+
+try:
+    intern = sys.intern
+except AttributeError:
+    # Python 2 has intern as a builtin
+    pass
+
 DOMAIN_GROUPS = {
     "airport": ["airport"],
     "barman": ["barman-opt11-strips", "barman-opt14-strips"],
@@ -57,8 +66,106 @@ for group_name, domains in DOMAIN_GROUPS.items():
     for domain in domains:
         DOMAIN_RENAMINGS[domain] = group_name
 
+# Suffixes removed from unknown domains before looking them up again,
+# e.g. "hiking-opt18-strips" is grouped like "hiking".
+DEFAULT_SUFFIXES = [r"-opt\d+-strips$", r"-\d+-strips$", r"-strips$"]
+
+class DomainGrouping(object):
+    """
+    Resolves domains to groups. Each domain is resolved only once, the
+    resulting group names are interned and numbered by first appearance,
+    so groups can be compared and stored as small integer codes.
+
+    Domains missing from *groups* are matched against *rules*, a list of
+    (regex, group) pairs where group may use backreferences, and then
+    looked up again (also as group name) with each of the *suffixes*
+    removed. If nothing
+    matches, the domain forms its own group, or a KeyError is raised if
+    *strict* is True.
+    """
+    def __init__(self, groups=DOMAIN_GROUPS, rules=(), suffixes=DEFAULT_SUFFIXES, strict=False):
+        self._renamings = {domain: group for group, domains in groups.items() for domain in domains}
+        # group names also stand for themselves, e.g. "hiking-opt18-strips" -> "hiking"
+        for group in groups:
+            self._renamings.setdefault(group, group)
+        self.rules = [(re.compile(regex), group) for regex, group in rules]
+        self.suffixes = [re.compile(suffix) for suffix in suffixes]
+        self.strict = strict
+        self.group_names = []
+        self._group_codes = {}
+        self._domain_codes = {}
+    
+    def _resolve(self, domain):
+        if domain in self._renamings:
+            return self._renamings[domain]
+        for regex, group in self.rules:
+            match = regex.search(domain)
+            if match:
+                return match.expand(group)
+        for suffix in self.suffixes:
+            stripped = suffix.sub("", domain)
+            if stripped != domain and stripped in self._renamings:
+                return self._renamings[stripped]
+        if self.strict:
+            raise KeyError(domain)
+        return domain
+    
+    def code(self, domain):
+        """Return the integer code of the group of *domain*."""
+        code = self._domain_codes.get(domain)
+        if code is None:
+            group = intern(str(self._resolve(domain)))
+            code = self._group_codes.get(group)
+            if code is None:
+                code = len(self.group_names)
+                self._group_codes[group] = code
+                self.group_names.append(group)
+            self._domain_codes[domain] = code
+        return code
+    
+    def group(self, domain):
+        return self.group_names[self.code(domain)]
+    
+    def key(self, run):
+        """
+        Return the (group, problem) key of a run. Problems are prefixed
+        with their domain since problem names repeat across the domains
+        of a group.
+        """
+        domain = run["domain"]
+        return self.group_names[self.code(domain)], domain + "-" + run["problem"]
+    
+    def codes(self, runs):
+        """Return a dict from run ids to group codes for a dict of runs."""
+        return {run_id: self.code(run["domain"]) for run_id, run in runs.items()}
+    
+    def _fingerprint(self):
+        # the codes depend on the order domains were seen in, not on the grouping
+        return [self._renamings, self.rules, self.suffixes, self.strict]
+
+DOMAIN_GROUPING = DomainGrouping()
+
+def make_group_key(group_by=None):
+    """
+    Return a function mapping a run to its (group, problem) key.
+    *group_by* may be None (group by the run's domain), a DomainGrouping,
+    the name of a run attribute holding a precomputed group, or a
+    function returning the key itself.
+    """
+    if group_by is None:
+        return lambda run: (run["domain"], run["problem"])
+    if isinstance(group_by, DomainGrouping):
+        return group_by.key
+    if isinstance(group_by, str):
+        return lambda run: (run[group_by], run["domain"] + "-" + run["problem"])
+    return group_by
+
 def group_domains(run):
+    """
+    Filter renaming each run's domain to its group. Prefer passing
+    group_by=DOMAIN_GROUPING to reports, which leaves the runs untouched.
+    """
     old_domain = run["domain"]
-    run["domain"] = DOMAIN_RENAMINGS[old_domain]
+    run["domain"] = DOMAIN_GROUPING.group(old_domain)
     run["problem"] = old_domain + "-" + run["problem"]
     return run
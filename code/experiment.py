@@ -1,12 +1,39 @@
 #! /usr/bin/env python
 
+import copy
 import os.path
 
-from downward.experiment import FastDownwardExperiment
+from downward.experiment import FastDownwardExperiment, FastDownwardRun
+from lab import tools
+from lab.steps import Step
+
+import run_archive
+import run_retry
+import run_table
+import seeds as seeding
+
+DIR = os.path.dirname(os.path.abspath(__file__))
 
 class CEGARExperiment(FastDownwardExperiment):
 	def __init__(self, soft_limit=1024, hard_limit=10240, *args, **kwargs):
-		FastDownwardExperiment.__init__(self, *args, **kwargs)
+		# keep the arguments, a retry experiment is set up the same way
+		kwargs = dict(zip(["path", "environment", "revision_cache"], args), **kwargs)
+		self._experiment_kwargs = kwargs
+		self._algorithm_calls = []
+		self._suite_calls = []
+		self._parser_paths = []
+		self._seeded_calls = []
+		# dict from seeded algorithm names to (replicated algorithm, seed, whether it runs initially)
+		self._seeded = {}
+		# dict from replicated algorithms to their seeds and initial number of seeds
+		self.seeds = {}
+		self.min_seeds = {}
+		# dict from run ids to the limits to escalate, None for all runs
+		self.retry_runs = None
+		self.retry_factors = {}
+		# seconds between resource samples, None disables sampling
+		self.sampling_interval = None
+		FastDownwardExperiment.__init__(self, **kwargs)
 		self.soft_limit = soft_limit
 		self.hard_limit = hard_limit
 		# Add built-in parsers to the experiment.
@@ -15,14 +42,207 @@ class CEGARExperiment(FastDownwardExperiment):
 		self.add_parser(self.SINGLE_SEARCH_PARSER)
 		self.add_parser(self.PLANNER_PARSER)
 		# Add custom parsers to the experiment.
-		DIR = os.path.dirname(os.path.abspath(__file__))
 		self.add_parser(os.path.join(DIR, "start-parser.py"))
 		self.add_parser(os.path.join(DIR, "split-time-parser.py"))
 		self.add_parser(os.path.join(DIR, "average-split-parser.py"))
 	
+	def add_algorithm(self, *args, **kwargs):
+		self._algorithm_calls.append((args, kwargs))
+		FastDownwardExperiment.add_algorithm(self, *args, **kwargs)
+	
+	def add_suite(self, *args, **kwargs):
+		self._suite_calls.append((args, kwargs))
+		FastDownwardExperiment.add_suite(self, *args, **kwargs)
+	
+	def add_seeded_algorithm(self, name, repo, rev, component_options, seeds=range(10), min_seeds=None,
+			**kwargs):
+		"""
+		Add the algorithm *name* once for every seed in *seeds*, named
+		"<name>-seed<seed>". "{seed}" in *component_options* is replaced
+		by the seed, or if there is none, the value of every random_seed
+		option. The runs get the properties "seed" and
+		"replicated_algorithm". Only the first *min_seeds* seeds (all by
+		default) run initially, see add_seed_steps for the others.
+		"""
+		seed_list = list(seeds)
+		min_seeds = len(seed_list) if min_seeds is None else min_seeds
+		self._seeded_calls.append(((name, repo, rev, component_options),
+			dict(kwargs, seeds=seed_list, min_seeds=min_seeds)))
+		self.seeds[name] = seed_list
+		self.min_seeds[name] = min_seeds
+		for index, seed in enumerate(seed_list):
+			algorithm = seeding.seeded_name(name, seed)
+			self._seeded[algorithm] = (name, seed, index < min_seeds)
+			FastDownwardExperiment.add_algorithm(self, algorithm, repo, rev,
+				seeding.seed_options(component_options, seed), **kwargs)
+	
+	def add_parser(self, path_to_parser):
+		self._parser_paths.append(path_to_parser)
+		FastDownwardExperiment.add_parser(self, path_to_parser)
+	
 	def _add_runs(self):
-		FastDownwardExperiment._add_runs(self)
+		if self.retry_runs is None:
+			FastDownwardExperiment._add_runs(self)
+			# further seeds only run in subset experiments
+			self.runs = [run for run in self.runs
+				if self._seeded.get(run.algo.name, (None, None, True))[2]]
+		else:
+			for algo in self._algorithms.values():
+				for task in self._get_tasks():
+					kinds = self.retry_runs.get((algo.name, task.domain, task.problem))
+					if kinds is not None:
+						run = FastDownwardRun(self, algo, task)
+						if kinds:
+							run.set_property('retry_kinds', kinds)
+							self._escalate_driver_options(run, kinds)
+						self.add_run(run)
 		for run in self.runs:
+			if run.algo.name in self._seeded:
+				name, seed, _ = self._seeded[run.algo.name]
+				run.set_property('replicated_algorithm', name)
+				run.set_property('seed', seed)
+			factor = 1
+			if 'output' in run.properties.get('retry_kinds', []):
+				factor = self.retry_factors.get('output', 1)
 			command = run.commands["planner"]
-			command[1]['soft_stdout_limit'] = self.soft_limit
-			command[1]['hard_stdout_limit'] = self.hard_limit
+			command[1]['soft_stdout_limit'] = int(self.soft_limit * factor)
+			command[1]['hard_stdout_limit'] = int(self.hard_limit * factor)
+			if self.sampling_interval is not None:
+				command[0][:0] = [command[0][0], '{resource_sampler}',
+					'--interval', str(self.sampling_interval), '--']
+	
+	def _escalate_driver_options(self, run, kinds):
+		memory_factor = self.retry_factors.get('memory', 1) if 'memory' in kinds else 1
+		time_factor = self.retry_factors.get('time', 1) if 'time' in kinds else 1
+		command = run.commands["planner"][0]
+		# [python, planner, driver options..., domain, problem, component options...]
+		end = command.index('{domain}')
+		options = run_retry.escalate_driver_options(command[2:end], memory_factor, time_factor)
+		command[2:end] = options
+		run.set_property('driver_options', options)
+	
+	def add_resource_sampling(self, interval=0.5):
+		"""
+		Run the planner of every run under resource-sampler.py, which
+		samples RSS, CPU time, I/O and context switches of the planner's
+		processes every *interval* seconds (and when they start and exit)
+		into resources.bin, and add resource-parser.py to summarize the
+		samples in the properties.
+		"""
+		self.sampling_interval = interval
+		self.add_resource('resource_sampler', os.path.join(DIR, 'resource-sampler.py'))
+		self.add_parser(os.path.join(DIR, 'resource-parser.py'))
+	
+	def add_pack_step(self, name='pack', remove=True):
+		"""Pack finished run directories into one archive per run batch."""
+		self.add_step(name, run_archive.pack_runs, self.path, remove=remove)
+	
+	def add_archive_fetcher(self, name='fetch', merge=False):
+		"""Fetch properties from packed and unpacked runs."""
+		self.add_step(name, run_archive.fetch_runs, self.path, self.eval_dir, merge=merge)
+	
+	def add_export_step(self, name='export', format='npy'):
+		"""Export the fetched properties as table for faster reports."""
+		self.add_step(name, run_table.export_table, self.eval_dir, format=format)
+	
+	def add_retry_steps(self, kinds=('memory', 'output'), memory_factor=2, time_factor=2,
+			output_factor=4, environment=None):
+		"""
+		Add steps that rerun all runs that failed on one of the resource
+		limits *kinds* ('memory', 'time', 'output') with the respective
+		limit multiplied by its factor, in the experiment "<path>-retry".
+		'retry-build' writes the failed runs to the eval dir and builds
+		the retry experiment, 'retry-start' starts it, 'retry-fetch'
+		replaces the failed runs in the eval dir by their retries.
+		Pass an *environment* with a larger memory request if the
+		escalated memory limit exceeds the current one. On grids, run
+		'retry-fetch' once the retry jobs have finished.
+		"""
+		factors = {'memory': memory_factor, 'time': time_factor, 'output': output_factor}
+		retry_file = os.path.join(self.eval_dir, run_retry.RETRY_FILE)
+		self.add_step('retry-build', self._build_retry, retry_file, kinds, factors, environment)
+		self.add_step('retry-start', self._start_retry, retry_file, factors, environment)
+		self.add_step('retry-fetch', run_archive.fetch_runs, self.path + '-retry', self.eval_dir, merge=True)
+	
+	def add_seed_steps(self, attribute='expansions_until_last_jump', relative_ci=0.05, batch=1,
+			confidence=0.95, environment=None):
+		"""
+		Add steps that run further seeds of the algorithms added by
+		add_seeded_algorithm, but only on tasks where the seeds so far
+		don't agree: some but not all seeds solved the task, or the
+		*confidence* interval of the mean of *attribute* is wider than
+		*relative_ci* times the mean. 'seeds-build' selects the next
+		*batch* seeds of these tasks and builds them in the experiment
+		"<path>-seeds", 'seeds-start' starts it and 'seeds-fetch' adds
+		the runs to the eval dir. Repeat the steps until 'seeds-build'
+		finds no more runs.
+		"""
+		seed_file = os.path.join(self.eval_dir, seeding.SEED_FILE)
+		self.add_step('seeds-build', self._build_seeds, seed_file, attribute, relative_ci, batch,
+			confidence, environment)
+		self.add_step('seeds-start', self._start_seeds, seed_file, environment)
+		self.add_step('seeds-fetch', run_archive.fetch_runs, self.path + '-seeds', self.eval_dir, merge=True)
+	
+	def _make_subset_experiment(self, suffix, run_kinds, factors, environment):
+		"""
+		Return an experiment at "<path><suffix>" set up like this one,
+		with only the runs in *run_kinds*, a dict from run ids to the
+		limits to escalate by *factors*.
+		"""
+		kwargs = dict(self._experiment_kwargs, path=self.path + suffix,
+			environment=copy.copy(environment or self.environment))
+		subset = CEGARExperiment(self.soft_limit, self.hard_limit, **kwargs)
+		if self.sampling_interval is not None:
+			subset.add_resource_sampling(self.sampling_interval)
+		for path in self._parser_paths:
+			if path not in subset._parser_paths:
+				subset.add_parser(path)
+		for args, kwargs in self._algorithm_calls:
+			subset.add_algorithm(*args, **kwargs)
+		for args, kwargs in self._seeded_calls:
+			subset.add_seeded_algorithm(*args, **kwargs)
+		for args, kwargs in self._suite_calls:
+			subset.add_suite(*args, **kwargs)
+		subset.retry_runs = run_kinds
+		subset.retry_factors = factors
+		return subset
+	
+	def _make_retry_experiment(self, failed, factors, environment):
+		run_kinds = {tuple(entry['id']): entry['kinds'] for entry in failed}
+		return self._make_subset_experiment('-retry', run_kinds, factors, environment)
+	
+	def _build_retry(self, retry_file, kinds, factors, environment):
+		props = tools.Properties(filename=os.path.join(self.eval_dir, 'properties'))
+		failed = run_retry.find_failed_runs(props, kinds)
+		run_retry.write_retry_runs(retry_file, failed)
+		if failed:
+			self._make_retry_experiment(failed, factors, environment).build()
+	
+	def _start_retry(self, retry_file, factors, environment):
+		failed = run_retry.read_retry_runs(retry_file)
+		if not failed:
+			return
+		self._start_subset(self._make_retry_experiment(failed, factors, environment))
+	
+	def _start_subset(self, subset):
+		# grid environments need the runs to size their job arrays
+		subset.build(write_to_disk=False)
+		subset.environment.run_steps([Step('start', subset.start_runs)])
+	
+	def _make_seed_experiment(self, runs, environment):
+		run_kinds = {tuple(run_id): [] for run_id in runs}
+		return self._make_subset_experiment('-seeds', run_kinds, {}, environment)
+	
+	def _build_seeds(self, seed_file, attribute, relative_ci, batch, confidence, environment):
+		props = tools.Properties(filename=os.path.join(self.eval_dir, 'properties'))
+		min_seeds = min(self.min_seeds.values()) if self.min_seeds else 0
+		unstable = seeding.find_unstable_tasks(props, attribute, relative_ci, min_seeds, confidence)
+		runs = seeding.next_seed_runs(unstable, self.seeds, batch)
+		seeding.write_seed_runs(seed_file, runs)
+		if runs:
+			self._make_seed_experiment(runs, environment).build()
+	
+	def _start_seeds(self, seed_file, environment):
+		runs = seeding.read_seed_runs(seed_file)
+		if runs:
+			self._start_subset(self._make_seed_experiment(runs, environment))
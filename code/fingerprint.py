@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Stable descriptions of report parameters and code, used by CustomReport
+to skip reports whose inputs didn't change since the last run.
+
+describe() turns an object into a JSON-compatible structure that only
+depends on its value: functions are described by their name, source,
+closure and the globals they read, other objects by their type and
+attributes. Objects whose
+attributes include caches can define a _fingerprint() method returning
+the state that matters instead.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+import types
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:
+    STRING_TYPES = (str,)
+
+# default reprs contain the address of the object, which changes every run
+ADDRESS = re.compile(r" at 0x[0-9a-fA-F]+")
+PATTERN_TYPE = type(re.compile(""))
+# modules in this directory count as code of the reports using them
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def digest(value):
+    """Return the SHA-1 hex digest of a JSON-compatible *value*."""
+    text = json.dumps(value, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _sort_key(description):
+    return json.dumps(description, sort_keys=True)
+
+
+def _source(function):
+    try:
+        return inspect.getsource(function)
+    except (IOError, OSError, TypeError):
+        code = getattr(function, "__code__", None)
+        return repr(code.co_code) if code is not None else ""
+
+
+def _global_names(code):
+    """Return the names *code* and the functions nested in it look up."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(_global_names(const))
+    return names
+
+
+def _describe_function(function, path):
+    name = "{}.{}".format(getattr(function, "__module__", None),
+        getattr(function, "__qualname__", getattr(function, "__name__", "?")))
+    if isinstance(function, types.BuiltinFunctionType):
+        return ["builtin", name]
+    closure = [cell.cell_contents for cell in function.__closure__ or ()]
+    # e.g. DOMAIN_GROUPING used by a filter; attribute names are
+    # included too, but only those that are globals are found
+    used_globals = {global_name: function.__globals__[global_name]
+        for global_name in _global_names(function.__code__) if global_name in function.__globals__}
+    return ["function", name, hashlib.sha1(_source(function).encode("utf-8")).hexdigest(),
+        describe(closure, path), describe(function.__defaults__, path), describe(used_globals, path)]
+
+
+def describe(obj, path=()):
+    """Return a JSON-compatible description of *obj* (see module docstring)."""
+    if obj is None or isinstance(obj, (bool, int, float)):
+        return obj
+    if type(obj) in STRING_TYPES:
+        return obj
+    if id(obj) in path:
+        return ["cycle"]
+    path = path + (id(obj),)
+    if isinstance(obj, (list, tuple)):
+        return [describe(item, path) for item in obj]
+    if isinstance(obj, (set, frozenset)):
+        return sorted((describe(item, path) for item in obj), key=_sort_key)
+    if isinstance(obj, dict):
+        return sorted(([describe(key, path), describe(value, path)] for key, value in obj.items()),
+            key=lambda item: _sort_key(item[0]))
+    if hasattr(obj, "_fingerprint") and not isinstance(obj, type):
+        return [type(obj).__name__, describe(obj._fingerprint(), path)]
+    if isinstance(obj, types.MethodType):
+        return ["method", _describe_function(obj.__func__, path), describe(obj.__self__, path)]
+    if isinstance(obj, (types.FunctionType, types.BuiltinFunctionType)):
+        return _describe_function(obj, path)
+    if isinstance(obj, PATTERN_TYPE):
+        return ["pattern", obj.pattern, obj.flags]
+    if isinstance(obj, (type, types.ModuleType)):
+        return ["name", getattr(obj, "__module__", None), obj.__name__]
+    if hasattr(obj, "tobytes") and hasattr(obj, "dtype"):
+        return ["array", str(obj.dtype), list(getattr(obj, "shape", ())),
+            hashlib.sha1(obj.tobytes()).hexdigest()]
+    name = "{}.{}".format(type(obj).__module__, type(obj).__name__)
+    state = {}
+    if hasattr(obj, "__dict__"):
+        state.update(vars(obj))
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            state[slot] = getattr(obj, slot)
+    if isinstance(obj, STRING_TYPES):
+        # e.g. lab's Attribute
+        return [name, str(obj), describe(state, path)]
+    if state:
+        return [name, describe(state, path)]
+    return [name, ADDRESS.sub("", repr(obj))]
+
+
+def _is_local(module):
+    path = getattr(module, "__file__", None)
+    return bool(path) and os.path.dirname(os.path.abspath(path)) == LOCAL_DIR
+
+
+def _code_modules(cls):
+    """
+    Return the names of the modules defining *cls* and its base classes
+    and of all modules of this directory they use, directly or through
+    other modules of this directory.
+    """
+    names = set(base.__module__ for base in cls.__mro__)
+    stack = [name for name in names if _is_local(sys.modules.get(name))]
+    while stack:
+        for value in list(vars(sys.modules[stack.pop()]).values()):
+            if isinstance(value, types.ModuleType):
+                name = value.__name__
+            else:
+                name = getattr(value, "__module__", None)
+            if isinstance(name, STRING_TYPES) and name not in names and _is_local(sys.modules.get(name)):
+                names.add(name)
+                stack.append(name)
+    return sorted(names)
+
+
+def code_digest(cls):
+    """
+    Return a digest of the source files of the modules defining *cls*
+    and its base classes and of the modules of this directory they use
+    (e.g. domain_groups or seeds), so changing them rebuilds the
+    report's outputs.
+    """
+    sha = hashlib.sha1()
+    for name in _code_modules(cls):
+        module = sys.modules.get(name)
+        path = getattr(module, "__file__", None)
+        if not path:
+            continue
+        if path.endswith((".pyc", ".pyo")):
+            path = path[:-1]
+        sha.update(name.encode("utf-8"))
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                sha.update(f.read())
+    return sha.hexdigest()
+
+
+def file_stats(paths):
+    """Return {path: [size, mtime]} of the existing *paths*."""
+    stats = {}
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stats[os.path.abspath(path)] = [stat.st_size, repr(stat.st_mtime)]
+    return stats
+
+
+def read(path):
+    """Return the fingerprint stored at *path*, or None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def write(path, fingerprint):
+    with open(path, "w") as f:
+        json.dump(fingerprint, f, indent=2, sort_keys=True)
@@ -5,7 +5,10 @@ from collections import defaultdict
 
 from downward.reports import PlanningReport
 
-class HeuristicStatisticsReport(PlanningReport):
+from custom_report import CustomReport
+from merged_data import algorithm_key
+
+class HeuristicStatisticsReport(CustomReport, PlanningReport):
     """
     Creates a CSV with the best/worst (according to eval_attrib) h_split_statistics values.
     """
@@ -15,9 +18,9 @@ class HeuristicStatisticsReport(PlanningReport):
         elif kwargs["format"] != "txt":
             raise ValueError("unsupported format: {}".format(kwargs["format"]))
         kwargs["attributes"] = ["h_split_statistics"]
-        PlanningReport.__init__(self, **kwargs)
+        super(HeuristicStatisticsReport, self).__init__(**kwargs)
         self.attribute = self.attributes[0]
-        self.algorithm = algorithm
+        self.algorithm = algorithm_key(algorithm)
         if n_best <= 0 and n_worst <= 0:
             raise ValueError("Report must select at least one run")
         self.n_best = n_best
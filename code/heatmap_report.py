@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
+
+class HeatmapReport(CustomReport, PlanningReport):
+    """
+    Creates a CSV with the joint histogram of two attributes (x and y
+    in the given order) per algorithm and per group if *group_by* is
+    given, ready for the "matrix plot" of PGFPlots: one row per cell
+    with the bin centers "x" and "y" and a count column per algorithm,
+    the rows of a y bin separated by an empty line (use
+    mesh/cols=*bins[0]*).
+
+    *bins* are the number of bins per axis, *ranges* optional
+    (min, max) pairs per axis, by default the range of the data. Axes
+    with *log* set are binned logarithmically (with geometric bin
+    centers) and ignore values that aren't positive. With *normalize*,
+    every column is divided by its number of runs.
+    """
+    def __init__(self, algorithms=None, bins=(20, 20), ranges=(None, None), log=(False, False),
+            normalize=False, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "txt"
+        elif kwargs["format"] != "txt":
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        super(HeatmapReport, self).__init__(**kwargs)
+        # PlanningReport sorts the attributes, keep the axes in order
+        self.axes = list(kwargs.get("attributes") or [])
+        if len(self.axes) != 2:
+            raise ValueError("Report needs exactly two attributes")
+        self.bins = [int(count) for count in bins]
+        if len(self.bins) != 2 or min(self.bins) < 1:
+            raise ValueError("Report needs a positive number of bins per axis: {}".format(bins))
+        self.ranges = list(ranges)
+        for bounds in self.ranges:
+            if bounds is not None and bounds[0] >= bounds[1]:
+                raise ValueError("min must be below max: {} >= {}".format(*bounds))
+        self.log = list(log)
+        for bounds, log_axis in zip(self.ranges, self.log):
+            if log_axis and bounds is not None and bounds[0] <= 0:
+                raise ValueError("log axes need a positive range: {}".format(bounds))
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.normalize = normalize
+        self.group_by = group_by
+        self.group_key = make_group_key(group_by)
+
+    def _collect(self, algorithms):
+        """
+        Return the groups and the (x, y, group index, algorithm index)
+        of every run with both attributes.
+        """
+        alg_idx = {alg: i for i, alg in enumerate(algorithms)}
+        groups, group_idx = [], {}
+        samples = []
+        for run in self.props.values():
+            idx = alg_idx.get(run["algorithm"])
+            x, y = run.get(self.axes[0]), run.get(self.axes[1])
+            if idx is None or x is None or y is None:
+                continue
+            group = "Total" if self.group_by is None else self.group_key(run)[0]
+            if group not in group_idx:
+                group_idx[group] = len(groups)
+                groups.append(group)
+            samples.append((x, y, group_idx[group], idx))
+        return groups, np.array(samples, dtype=float).reshape(len(samples), 4)
+
+    def _edges(self, values, axis):
+        """Return the bin edges of *axis* and the mask of the values on it."""
+        valid = np.isfinite(values)
+        if self.log[axis]:
+            valid &= values > 0
+        bounds = self.ranges[axis]
+        if bounds is None:
+            if not valid.any():
+                return None, valid
+            bounds = values[valid].min(), values[valid].max()
+            if bounds[0] == bounds[1]:
+                bounds = (bounds[0] / 2, bounds[0] * 2) if self.log[axis] else (bounds[0] - 0.5, bounds[0] + 0.5)
+        if self.log[axis]:
+            edges = np.logspace(np.log10(bounds[0]), np.log10(bounds[1]), self.bins[axis] + 1)
+        else:
+            edges = np.linspace(bounds[0], bounds[1], self.bins[axis] + 1)
+        return edges, valid
+
+    def _centers(self, edges, axis):
+        if self.log[axis]:
+            return np.sqrt(edges[:-1] * edges[1:])
+        return (edges[:-1] + edges[1:]) / 2
+
+    def _histograms(self, algorithms):
+        """
+        Return (groups, x centers, y centers, counts) with counts of
+        shape (groups x algorithms x x bins x y bins).
+        """
+        groups, samples = self._collect(algorithms)
+        if len(samples) == 0:
+            # without groups there are no category bins, even with given ranges
+            return groups, None, None, None
+        x_edges, x_valid = self._edges(samples[:, 0], 0)
+        y_edges, y_valid = self._edges(samples[:, 1], 1)
+        if x_edges is None or y_edges is None:
+            return groups, None, None, None
+        samples = samples[x_valid & y_valid]
+        # one pass over all runs, the categories as extra dimensions
+        counts, _ = np.histogramdd(samples[:, [2, 3, 0, 1]], bins=[
+            np.arange(len(groups) + 1) - 0.5, np.arange(len(algorithms) + 1) - 0.5, x_edges, y_edges])
+        return groups, self._centers(x_edges, 0), self._centers(y_edges, 1), counts
+
+    def _columns(self, groups, algorithms, counts):
+        """Return the column names and the (cells x columns) counts, Total last."""
+        order = {algorithm: i for i, algorithm in enumerate(algorithms)}
+        names, columns = [], []
+        if self.group_by is None:
+            keys = [(0, i) for i in range(len(algorithms))]
+        else:
+            keys = sorted(((g, i) for g in range(len(groups)) for i in range(len(algorithms))),
+                key=lambda key: (groups[key[0]], order[algorithms[key[1]]]))
+        for g, i in keys:
+            names.append(algorithms[i] if self.group_by is None else groups[g] + "_" + algorithms[i])
+            columns.append(counts[g, i])
+        if self.group_by is not None:
+            for i, algorithm in enumerate(algorithms):
+                names.append("Total_" + algorithm)
+                columns.append(counts[:, i].sum(axis=0))
+        columns = np.array(columns)
+        if self.normalize:
+            totals = columns.sum(axis=(1, 2))
+            columns = columns / np.where(totals > 0, totals, 1)[:, np.newaxis, np.newaxis]
+        # cells ordered by y, then x, as "matrix plot" reads scanlines
+        return names, columns.transpose(0, 2, 1).reshape(len(names), -1).T
+
+    def _format_value(self, value):
+        return "{:g}".format(value)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            groups, x, y, counts = self._histograms(algorithms)
+        if counts is None:
+            return ""
+        names, cells = self._columns(groups, algorithms, counts)
+        lines = [",".join(["x", "y"] + names)]
+        for j, y_center in enumerate(y):
+            if j > 0:
+                lines.append("")
+            for i, x_center in enumerate(x):
+                row = cells[j * len(x) + i]
+                lines.append(",".join([self._format_value(x_center), self._format_value(y_center)] +
+                    [self._format_value(value) for value in row]))
+        return "\n".join(lines)
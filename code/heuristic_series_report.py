@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+from series_tools import pack_series, normalize_progress, resample, summarize
+
+# value columns of h_split_statistics entries [N, best h, distinct ratings]
+STATISTICS = {"h": 1, "distinct": 2}
+
+class HeuristicSeriesReport(CustomReport, PlanningReport):
+    """
+    Aggregates the h_split_statistics of all runs into mean and quantile
+    curves per algorithm (and per group if *group_by* is given).
+
+    Every series is resampled onto a common grid of *num_points* values
+    of N, or of the refinement progress N / N_last in [0, 1] if
+    *progress* is set. A list of grid points can be passed as *grid*
+    instead. With *hold_last*, a series keeps its last value after
+    refinement stopped, otherwise it only contributes while it runs.
+    The output is a CSV with one row per grid point, ready for PGFPlots.
+    """
+    def __init__(self, algorithms=None, statistics=("h", "distinct"), quantiles=(0.25, 0.5, 0.75),
+            num_points=100, grid=None, progress=False, hold_last=False, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "txt"
+        elif kwargs["format"] != "txt":
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        kwargs["attributes"] = ["h_split_statistics"]
+        super(HeuristicSeriesReport, self).__init__(**kwargs)
+        for statistic in statistics:
+            if statistic not in STATISTICS:
+                raise ValueError("unknown statistic: {}".format(statistic))
+        if grid is None and num_points < 2:
+            raise ValueError("Grid needs at least two points")
+        self.attribute = self.attributes[0]
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.statistics = list(statistics)
+        self.quantiles = list(quantiles)
+        self.num_points = num_points
+        self.grid = grid
+        self.progress = progress
+        self.hold_last = hold_last
+        self.group_by = group_by
+        self.group_key = make_group_key(group_by)
+
+    def _collect(self, algorithms):
+        """Return a dict from (group, algorithm) to a list of sorted statistics arrays."""
+        wanted = set(algorithms)
+        series = defaultdict(list)
+        for run in self.props.values():
+            statistics = run.get(self.attribute)
+            if not statistics or run["algorithm"] not in wanted:
+                continue
+            statistics = np.array(statistics, dtype=float)
+            statistics = statistics[np.argsort(statistics[:, 0], kind="mergesort")]
+            series[("Total", run["algorithm"])].append(statistics)
+            if self.group_by is not None:
+                series[(self.group_key(run)[0], run["algorithm"])].append(statistics)
+        return series
+
+    def _make_grid(self, series):
+        if self.grid is not None:
+            return np.asarray(self.grid, dtype=float)
+        if self.progress:
+            return np.linspace(0, 1, self.num_points)
+        last = max(s[-1, 0] for runs in series.values() for s in runs)
+        return np.linspace(1, max(last, 1), self.num_points)
+
+    def _curves(self, runs, grid):
+        """Return the output columns (name suffix, values) for one list of series."""
+        x, _, offsets = pack_series([(s[:, 0], s[:, 0]) for s in runs])
+        if self.progress:
+            x = normalize_progress(x, offsets)
+        columns = []
+        for statistic in self.statistics:
+            # the planner reports h values negated, like HeuristicStatisticsReport
+            y = np.abs(np.concatenate([s[:, STATISTICS[statistic]] for s in runs]))
+            count, mean, quantiles = summarize(resample(x, y, offsets, grid, self.hold_last), self.quantiles)
+            if not columns:
+                columns.append(("count", count))
+            columns.append((statistic + "_mean", mean))
+            for q, values in zip(self.quantiles, quantiles):
+                columns.append(("{}_q{:g}".format(statistic, 100 * q), values))
+        return columns
+
+    def _format_value(self, value):
+        return "" if np.isnan(value) else "{:g}".format(value)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            series = self._collect(algorithms)
+        if not series:
+            return ""
+        grid = self._make_grid(series)
+        header, columns = ["progress" if self.progress else "N"], [grid]
+        with self.phase("resample"):
+            for group, algorithm in sorted(series, key=lambda key: (key[0] == "Total", key)):
+                prefix = algorithm if self.group_by is None else group + "_" + algorithm
+                for name, values in self._curves(series[(group, algorithm)], grid):
+                    header.append(prefix + "_" + name)
+                    columns.append(values)
+        lines = [",".join(header)]
+        for row in np.column_stack(columns):
+            lines.append(",".join(self._format_value(value) for value in row))
+        return "\n".join(lines)
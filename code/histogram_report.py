@@ -4,19 +4,23 @@ from collections import defaultdict
 
 from downward.reports import PlanningReport
 
-class HistogramReport(PlanningReport):
+from custom_report import CustomReport
+from domain_groups import make_group_key
+
+class HistogramReport(CustomReport, PlanningReport):
     """
     Creates a CSV containing a histogram of a specific attribute.
     This file can then be used via PGFPlots to create an image.
+    Per-domain columns are grouped by *group_by* (see domain_groups.make_group_key).
     """
-    def __init__(self, count=100, min=None, max=None, **kwargs):
+    def __init__(self, count=100, min=None, max=None, group_by=None, **kwargs):
         if "format" not in kwargs:
             kwargs["format"] = "txt"
         elif kwargs["format"] != "txt":
             raise ValueError("unsupported format: {}".format(kwargs["format"]))
         if min is not None and max is not None and min >= max:
             raise ValueError("min must be below max: {} >= {}".format(min, max))
-        PlanningReport.__init__(self, **kwargs)
+        super(HistogramReport, self).__init__(**kwargs)
         self.attributes = kwargs["attributes"]
         if len(self.attributes) != 1:
             raise ValueError("Report needs exactly one attribute")
@@ -24,6 +28,7 @@ class HistogramReport(PlanningReport):
         self.count = int(count)
         self.min = min
         self.max = max
+        self.group_key = make_group_key(group_by)
     
     def get_text(self):
         return self.get_markup()
@@ -49,7 +54,7 @@ class HistogramReport(PlanningReport):
         for run in self.props.values():
             val = run.get(self.attribute)
             # ensure every domain exists, even if it provides no data
-            domain = run["domain"]
+            domain = self.group_key(run)[0]
             if domain not in domainMap:
                 domainMap[domain] = len(domains)
                 domains.append(domain)
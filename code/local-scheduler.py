@@ -0,0 +1,222 @@
+#! /usr/bin/env python
+
+"""
+Job script of MemoryAwareLocalEnvironment: runs the tasks listed in
+scheduler-tasks.json, admitting them by process slots and memory budget.
+"""
+
+from __future__ import division
+
+import errno
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)-s %(levelname)-8s %(message)s")
+
+# Make sure we're in the experiment directory.
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+TASKS_FILE = "scheduler-tasks.json"
+# default budget as fraction of the physical memory
+MEMORY_FRACTION = 0.9
+
+def physical_memory():
+	# in MB
+	with open("/proc/meminfo") as f:
+		for line in f:
+			if line.startswith("MemTotal:"):
+				return int(line.split()[1]) / 1024
+	raise ValueError("MemTotal missing in /proc/meminfo")
+
+def available_cores():
+	if hasattr(os, "sched_getaffinity"):
+		return sorted(os.sched_getaffinity(0))
+	return list(range(multiprocessing.cpu_count()))
+
+def read_peak(run_dir):
+	# peak memory in MB from the properties written by the parsers
+	try:
+		with open(os.path.join(run_dir, "properties")) as f:
+			props = json.load(f)
+	except (IOError, ValueError):
+		return None
+	peak = props.get("memory_peak", props.get("memory"))
+	return None if peak is None else peak / 1024
+
+class Task(object):
+	def __init__(self, task_id, run_dir, memory):
+		self.task_id = task_id
+		self.run_dir = run_dir
+		self.memory = memory
+		self.core = None
+		self.process = None
+		self.logs = None
+		self.start = None
+		self.end = None
+		self.error = False
+
+	def launch(self, core):
+		self.core = core
+		self.logs = [open(os.path.join(self.run_dir, name), "w") for name in ["driver.log", "driver.err"]]
+		command = ["./run"]
+		preexec_fn = None
+		if core is not None:
+			if hasattr(os, "sched_setaffinity"):
+				preexec_fn = lambda: os.sched_setaffinity(0, [core])
+			else:
+				command = ["taskset", "-c", str(core)] + command
+		logging.info("Starting run {} with {:.0f} MB{} in {}".format(self.task_id, self.memory,
+			"" if core is None else " on core {}".format(core), self.run_dir))
+		self.start = time.time()
+		self.process = subprocess.Popen(command, cwd=self.run_dir, stdout=self.logs[0], stderr=self.logs[1],
+			preexec_fn=preexec_fn)
+
+	def finish(self, returncode):
+		self.end = time.time()
+		self.error = returncode != 0
+		for f in self.logs:
+			f.close()
+			if os.path.getsize(f.name) == 0:
+				os.remove(f.name)
+			elif f.name.endswith(".err"):
+				self.error = True
+
+class Scheduler(object):
+	def __init__(self, config):
+		self.processes = config["processes"]
+		self.budget = config["memory_budget"] or MEMORY_FRACTION * physical_memory()
+		self.backfill = config["backfill"]
+		self.cores = available_cores()[:self.processes] if config["pin_cores"] else None
+		if self.cores is not None and len(self.cores) < self.processes:
+			logging.warning("Only {} cores for {} processes".format(len(self.cores), self.processes))
+			self.processes = len(self.cores)
+		self.pending = [Task(task_id, task["run_dir"], task["memory"])
+			for task_id, task in enumerate(config["tasks"], 1)]
+		self.running = {}
+		self.finished = []
+		self.reserved = 0
+		# how often the first pending task was overtaken
+		self.overtaken = 0
+		# integrals of busy slots and reserved memory over time
+		self.busy_time = 0
+		self.memory_time = 0
+		self.last_event = None
+
+	def fits(self, task):
+		if len(self.running) >= self.processes:
+			return False
+		# a task larger than the budget runs alone
+		return not self.running or self.reserved + task.memory <= self.budget
+
+	def admit(self):
+		index = 0
+		while index < len(self.pending):
+			task = self.pending[index]
+			if index > 0 and self.overtaken >= self.backfill:
+				break
+			if self.fits(task):
+				self.pending.pop(index)
+				if index > 0:
+					self.overtaken += 1
+				else:
+					self.overtaken = 0
+				self.launch(task)
+			else:
+				index += 1
+
+	def launch(self, task):
+		core = None
+		if self.cores is not None:
+			used = set(other.core for other in self.running.values())
+			core = next(core for core in self.cores if core not in used)
+		task.launch(core)
+		self.running[task.process.pid] = task
+		self.reserved += task.memory
+
+	def account(self):
+		now = time.time()
+		if self.last_event is not None:
+			self.busy_time += len(self.running) * (now - self.last_event)
+			self.memory_time += self.reserved * (now - self.last_event)
+		self.last_event = now
+
+	def wait(self):
+		try:
+			pid, status = os.waitpid(-1, 0)
+		except OSError as err:
+			# Python 2 doesn't retry interrupted system calls
+			if err.errno == errno.EINTR:
+				return
+			raise
+		self.account()
+		task = self.running.pop(pid, None)
+		if task is None:
+			return
+		if os.WIFSIGNALED(status):
+			task.process.returncode = -os.WTERMSIG(status)
+		else:
+			task.process.returncode = os.WEXITSTATUS(status)
+		task.finish(task.process.returncode)
+		self.reserved -= task.memory
+		self.finished.append(task)
+		logging.info("Finished run {} after {:.1f}s ({} of {} done)".format(task.task_id,
+			task.end - task.start, len(self.finished), len(self.finished) + len(self.running) + len(self.pending)))
+
+	def run(self):
+		start = time.time()
+		logging.info("Scheduling {} runs on {} processes with {:.0f} MB".format(
+			len(self.pending), self.processes, self.budget))
+		try:
+			while self.pending or self.running:
+				self.account()
+				self.admit()
+				self.wait()
+		except KeyboardInterrupt:
+			logging.warning("Main script interrupted")
+			for task in self.running.values():
+				task.process.send_signal(signal.SIGTERM)
+			while self.running:
+				self.wait()
+		return time.time() - start
+
+	def stats(self, wall_time):
+		peaks = [(task.memory, read_peak(task.run_dir)) for task in self.finished]
+		# runs estimated at 0 MB only took a process slot
+		peaks = [(estimate, peak) for estimate, peak in peaks if peak is not None and estimate > 0]
+		wall_time = max(wall_time, 1e-9)
+		return {
+			"runs": len(self.finished),
+			"failed_runs": sum(task.error for task in self.finished),
+			"wall_time": wall_time,
+			"processes": self.processes,
+			"memory_budget": self.budget,
+			"throughput_per_hour": 3600 * len(self.finished) / wall_time,
+			"slot_utilization": self.busy_time / (self.processes * wall_time),
+			"memory_utilization": self.memory_time / (self.budget * wall_time),
+			"runs_with_peak": len(peaks),
+			"mean_peak_per_estimate": sum(peak / estimate for estimate, peak in peaks) / len(peaks) if peaks else None,
+			"underestimated_runs": sum(peak > estimate for estimate, peak in peaks),
+		}
+
+def main():
+	with open(TASKS_FILE) as f:
+		config = json.load(f)
+	scheduler = Scheduler(config)
+	stats = scheduler.stats(scheduler.run())
+	with open(config["stats_file"], "w") as f:
+		json.dump(stats, f, indent=2, sort_keys=True)
+	logging.info("Throughput: {:.1f} runs/h, slot utilization: {:.1%}, memory utilization: {:.1%}".format(
+		stats["throughput_per_hour"], stats["slot_utilization"], stats["memory_utilization"]))
+	if stats["underestimated_runs"]:
+		logging.info("{} runs needed more memory than estimated".format(stats["underestimated_runs"]))
+	if stats["failed_runs"]:
+		sys.exit("Error: At least one run failed.")
+
+if __name__ == "__main__":
+	main()
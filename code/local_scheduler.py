@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Local environment that admits runs by a memory budget instead of only
+a process count (see MemoryAwareLocalEnvironment).
+"""
+from __future__ import division
+
+import json
+import logging
+import os
+
+import numpy as np
+
+from lab.environments import LocalEnvironment
+from lab.experiment import get_run_dir
+
+import run_retry
+
+# lab prepends ["--validate", "--overall-time-limit", "30m",
+# "--overall-memory-limit", "3584M"] to the driver options of every run
+LAB_DRIVER_OPTIONS = 5
+SCHEDULER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "local-scheduler.py")
+TASKS_FILE = "scheduler-tasks.json"
+STATS_FILE = "scheduler-stats.json"
+
+
+def _run_key(run):
+    return run["algorithm"], run["domain"], run["problem"]
+
+
+def read_history(eval_dirs):
+    """
+    Return a dict from (algorithm, domain, problem) to the peak memory
+    in MB of the runs in *eval_dirs*, None for runs out of memory.
+    """
+    history = {}
+    for eval_dir in eval_dirs:
+        with open(os.path.join(eval_dir, "properties")) as f:
+            props = json.load(f)
+        for run in props.values():
+            peak = run.get("memory_peak", run.get("memory"))
+            if "out-of-memory" in (run.get("error") or ""):
+                history[_run_key(run)] = None
+            elif peak is not None:
+                history[_run_key(run)] = peak / 1024
+    logging.info("Read the peak memory of {} runs from {}".format(len(history), ", ".join(eval_dirs)))
+    return history
+
+
+def estimate_memory(runs, history=None, headroom=1.2, quantile=0.9):
+    """
+    Return the expected peak memory in MB of every run in *runs* (a list
+    of (algorithm, domain, problem, memory limit in MB)): the peak of
+    the same run in *history* times *headroom*, otherwise the *quantile*
+    of the algorithm's peaks in the history times *headroom*, and the
+    run's memory limit if there is no history or the run ran out of
+    memory. Estimates never exceed the limit.
+
+    Runs without an explicit limit (None) and without history are
+    estimated at 0 MB, so they are only scheduled by process slots.
+    If they ran out of memory, the driver's default limit is used.
+    """
+    history = history or {}
+    peaks = {}
+    for (algorithm, _, _), peak in history.items():
+        if peak is not None:
+            peaks.setdefault(algorithm, []).append(peak)
+    fallback = {algorithm: np.percentile(values, 100 * quantile) for algorithm, values in peaks.items()}
+    estimates = []
+    for algorithm, domain, problem, limit in runs:
+        key = (algorithm, domain, problem)
+        if key in history:
+            peak = history[key]
+        else:
+            peak = fallback.get(algorithm)
+        if peak is not None:
+            estimates.append(peak * headroom if limit is None else min(limit, peak * headroom))
+        elif limit is not None:
+            estimates.append(limit)
+        elif key in history:
+            estimates.append(run_retry.parse_memory_limit(run_retry.DEFAULT_MEMORY_LIMIT))
+        else:
+            estimates.append(0)
+    return estimates
+
+
+class MemoryAwareLocalEnvironment(LocalEnvironment):
+    """
+    Runs up to *processes* runs at a time like LocalEnvironment, but
+    only starts a run if the expected peak memory of all running runs
+    stays within *memory_budget* (in MB, by default 90% of the physical
+    memory of the machine running the experiment).
+
+    The expected peak of a run is its --overall-memory-limit, or, if
+    *history* lists eval dirs of earlier experiments, its peak there
+    (see estimate_memory). Runs with neither (lab's default limit
+    doesn't count) only need a process slot. Runs that don't fit may be
+    overtaken by smaller ones, but at most *backfill* times, so large
+    runs don't starve. With *pin_cores*, every run gets a core of its
+    own.
+
+    When all runs finished, the achieved throughput and the utilization
+    of the process slots and the memory budget are logged and written
+    to "scheduler-stats.json" in the experiment dir.
+    """
+    def __init__(self, processes=None, memory_budget=None, history=(), headroom=1.2,
+            backfill=None, pin_cores=False, **kwargs):
+        LocalEnvironment.__init__(self, processes=processes, **kwargs)
+        if memory_budget is not None and memory_budget <= 0:
+            raise ValueError("memory budget must be positive")
+        self.memory_budget = memory_budget
+        self.history = [history] if isinstance(history, str) else list(history)
+        self.headroom = headroom
+        self.backfill = self.processes if backfill is None else backfill
+        self.pin_cores = pin_cores
+
+    def _memory_limit(self, run):
+        """
+        Return the --overall-memory-limit of *run* in MB, or None if it
+        only has lab's default, which says nothing about what it needs.
+        """
+        options = list(run.properties.get("driver_options") or [])
+        lab_options, own_options = options[:LAB_DRIVER_OPTIONS], options[LAB_DRIVER_OPTIONS:]
+        # retries escalate lab's limit in place
+        if "--overall-memory-limit" not in own_options and \
+                run_retry.DEFAULT_MEMORY_LIMIT in lab_options[-1:]:
+            return None
+        return run_retry.driver_memory_limit(options)
+
+    def write_main_script(self):
+        runs = self.exp.runs
+        history = read_history(self.history) if self.history else None
+        estimates = estimate_memory([(run.properties["algorithm"], run.properties["domain"],
+            run.properties["problem"], self._memory_limit(run)) for run in runs], history, self.headroom)
+        tasks = [{"run_dir": get_run_dir(task_id), "memory": estimates[task_id - 1]}
+            for task_id in self._get_task_order()]
+        config = {
+            "processes": self.processes,
+            "memory_budget": self.memory_budget,
+            "backfill": self.backfill,
+            "pin_cores": self.pin_cores,
+            "stats_file": STATS_FILE,
+            "tasks": tasks,
+        }
+        self.exp.add_new_file("", TASKS_FILE, json.dumps(config, indent=1))
+        with open(SCHEDULER_SCRIPT) as f:
+            self.exp.add_new_file("", self.EXP_RUN_SCRIPT, f.read(), permissions=0o755)
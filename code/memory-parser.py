@@ -0,0 +1,56 @@
+#! /usr/bin/env python
+
+import re
+
+from lab.parser import Parser
+
+# keep the properties small for long searches
+MAX_POINTS = 1000
+# progress lines and log prefixes both end with "t=...s, ... KB]"
+SAMPLE = re.compile(r"t=([\d.]+)s, (\d+) KB\]")
+ABSTRACTION_DONE = re.compile(r"^.*Done building abstraction.*$", re.M)
+PEAK = re.compile(r"^Peak memory: (\d+) KB$", re.M)
+
+def thin(values):
+	# every k-th entry, always including the last one
+	if len(values) <= MAX_POINTS:
+		return values
+	step = -(-len(values) // MAX_POINTS)
+	thinned = values[::step]
+	if (len(values) - 1) % step:
+		thinned.append(values[-1])
+	return thinned
+
+def growth_rate(samples):
+	# least-squares slope of memory over time in KB/s
+	n = len(samples)
+	mean_t = sum(t for t, _ in samples) / float(n)
+	mean_m = sum(m for _, m in samples) / float(n)
+	var_t = sum((t - mean_t) ** 2 for t, _ in samples)
+	if var_t == 0:
+		return None
+	return sum((t - mean_t) * (m - mean_m) for t, m in samples) / var_t
+
+def memory(content, props):
+	matches = list(SAMPLE.finditer(content))
+	samples = [(float(m.group(1)), int(m.group(2))) for m in matches]
+	peaks = [int(value) for value in PEAK.findall(content)]
+	if samples or peaks:
+		props["memory_peak"] = max([m for _, m in samples] + peaks)
+	if not samples:
+		return
+	props["memory_samples"] = [[t, m] for t, m in thin(samples)]
+	rate = growth_rate(samples)
+	if rate is not None:
+		props["memory_growth_rate"] = rate
+	done = ABSTRACTION_DONE.search(content)
+	if done is not None:
+		# sample on the line itself or the last one logged before it
+		before = [s for m, s in zip(matches, samples) if m.start() < done.end()]
+		if before:
+			props["memory_abstraction_done"] = before[-1][1]
+
+print("Running memory parser")
+parser = Parser()
+parser.add_function(memory)
+parser.parse()
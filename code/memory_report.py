@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
+# default --overall-memory-limit of FastDownwardExperiment
+DEFAULT_MEMORY_LIMIT = 3584 * 1024
+# lab's Slurm environments set the soft limit to 98% of memory_per_cpu
+SLURM_SOFT_LIMIT = 0.98
+# granularity of the suggested memory request in KB
+REQUEST_STEP = 256 * 1024
+
+class MemoryReport(CustomReport, PlanningReport):
+    """
+    Ranks the algorithms per group by their number of runs out of
+    memory and then by their median peak memory, and lists runs that
+    ran out of memory or came closer than *warn_fraction* to
+    *memory_limit* (in KB).
+
+    The peak is memory_peak from memory-parser.py, or lab's "memory"
+    attribute. Runs that ran out of memory count with the memory limit
+    as lower bound of their peak. The suggested memory request covers
+    the *quantile* of all peaks plus *headroom*, rounded up to 256 MB,
+    and can be passed as memory_per_cpu to BaselSlurmEnvironment.
+    """
+    def __init__(self, algorithms=None, memory_limit=DEFAULT_MEMORY_LIMIT, warn_fraction=0.9,
+            quantile=0.99, headroom=1.1, max_flagged=20, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        kwargs["attributes"] = ["memory_peak", "memory", "memory_growth_rate", "error"]
+        super(MemoryReport, self).__init__(**kwargs)
+        if not 0 < quantile <= 1:
+            raise ValueError("quantile must be in (0, 1]")
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.memory_limit = memory_limit
+        self.warn_fraction = warn_fraction
+        self.quantile = quantile
+        self.headroom = headroom
+        self.max_flagged = max_flagged
+        self.group_key = make_group_key(group_by)
+
+    def _peak(self, run):
+        peak = run.get("memory_peak")
+        if peak is None:
+            peak = run.get("memory")
+        return peak
+
+    def _is_oom(self, run):
+        return "out-of-memory" in (run.get("error") or "")
+
+    def _collect(self, algorithms):
+        """
+        Return (stats, flagged, peaks): per (group, algorithm) lists of
+        peaks, growth rates and out-of-memory counts, the flagged runs
+        and all peaks with the memory limit for runs out of memory.
+        """
+        wanted = set(algorithms)
+        stats = defaultdict(lambda: {"peaks": [], "rates": [], "oom": 0, "near": 0})
+        flagged, peaks = [], []
+        for run in self.props.values():
+            if run["algorithm"] not in wanted:
+                continue
+            group = self.group_key(run)[0]
+            peak, oom = self._peak(run), self._is_oom(run)
+            if peak is None and not oom:
+                continue
+            for key in [(group, run["algorithm"]), ("Total", run["algorithm"])]:
+                entry = stats[key]
+                if oom:
+                    entry["oom"] += 1
+                elif peak is not None:
+                    entry["peaks"].append(peak)
+                    if peak >= self.warn_fraction * self.memory_limit:
+                        entry["near"] += 1
+                if run.get("memory_growth_rate") is not None:
+                    entry["rates"].append(run["memory_growth_rate"])
+            peaks.append(self.memory_limit if oom else peak)
+            if oom or peak >= self.warn_fraction * self.memory_limit:
+                flagged.append(("-".join(run["id"]), group, peak, oom))
+        flagged.sort(key=lambda item: (not item[3], -(item[2] or 0)))
+        return stats, flagged, np.array(peaks, dtype=float)
+
+    def _rank(self, stats, algorithms):
+        """Return a list of (group, [(rank, row)]) with the summary rows of all algorithms."""
+        results = []
+        groups = sorted(set(group for group, _ in stats), key=lambda group: (group == "Total", group))
+        for group in groups:
+            rows = []
+            for algorithm in algorithms:
+                entry = stats.get((group, algorithm))
+                if entry is None:
+                    continue
+                peaks = np.array(entry["peaks"], dtype=float)
+                rows.append({
+                    "algorithm": algorithm,
+                    "runs": len(peaks) + entry["oom"],
+                    "median": np.median(peaks) if len(peaks) else np.nan,
+                    "max": peaks.max() if len(peaks) else np.nan,
+                    "rate": np.median(entry["rates"]) if entry["rates"] else np.nan,
+                    "near": entry["near"],
+                    "oom": entry["oom"],
+                })
+            # runs out of memory are worse than any measured peak
+            rows.sort(key=lambda row: (row["oom"], np.inf if np.isnan(row["median"]) else row["median"]))
+            results.append((group, list(enumerate(rows, 1))))
+        return results
+
+    def _suggest(self, peaks):
+        """Return (suggested memory request in KB, whether it is a lower bound)."""
+        if len(peaks) == 0:
+            return None, False
+        needed = np.percentile(peaks, 100 * self.quantile)
+        lower_bound = needed >= self.memory_limit and (peaks >= self.memory_limit).any()
+        request = needed * self.headroom / SLURM_SOFT_LIMIT
+        return int(np.ceil(request / REQUEST_STEP) * REQUEST_STEP), lower_bound
+
+    def _format_memory(self, kb):
+        return "" if np.isnan(kb) else "{:.0f}".format(kb / 1024)
+
+    def _format_tex(self, results, flagged, suggestion):
+        escape = lambda name: name.replace("_", r"{\_}")
+        lines = [r"\begin{center}\begin{tabular}{@{}ll|rrrrrr@{}}",
+            r"\textbf{group} & \textbf{algorithm} & \textbf{rank} & \textbf{median [MB]} & "
+            r"\textbf{max [MB]} & \textbf{growth [KB/s]} & \textbf{near limit} & \textbf{OOM}\\"]
+        for group, rows in results:
+            lines.append(r"\midrule")
+            for rank, row in rows:
+                lines.append(" & ".join([escape(group) if rank == 1 else "", escape(row["algorithm"]), str(rank),
+                    self._format_memory(row["median"]), self._format_memory(row["max"]),
+                    "" if np.isnan(row["rate"]) else "{:.0f}".format(row["rate"]),
+                    str(row["near"]), str(row["oom"])]) + r"\\")
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        if flagged:
+            lines.append(r"\begin{itemize}")
+            for run_id, group, peak, oom in flagged[:self.max_flagged]:
+                lines.append(r"\item {} ({}): {}".format(escape(run_id), escape(group),
+                    "out of memory" if oom else "{:.0f} MB".format(peak / 1024)))
+            if len(flagged) > self.max_flagged:
+                lines.append(r"\item \dots{{}} and {} more".format(len(flagged) - self.max_flagged))
+            lines.append(r"\end{itemize}")
+        request, lower_bound = suggestion
+        if request is not None:
+            lines.append(r"Suggested memory request: {}{}M".format(
+                r"at least " if lower_bound else "", request // 1024))
+        return "\n".join(lines)
+
+    def _format_txt(self, results, flagged, suggestion):
+        lines = ["group,algorithm,rank,runs,median_kb,max_kb,growth_rate,near_limit,out_of_memory"]
+        for group, rows in results:
+            for rank, row in rows:
+                lines.append(",".join([group, row["algorithm"], str(rank), str(row["runs"])] +
+                    ["" if np.isnan(row[name]) else "{:.0f}".format(row[name]) for name in ["median", "max"]] +
+                    ["" if np.isnan(row["rate"]) else "{:.2f}".format(row["rate"]), str(row["near"]), str(row["oom"])]))
+        lines += ["", "run,group,peak_kb,out_of_memory"]
+        for run_id, group, peak, oom in flagged:
+            lines.append(",".join([run_id, group, "" if peak is None else str(peak), str(int(oom))]))
+        request, lower_bound = suggestion
+        lines += ["", "suggested_memory_per_cpu,lower_bound"]
+        if request is not None:
+            lines.append("{}M,{}".format(request // 1024, int(lower_bound)))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            stats, flagged, peaks = self._collect(algorithms)
+        if not stats:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        results = self._rank(stats, algorithms)
+        return getattr(self, "_format_" + self.output_format)(results, flagged, self._suggest(peaks))
@@ -0,0 +1,42 @@
+#! /usr/bin/env python
+
+"""Compare split strategies across the CEGAR, OCP, subtask and sampler experiments."""
+
+import os
+import os.path
+
+from lab.experiment import Experiment
+
+from domain_groups import DOMAIN_GROUPING
+from merged_data import MergedDataset
+from per_task_comparison import PerTaskComparison
+from algorithm_comparison_report import AlgorithmComparisonReport
+from domain_comparison_report import DomainComparisonReport, OptimalStrategyEvaluator
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(DIR, "data")
+EXPERIMENTS = ["cegar-splits", "cegar-ocp", "cegar-subtasks", "sampler-scp"]
+DATASET = MergedDataset([(name, os.path.join(DATA, name + "-eval")) for name in EXPERIMENTS
+	if os.path.exists(os.path.join(DATA, name + "-eval", "properties"))])
+
+exp = Experiment()
+
+strategies = ["random", "max_refined", "min_cg", "max_cg"]
+cegar_algs = [(experiment, alg) for experiment in ["cegar-splits", "cegar-subtasks"] for alg in strategies]
+
+exp.add_report(
+	PerTaskComparison(sort=True, attributes=["expansions_until_last_jump"],
+		filter_algorithm=cegar_algs, source=DATASET),
+	outfile='task_comparison.html')
+exp.add_report(
+	DomainComparisonReport(cegar_algs, OptimalStrategyEvaluator(optimum_bound=0.05),
+		attributes=["expansions_until_last_jump"], format="tex",
+		group_by=DOMAIN_GROUPING, source=DATASET),
+	outfile='optimality_comparison.tex')
+exp.add_report(
+	AlgorithmComparisonReport([(("cegar-splits", alg), ("cegar-ocp", alg)) for alg in strategies],
+		attributes=["expansions_until_last_jump"], source=DATASET),
+	outfile='cegar_vs_ocp.tex')
+
+# Parse the commandline and show or run experiment steps.
+exp.run_steps()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Several evaluated experiments loaded as one set of runs.
+
+Runs get an "experiment" attribute and are keyed by the algorithm name
+"<experiment>:<algorithm>", so all reports can compare algorithms
+across experiments. Task attributes that are the same for all runs of a
+task (domain, problem, translator statistics) are loaded only once.
+"""
+
+import json
+import logging
+import os
+
+SEPARATOR = ":"
+TASK_ATTRIBUTES = ["domain", "problem"]
+TASK_ATTRIBUTE_PREFIXES = ["translator_"]
+
+
+def algorithm_key(algorithm):
+    """
+    Return the algorithm name used for *algorithm* in merged data.
+    Accepts plain names and (experiment, algorithm) tuples.
+    """
+    if isinstance(algorithm, tuple):
+        experiment, name = algorithm
+        return experiment + SEPARATOR + name
+    return algorithm
+
+
+def _is_task_attribute(attribute):
+    return attribute in TASK_ATTRIBUTES or any(
+        attribute.startswith(prefix) for prefix in TASK_ATTRIBUTE_PREFIXES)
+
+
+class MergedDataset(object):
+    """
+    *experiments* is a list of (name, eval_dir) pairs. The properties
+    files are read once on first use; every call of props() returns
+    fresh run dicts, so changes (e.g. by report filters) don't reach
+    other reports.
+    """
+    def __init__(self, experiments):
+        self.experiments = list(experiments)
+        names = [name for name, _ in self.experiments]
+        if len(set(names)) != len(names):
+            raise ValueError("Experiment names may not appear multiple times")
+        for name in names:
+            if SEPARATOR in name:
+                raise ValueError("Experiment name may not contain '{}': {}".format(SEPARATOR, name))
+        self.tasks = {}
+        self._runs = None
+
+    def _load(self):
+        runs = []
+        for name, eval_dir in self.experiments:
+            path = os.path.join(eval_dir, "properties")
+            logging.info("Reading properties of experiment {} from {}".format(name, path))
+            with open(path) as f:
+                props = json.load(f)
+            for run in props.values():
+                runs.append(self._add_run(name, run))
+        logging.info("Merged {} runs of {} experiments on {} tasks".format(
+            len(runs), len(self.experiments), len(self.tasks)))
+        return runs
+
+    def _add_run(self, experiment, run):
+        domain, problem = run["domain"], run["problem"]
+        task = self.tasks.setdefault((domain, problem), {})
+        own = {}
+        for attribute, value in run.items():
+            if _is_task_attribute(attribute):
+                if attribute not in task:
+                    task[attribute] = value
+                    continue
+                if task[attribute] == value:
+                    continue
+            own[attribute] = value
+        algorithm = algorithm_key((experiment, run["algorithm"]))
+        own["experiment"] = experiment
+        own["base_algorithm"] = run["algorithm"]
+        own["algorithm"] = algorithm
+        own["id"] = [algorithm, domain, problem]
+        return task, own
+
+    def props(self):
+        """Return a dict from run ids to runs, like lab's properties."""
+        if self._runs is None:
+            self._runs = self._load()
+        props = {}
+        for task, own in self._runs:
+            # lab's filters only accept real dicts as modified runs
+            run = dict(task)
+            run.update(own)
+            props["-".join(own["id"])] = run
+        return props
+
+    def files(self):
+        """Return the properties files the dataset is read from."""
+        return [os.path.join(eval_dir, "properties") for _, eval_dir in self.experiments]
+
+    def algorithms(self, experiment=None):
+        """Return the merged algorithm names, optionally of one experiment only."""
+        if self._runs is None:
+            self._runs = self._load()
+        names = set(own["algorithm"] for _, own in self._runs
+            if experiment is None or own["experiment"] == experiment)
+        return sorted(names)
@@ -5,7 +5,9 @@ from lab.reports import Table
 
 from downward.reports import PlanningReport
 
-class PerTaskComparison(PlanningReport):
+from custom_report import CustomReport
+
+class PerTaskComparison(CustomReport, PlanningReport):
     """
     Make a per-task, pairwise comparison of a single attribute.
 
@@ -23,7 +25,7 @@ class PerTaskComparison(PlanningReport):
         comparison.
 
         """
-        PlanningReport.__init__(self, **kwargs)
+        super(PerTaskComparison, self).__init__(**kwargs)
         if len(self.attributes) != 1:
             raise ValueError("Report needs exactly one attribute")
         self.attribute = self.attributes[0]
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
+class PortfolioReport(CustomReport, PlanningReport):
+    """
+    Creates a table with the virtual best solver (oracle), the best
+    single strategy and greedy portfolios of 2..max_size strategies for
+    each attribute, per group and in total.
+
+    The value of a portfolio on a task is the best value of its members.
+    Coverage-like attributes (min_wins=False) count missing values as 0
+    and use all tasks, other attributes only use tasks for which all
+    algorithms report a value. Portfolios are built greedily, adding the
+    strategy that improves the summed value the most.
+    """
+    def __init__(self, algorithms=None, max_size=5, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        super(PortfolioReport, self).__init__(**kwargs)
+        if not self.attributes:
+            raise ValueError("Report needs at least one attribute")
+        if max_size < 1:
+            raise ValueError("Portfolios need at least one strategy")
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.max_size = max_size
+        self.group_key = make_group_key(group_by)
+
+    def _min_wins(self, attribute):
+        return getattr(attribute, "min_wins", True) is not False
+
+    def _get_matrix(self, attribute, algorithms):
+        """
+        Return (groups, matrix) with the group of each task and a
+        (tasks x algorithms) matrix of values, NaN for missing values.
+        """
+        alg_idx = {alg: i for i, alg in enumerate(algorithms)}
+        rows = defaultdict(lambda: np.full(len(algorithms), np.nan))
+        for run in self.props.values():
+            idx = alg_idx.get(run["algorithm"])
+            if idx is not None:
+                value = run.get(attribute)
+                rows[self.group_key(run)][idx] = np.nan if value is None else value
+        keys = sorted(rows)
+        groups = np.array([group for group, _ in keys])
+        matrix = np.array([rows[key] for key in keys]).reshape(len(keys), len(algorithms))
+        return groups, matrix
+
+    def _prepare(self, attribute, matrix):
+        if self._min_wins(attribute):
+            # only tasks for which all algorithms report the attribute
+            return matrix[~np.isnan(matrix).any(axis=1)]
+        return np.nan_to_num(matrix)
+
+    def _greedy(self, attribute, matrix):
+        """
+        Return the oracle value and a list of (members, value) for the
+        greedy portfolios of size 1..max_size.
+        """
+        if self._min_wins(attribute):
+            best, combine, pick = np.min, np.minimum, np.argmin
+            current = np.full(matrix.shape[0], np.inf)
+        else:
+            best, combine, pick = np.max, np.maximum, np.argmax
+            current = np.full(matrix.shape[0], -np.inf)
+        oracle = best(matrix, axis=1).sum()
+        portfolios, members = [], []
+        available = np.ones(matrix.shape[1], dtype=bool)
+        for _ in range(min(self.max_size, matrix.shape[1])):
+            totals = combine(matrix, current[:, np.newaxis]).sum(axis=0)
+            # never pick a strategy twice
+            totals[~available] = np.inf if self._min_wins(attribute) else -np.inf
+            chosen = int(pick(totals))
+            available[chosen] = False
+            current = combine(current, matrix[:, chosen])
+            members.append(chosen)
+            portfolios.append((list(members), current.sum()))
+        return oracle, portfolios
+
+    def _evaluate(self, algorithms):
+        """Return a list of (attribute, [(group, count, oracle, portfolios)])."""
+        results = []
+        for attribute in self.attributes:
+            groups, matrix = self._get_matrix(attribute, algorithms)
+            rows = []
+            for group in sorted(set(groups)):
+                values = self._prepare(attribute, matrix[groups == group])
+                if values.shape[0] > 0:
+                    rows.append((group, values.shape[0]) + self._greedy(attribute, values))
+            values = self._prepare(attribute, matrix)
+            if values.shape[0] > 0:
+                rows.append(("Total", values.shape[0]) + self._greedy(attribute, values))
+            results.append((attribute, rows))
+        return results
+
+    def _format_value(self, value):
+        return "{:.0f}".format(value) if float(value).is_integer() else "{:.2f}".format(value)
+
+    def _format_tex(self, algorithms, results):
+        escape = lambda name: name.replace("_", r"{\_}")
+        lines = []
+        for attribute, rows in results:
+            lines.append(r"\begin{center}\begin{tabular}{@{}l|cc" + "c" * (self.max_size - 1) + "@{}}")
+            line = [r"\textbf{%s}" % escape(attribute), r"\textbf{oracle}", r"\textbf{best single}"]
+            line += [r"\textbf{k=%d}" % k for k in range(2, self.max_size + 1)]
+            lines.append(" & ".join(line) + r"\\")
+            lines.append(r"\midrule")
+            for group, count, oracle, portfolios in rows:
+                if group == "Total":
+                    lines.append(r"\midrule")
+                line = ["{} ({})".format(escape(group), count), self._format_value(oracle)]
+                members, value = portfolios[0]
+                line.append("{} ({})".format(self._format_value(value), escape(algorithms[members[0]])))
+                line += [self._format_value(value) for _, value in portfolios[1:]]
+                line += [""] * (self.max_size - len(portfolios))
+                lines.append(" & ".join(line) + r"\\")
+            lines[-1] = lines[-1][:-2]
+            lines.append(r"\end{tabular}\end{center}")
+            # list the members of the overall portfolios
+            total = [row for row in rows if row[0] == "Total"]
+            if total:
+                lines.append(r"\begin{itemize}")
+                for members, value in total[0][3]:
+                    lines.append(r"\item k={}: {} ({})".format(len(members),
+                        ", ".join(escape(algorithms[m]) for m in members), self._format_value(value)))
+                lines.append(r"\end{itemize}")
+        return "\n".join(lines)
+
+    def _format_txt(self, algorithms, results):
+        lines = ["attribute,group,count,k,value,members"]
+        for attribute, rows in results:
+            for group, count, oracle, portfolios in rows:
+                lines.append(",".join([str(attribute), group, str(count), "oracle",
+                    self._format_value(oracle), ""]))
+                for members, value in portfolios:
+                    lines.append(",".join([str(attribute), group, str(count), str(len(members)),
+                        self._format_value(value), "+".join(algorithms[m] for m in members)]))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            results = self._evaluate(algorithms)
+        if not any(rows for _, rows in results):
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        return getattr(self, "_format_" + self.output_format)(algorithms, results)
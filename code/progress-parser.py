@@ -0,0 +1,35 @@
+#! /usr/bin/env python
+
+import re
+
+from lab.parser import Parser
+
+# keep the properties small for long searches
+MAX_POINTS = 1000
+PROGRESS = re.compile(r"^\[g=(\d+), (\d+) evaluated, (\d+) expanded, t=([\d.]+)s, (\d+) KB\]$", re.M)
+
+def thin(values):
+	# every k-th entry, always including the last one
+	if len(values) <= MAX_POINTS:
+		return values
+	step = -(-len(values) // MAX_POINTS)
+	thinned = values[::step]
+	if (len(values) - 1) % step:
+		thinned.append(values[-1])
+	return thinned
+
+def progress(content, props):
+	lines = thin(PROGRESS.findall(content))
+	if not lines:
+		return
+	g, evaluated, expanded, time, memory = zip(*lines)
+	props["progress_g"] = [int(v) for v in g]
+	props["progress_evaluated"] = [int(v) for v in evaluated]
+	props["progress_expanded"] = [int(v) for v in expanded]
+	props["progress_time"] = [float(v) for v in time]
+	props["progress_memory"] = [int(v) for v in memory]
+
+print("Running search progress parser")
+parser = Parser()
+parser.add_function(progress)
+parser.parse()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
+# Nemenyi critical values q_alpha for k = 2..20 algorithms (Demšar, 2006),
+# the studentized range statistic divided by sqrt(2)
+NEMENYI_Q = {
+    0.05: [1.960, 2.343, 2.569, 2.728, 2.850, 2.949, 3.031, 3.102, 3.164, 3.219,
+        3.268, 3.313, 3.354, 3.391, 3.426, 3.458, 3.489, 3.517, 3.544],
+    0.10: [1.645, 2.052, 2.291, 2.459, 2.589, 2.693, 2.780, 2.855, 2.920, 2.978,
+        3.030, 3.077, 3.120, 3.159, 3.196, 3.230, 3.261, 3.291, 3.319],
+}
+
+
+def average_ranks(matrix):
+    """
+    Return the ranks (1 = best = smallest) within every row of *matrix*,
+    giving tied values the average of their ranks. Uses a single argsort
+    over all rows.
+    """
+    rows, cols = matrix.shape
+    order = np.argsort(matrix, axis=1, kind="mergesort")
+    ordered = np.take_along_axis(matrix, order, axis=1)
+    # number the runs of equal values, starting a new run in every row
+    new_run = np.ones((rows, cols), dtype=bool)
+    new_run[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    run_ids = np.cumsum(new_run.ravel()) - 1
+    positions = np.tile(np.arange(1, cols + 1, dtype=float), rows)
+    means = np.bincount(run_ids, weights=positions) / np.bincount(run_ids)
+    ranks = np.empty((rows, cols))
+    np.put_along_axis(ranks, order, means[run_ids].reshape(rows, cols), axis=1)
+    return ranks
+
+
+def nemenyi_q(k, alpha):
+    """Critical value of the Nemenyi test for *k* algorithms."""
+    if alpha in NEMENYI_Q and 2 <= k <= len(NEMENYI_Q[alpha]) + 1:
+        return NEMENYI_Q[alpha][k - 2]
+    try:
+        from scipy.stats import studentized_range
+    except ImportError:
+        raise ValueError("Nemenyi test for k={}, alpha={} needs scipy".format(k, alpha))
+    return studentized_range.ppf(1 - alpha, k, np.inf) / np.sqrt(2)
+
+
+class RankAggregationReport(CustomReport, PlanningReport):
+    """
+    Ranks all algorithms on every task for each attribute and aggregates
+    the ranks into average ranks, Borda and Copeland scores and the
+    critical difference of the Nemenyi test.
+
+    Attributes with min_wins=False (e.g. coverage) prefer larger values,
+    missing values rank last. The ranks of a task are averaged over its
+    attributes and ranked again. The blocks of the statistics are the
+    tasks, or the groups if *group_by* is given, in which case the mean
+    task ranks of a group are ranked once more. Algorithms closer than
+    the critical difference in average rank form the cliques of a CD
+    diagram, listed as columns of the TeX table.
+    """
+    def __init__(self, algorithms=None, alpha=0.05, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        super(RankAggregationReport, self).__init__(**kwargs)
+        if not self.attributes:
+            raise ValueError("Report needs at least one attribute")
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.alpha = alpha
+        self.group_by = group_by
+        self.group_key = make_group_key(group_by)
+
+    def _get_tensor(self, algorithms):
+        """
+        Return (groups, values) with the group of each task and a
+        (tasks x attributes x algorithms) array, NaN for missing values.
+        """
+        alg_idx = {alg: i for i, alg in enumerate(algorithms)}
+        shape = (len(self.attributes), len(algorithms))
+        tasks = defaultdict(lambda: np.full(shape, np.nan))
+        for run in self.props.values():
+            idx = alg_idx.get(run["algorithm"])
+            if idx is None:
+                continue
+            values = tasks[self.group_key(run)]
+            for i, attribute in enumerate(self.attributes):
+                value = run.get(attribute)
+                if value is not None:
+                    values[i, idx] = value
+        keys = sorted(tasks)
+        groups = np.array([group for group, _ in keys])
+        values = np.array([tasks[key] for key in keys]).reshape((len(keys),) + shape)
+        return groups, values
+
+    def _task_ranks(self, values):
+        """Return (per-attribute ranks, combined ranks), NaN where an attribute is missing."""
+        signs = np.array([1 if getattr(attribute, "min_wins", True) is not False else -1
+            for attribute in self.attributes], dtype=float)
+        oriented = values * signs[np.newaxis, :, np.newaxis]
+        missing = np.isnan(oriented)
+        available = ~missing.all(axis=2)
+        oriented[missing] = np.inf
+        tasks, attributes, k = oriented.shape
+        ranks = average_ranks(oriented.reshape(tasks * attributes, k)).reshape(tasks, attributes, k)
+        ranks[~available] = np.nan
+        with np.errstate(invalid="ignore"):
+            combined = np.nanmean(ranks, axis=1) if attributes > 1 else ranks[:, 0]
+        return ranks, combined
+
+    def _aggregate(self, algorithms):
+        groups, values = self._get_tensor(algorithms)
+        ranks, combined = self._task_ranks(values)
+        valid = ~np.isnan(combined).any(axis=1)
+        groups, ranks, combined = groups[valid], ranks[valid], combined[valid]
+        if self.group_by is None:
+            blocks = average_ranks(combined)
+        else:
+            blocks = average_ranks(np.array([combined[groups == name].mean(axis=0)
+                for name in sorted(set(groups))]))
+        n, k = blocks.shape
+        mean_ranks = blocks.mean(axis=0)
+        borda = (k - blocks).sum(axis=0)
+        # pairwise majority: a beats b if it ranks better on more blocks
+        wins = (blocks[:, :, np.newaxis] < blocks[:, np.newaxis, :]).sum(axis=0)
+        copeland = np.sign(wins - wins.T).sum(axis=1)
+        with np.errstate(invalid="ignore"):
+            attribute_ranks = np.nanmean(ranks, axis=0) if len(ranks) else np.full(ranks.shape[1:], np.nan)
+        cd = nemenyi_q(k, self.alpha) * np.sqrt(k * (k + 1) / (6 * n)) if k > 1 and n > 0 else np.nan
+        return {
+            "blocks": n,
+            "tasks": len(combined),
+            "mean_ranks": mean_ranks,
+            "attribute_ranks": attribute_ranks,
+            "borda": borda,
+            "copeland": copeland,
+            "cd": cd,
+        }
+
+    def _cliques(self, order, mean_ranks, cd):
+        """Return the maximal runs of algorithms (in rank order) closer than cd."""
+        cliques = []
+        ranks = mean_ranks[order]
+        for start in range(len(order)):
+            end = start
+            while end + 1 < len(order) and ranks[end + 1] - ranks[start] < cd:
+                end += 1
+            if end > start and (not cliques or end > cliques[-1][1]):
+                cliques.append((start, end))
+        return cliques
+
+    def _format_tex(self, algorithms, result):
+        escape = lambda name: name.replace("_", r"{\_}")
+        order = np.argsort(result["mean_ranks"], kind="mergesort")
+        cliques = self._cliques(order, result["mean_ranks"], result["cd"])
+        lines = [r"\begin{center}\begin{tabular}{@{}l|" + "c" * len(self.attributes) + "|ccc" +
+            ("|" + "c" * len(cliques) if cliques else "") + "@{}}"]
+        line = [r"\textbf{algorithm}"] + [r"\textbf{%s}" % escape(str(attribute)) for attribute in self.attributes]
+        line += [r"\textbf{avg. rank}", r"\textbf{Borda}", r"\textbf{Copeland}"] + [""] * len(cliques)
+        lines.append(" & ".join(line) + r"\\")
+        lines.append(r"\midrule")
+        for position, idx in enumerate(order):
+            line = [escape(algorithms[idx])]
+            line += ["{:.2f}".format(rank) for rank in result["attribute_ranks"][:, idx]]
+            line += ["{:.2f}".format(result["mean_ranks"][idx]), "{:.1f}".format(result["borda"][idx]),
+                "{:d}".format(int(result["copeland"][idx]))]
+            line += [r"$\bullet$" if start <= position <= end else "" for start, end in cliques]
+            lines.append(" & ".join(line) + r"\\")
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        lines.append(r"CD = {:.2f} ($\alpha = {}$, {} {})".format(result["cd"], self.alpha,
+            result["blocks"], "tasks" if self.group_by is None else "groups"))
+        return "\n".join(lines)
+
+    def _format_txt(self, algorithms, result):
+        header = ["algorithm"] + ["rank_" + str(attribute) for attribute in self.attributes]
+        lines = [",".join(header + ["mean_rank", "borda", "copeland", "critical_difference", "blocks"])]
+        for idx in np.argsort(result["mean_ranks"], kind="mergesort"):
+            line = [algorithms[idx]] + ["{:.4f}".format(rank) for rank in result["attribute_ranks"][:, idx]]
+            line += ["{:.4f}".format(result["mean_ranks"][idx]), "{:.1f}".format(result["borda"][idx]),
+                str(int(result["copeland"][idx])), "{:.4f}".format(result["cd"]), str(result["blocks"])]
+            lines.append(",".join(line))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        if len(algorithms) < 2:
+            raise ValueError("Ranking needs at least two algorithms")
+        with self.phase("rank"):
+            result = self._aggregate(algorithms)
+        if result["blocks"] == 0:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        return getattr(self, "_format_" + self.output_format)(algorithms, result)
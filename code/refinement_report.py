@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
+# per-subtask lists written by cegar-growth-parser.py
+SUBTASK_ATTRIBUTES = ["cegar_subtask_refinements", "cegar_subtask_time", "cegar_subtask_init_h",
+    "cegar_subtask_limit_time"]
+
+
+class RefinementThroughputReport(CustomReport, PlanningReport):
+    """
+    Compares how efficiently the split strategies refine their
+    abstractions (see cegar-growth-parser.py), per algorithm and per
+    group if *group_by* is given.
+
+    Refinements per second and the initial h value gained per 1000
+    refinements are ratios of the sums over all subtasks, so large
+    abstractions weigh more than small ones. The report also lists the
+    share of subtasks that reached the state limit and the median time
+    they needed for it.
+    """
+    def __init__(self, algorithms=None, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        kwargs["attributes"] = SUBTASK_ATTRIBUTES
+        super(RefinementThroughputReport, self).__init__(**kwargs)
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.group_by = group_by
+        self.group_key = make_group_key(group_by)
+
+    def _collect(self, algorithms):
+        """
+        Return the (group, algorithm) keys, the number of runs per key
+        and a (subtasks x SUBTASK_ATTRIBUTES) array with the key index
+        of every subtask, NaN for missing values.
+        """
+        wanted = set(algorithms)
+        keys, index = [], {}
+        runs = defaultdict(int)
+        rows, owners = [], []
+        for run in self.props.values():
+            if run["algorithm"] not in wanted:
+                continue
+            # e.g. [None] if the statistics of the subtasks weren't found
+            if all(value is None for value in run.get("cegar_subtask_refinements") or []):
+                continue
+            subtasks = [[np.nan if value is None else value for value in run.get(attribute) or []]
+                for attribute in SUBTASK_ATTRIBUTES]
+            groups = ["Total"] if self.group_by is None else ["Total", self.group_key(run)[0]]
+            for group in groups:
+                key = (group, run["algorithm"])
+                if key not in index:
+                    index[key] = len(keys)
+                    keys.append(key)
+                runs[key] += 1
+                for row in zip(*subtasks):
+                    rows.append(row)
+                    owners.append(index[key])
+        return keys, runs, np.array(rows, dtype=float).reshape(len(rows), len(SUBTASK_ATTRIBUTES)), \
+            np.array(owners, dtype=np.int64)
+
+    def _summarize(self, algorithms):
+        keys, runs, values, owners = self._collect(algorithms)
+        count = len(keys)
+        refinements, times, init_h, limit_times = values.T
+        # subtasks with refinements and build time
+        timed = ~np.isnan(refinements) & ~np.isnan(times)
+        rated = ~np.isnan(refinements) & ~np.isnan(init_h)
+        timed_refinements = np.bincount(owners[timed], weights=refinements[timed], minlength=count)
+        timed_times = np.bincount(owners[timed], weights=times[timed], minlength=count)
+        rated_refinements = np.bincount(owners[rated], weights=refinements[rated], minlength=count)
+        gains = np.bincount(owners[rated], weights=init_h[rated], minlength=count)
+        subtasks = np.bincount(owners, minlength=count)
+        limited = ~np.isnan(limit_times)
+        hits = np.bincount(owners[limited], minlength=count)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = timed_refinements / timed_times
+            gain_rates = 1000 * gains / rated_refinements
+        order = {algorithm: i for i, algorithm in enumerate(algorithms)}
+        results = []
+        for i in sorted(range(count), key=lambda i: (keys[i][0] == "Total", keys[i][0], order[keys[i][1]])):
+            mine = owners == i
+            median_limit = np.median(limit_times[mine & limited]) if hits[i] else np.nan
+            results.append({
+                "group": keys[i][0],
+                "algorithm": keys[i][1],
+                "runs": runs[keys[i]],
+                "subtasks": int(subtasks[i]),
+                "refinements": timed_refinements[i] if timed_times[i] > 0 else np.nan,
+                "rate": rates[i] if timed_times[i] > 0 else np.nan,
+                "gain": gain_rates[i] if rated_refinements[i] > 0 else np.nan,
+                "limit_share": hits[i] / subtasks[i],
+                "limit_time": median_limit,
+            })
+        return results
+
+    def _format_number(self, value, pattern="{:.2f}"):
+        return "" if np.isnan(value) else pattern.format(value)
+
+    def _format_tex(self, results):
+        escape = lambda name: name.replace("_", r"{\_}")
+        lines = [r"\begin{center}\begin{tabular}{@{}ll|rrrrrr@{}}",
+            r"\textbf{group} & \textbf{algorithm} & \textbf{runs} & \textbf{subtasks} & "
+            r"\textbf{refinements/s} & \textbf{$h_0$ per 1k ref.} & \textbf{at limit} & \textbf{to limit [s]}\\"]
+        previous = None
+        for row in results:
+            if row["group"] != previous:
+                lines.append(r"\midrule")
+            lines.append(" & ".join([escape(row["group"]) if row["group"] != previous else "",
+                escape(row["algorithm"]), str(row["runs"]), str(row["subtasks"]),
+                self._format_number(row["rate"], "{:.1f}"), self._format_number(row["gain"]),
+                self._format_number(100 * row["limit_share"], "{:.1f}\\%"),
+                self._format_number(row["limit_time"])]) + r"\\")
+            previous = row["group"]
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        return "\n".join(lines)
+
+    def _format_txt(self, results):
+        lines = ["group,algorithm,runs,subtasks,refinements,refinements_per_second,"
+            "h_gain_per_1000_refinements,state_limit_share,median_time_to_limit"]
+        for row in results:
+            lines.append(",".join([row["group"], row["algorithm"], str(row["runs"]), str(row["subtasks"])] +
+                [self._format_number(row[name], "{:.6g}")
+                for name in ["refinements", "rate", "gain", "limit_share", "limit_time"]]))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            results = self._summarize(algorithms)
+        if not results:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        return getattr(self, "_format_" + self.output_format)(results)
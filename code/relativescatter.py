@@ -7,6 +7,8 @@ from matplotlib import ticker
 from downward.reports.scatter import ScatterPlotReport
 from downward.reports.plot import PlotReport, Matplotlib, MatplotlibPlot, PgfPlots
 
+from custom_report import CustomReport
+
 
 # TODO: handle outliers
 
@@ -107,7 +109,7 @@ class RelativeScatterPgfPlots(PgfPlots):
         return opts
 
 
-class RelativeScatterPlotReport(ScatterPlotReport):
+class RelativeScatterPlotReport(CustomReport, ScatterPlotReport):
     """
     Generate a scatter plot that shows a relative comparison of two
     algorithms with regard to the given attribute. The attribute value
@@ -117,7 +119,7 @@ class RelativeScatterPlotReport(ScatterPlotReport):
 
     def __init__(self, show_missing=True, get_category=None, xlim_left = None, xlim_right = None,
             ylim_bottom = None, ylim_top = None, tick_size=None, label_size=None, title_size=None, **kwargs):
-        ScatterPlotReport.__init__(self, show_missing, get_category, **kwargs)
+        super(RelativeScatterPlotReport, self).__init__(show_missing, get_category, **kwargs)
         self.xlim_left = xlim_left
         self.xlim_right = xlim_right
         self.ylim_bottom = ylim_bottom
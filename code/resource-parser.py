@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+
+import os
+import struct
+
+from lab.parser import Parser
+
+# written by resource-sampler.py, the formats have to match
+SAMPLES_FILE = "resources.bin"
+MAGIC = b"RSMP"
+HEADER = struct.Struct("<4sHHd")
+RECORD = struct.Struct("<fIfQQII")
+# keep the properties small for long runs
+MAX_POINTS = 200
+
+def thin(values):
+	# every k-th entry, always including the last one
+	if len(values) <= MAX_POINTS:
+		return values
+	step = -(-len(values) // MAX_POINTS)
+	thinned = values[::step]
+	if (len(values) - 1) % step:
+		thinned.append(values[-1])
+	return thinned
+
+def read_samples(path):
+	with open(path, "rb") as f:
+		data = f.read()
+	if len(data) < HEADER.size:
+		return None, []
+	magic, _, _, interval = HEADER.unpack_from(data)
+	if magic != MAGIC:
+		return None, []
+	# a killed sampler may leave a partial record
+	end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+	return interval, [RECORD.unpack_from(data, offset) for offset in range(HEADER.size, end, RECORD.size)]
+
+def resources(content, props):
+	if not os.path.exists(SAMPLES_FILE):
+		return
+	interval, samples = read_samples(SAMPLES_FILE)
+	if not samples:
+		return
+	props["resource_interval"] = interval
+	props["resource_samples"] = len(samples)
+	time, rss, cpu_time, read_bytes, write_bytes, voluntary, involuntary = zip(*samples)
+	props["resource_peak_rss"] = max(rss)
+	props["resource_cpu_time"] = cpu_time[-1]
+	props["resource_wall_time"] = time[-1]
+	if time[-1] > 0:
+		props["resource_cpu_utilization"] = cpu_time[-1] / time[-1]
+	props["resource_read_bytes"] = read_bytes[-1]
+	props["resource_write_bytes"] = write_bytes[-1]
+	props["resource_voluntary_switches"] = voluntary[-1]
+	props["resource_involuntary_switches"] = involuntary[-1]
+	series = thin(list(zip(time, rss, cpu_time, read_bytes, write_bytes)))
+	props["resource_time"] = [round(s[0], 3) for s in series]
+	props["resource_rss"] = [s[1] for s in series]
+	props["resource_cpu"] = [round(s[2], 3) for s in series]
+	props["resource_io_bytes"] = [s[3] + s[4] for s in series]
+
+print("Running resource parser")
+parser = Parser()
+parser.add_function(resources)
+parser.parse()
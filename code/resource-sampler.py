@@ -0,0 +1,181 @@
+#! /usr/bin/env python
+
+"""
+Run a command and sample the resource usage of its process tree from
+/proc at a fixed interval, when it starts and after it exits:
+
+    resource-sampler.py [--interval SECONDS] [--output FILE] -- COMMAND...
+
+The samples are written as binary records (see FIELDS) after a header,
+and read by resource-parser.py. Signals are forwarded to the command
+and the sampler exits like it, so lab sees the command's exit code.
+"""
+
+import argparse
+import errno
+import os
+import resource
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+MAGIC = b"RSMP"
+VERSION = 1
+# (name, struct code): wall time [s], RSS [KB], CPU time [s], bytes read
+# and written from storage, voluntary and involuntary context switches.
+# CPU time, I/O and switches are totals over all processes seen so far.
+FIELDS = [("time", "f"), ("rss", "I"), ("cpu_time", "f"), ("read_bytes", "Q"),
+	("write_bytes", "Q"), ("voluntary_switches", "I"), ("involuntary_switches", "I")]
+HEADER = struct.Struct("<4sHHd")
+RECORD = struct.Struct("<" + "".join(code for _, code in FIELDS))
+FORWARDED_SIGNALS = [signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGXCPU]
+
+CLOCK_TICKS = float(os.sysconf("SC_CLK_TCK"))
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+def read_file(path):
+	try:
+		with open(path) as f:
+			return f.read()
+	except (IOError, OSError):
+		return None
+
+def children(pid):
+	tasks = "/proc/{}/task".format(pid)
+	try:
+		tids = os.listdir(tasks)
+	except OSError:
+		return []
+	result = []
+	for tid in tids:
+		content = read_file("{}/{}/children".format(tasks, tid))
+		if content is None:
+			return scan_children(pid)
+		result.extend(int(child) for child in content.split())
+	return result
+
+def scan_children(pid):
+	# kernels without /proc/PID/task/TID/children
+	result = []
+	for name in os.listdir("/proc"):
+		if name.isdigit():
+			stat = read_file("/proc/{}/stat".format(name))
+			if stat is not None and int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+				result.append(int(name))
+	return result
+
+def process_tree(root):
+	pids, stack = [], [root]
+	while stack:
+		pid = stack.pop()
+		pids.append(pid)
+		stack.extend(children(pid))
+	return pids
+
+def read_process(pid):
+	"""Return (rss, [cpu time, read, written, switches...]) of a process, or None."""
+	stat = read_file("/proc/{}/stat".format(pid))
+	status = read_file("/proc/{}/status".format(pid))
+	if stat is None or status is None:
+		return None
+	# the command name in parentheses may contain spaces
+	fields = stat.rsplit(")", 1)[1].split()
+	cpu_time = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+	rss = int(fields[21]) * PAGE_KB
+	values = {}
+	for line in status.splitlines() + (read_file("/proc/{}/io".format(pid)) or "").splitlines():
+		key, _, value = line.partition(":")
+		values[key] = value
+	totals = [cpu_time] + [int(values.get(key, "0").split()[0]) for key in
+		["read_bytes", "write_bytes", "voluntary_ctxt_switches", "nonvoluntary_ctxt_switches"]]
+	return rss, totals
+
+class Sampler(object):
+	def __init__(self, pid, interval, output):
+		self.pid = pid
+		self.interval = interval
+		self.output = output
+		self.stopped = threading.Event()
+		# last totals of every process, so exited processes keep counting
+		self.totals = {}
+		self.start = time.time()
+
+	def sample(self, exited=None):
+		rss = 0
+		for pid in process_tree(self.pid):
+			usage = read_process(pid)
+			if usage is not None:
+				rss += usage[0]
+				self.totals[pid] = usage[1]
+		sums = [sum(values) for values in zip(*self.totals.values())] or [0] * 5
+		if exited is not None:
+			# the last totals from /proc miss the time since the last sample
+			sums = [max(total, value) for total, value in zip(sums, exited)]
+		return RECORD.pack(time.time() - self.start, rss, sums[0], *[int(value) for value in sums[1:]])
+
+	def write(self, record):
+		self.output.write(record)
+		# the run may be killed any time
+		self.output.flush()
+
+	def run(self):
+		self.output.write(HEADER.pack(MAGIC, VERSION, len(FIELDS), self.interval))
+		# sample right away, so short runs get samples too
+		self.write(self.sample())
+		while not self.stopped.wait(self.interval):
+			self.write(self.sample())
+
+def children_totals():
+	"""Return the totals like read_process of all waited-for descendants."""
+	usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+	# block counts are in units of 512 bytes
+	return [usage.ru_utime + usage.ru_stime, usage.ru_inblock * 512, usage.ru_oublock * 512,
+		usage.ru_nvcsw, usage.ru_nivcsw]
+
+def wait(process):
+	while True:
+		try:
+			return process.wait()
+		except OSError as err:
+			# Python 2 doesn't retry interrupted system calls
+			if err.errno != errno.EINTR:
+				raise
+
+def main():
+	parser = argparse.ArgumentParser(description="Sample the resource usage of a command.")
+	parser.add_argument("--interval", type=float, default=0.5, help="seconds between samples")
+	parser.add_argument("--output", default="resources.bin")
+	parser.add_argument("command", nargs=argparse.REMAINDER)
+	args = parser.parse_args()
+	command = args.command[1:] if args.command[:1] == ["--"] else args.command
+	if not command:
+		parser.error("no command given")
+
+	process = subprocess.Popen(command)
+	def forward(signum, frame):
+		process.send_signal(signum)
+	for signum in FORWARDED_SIGNALS:
+		signal.signal(signum, forward)
+	with open(args.output, "wb") as output:
+		sampler = Sampler(process.pid, args.interval, output)
+		thread = threading.Thread(target=sampler.run)
+		thread.daemon = True
+		thread.start()
+		returncode = wait(process)
+		sampler.stopped.set()
+		thread.join()
+		# the command's processes are gone, their totals come from the kernel
+		sampler.write(sampler.sample(children_totals()))
+	if returncode < 0:
+		# die from the same signal as the command
+		if -returncode != signal.SIGKILL:
+			signal.signal(-returncode, signal.SIG_DFL)
+		os.kill(os.getpid(), -returncode)
+		returncode = 128 - returncode
+	sys.exit(returncode)
+
+if __name__ == "__main__":
+	main()
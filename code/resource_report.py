@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import warnings
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+from series_tools import normalize_progress, pack_series, resample, summarize
+
+# summary attributes written by resource-parser.py and their columns
+SUMMARY = [
+    ("resource_peak_rss", "peak RSS [MB]", 1 / 1024),
+    ("resource_cpu_time", "CPU [s]", 1),
+    ("resource_cpu_utilization", "CPU/wall", 1),
+    ("resource_io_bytes", "I/O [MB]", 1 / 1024 ** 2),
+    ("resource_switch_rate", "switches/s", 1),
+]
+# series written by resource-parser.py, CPU utilization is derived from resource_cpu
+SERIES = {"rss": "resource_rss", "cpu_time": "resource_cpu", "io_bytes": "resource_io_bytes",
+    "cpu_utilization": "resource_cpu"}
+
+
+def _summary_values(run):
+    values = {name: run.get(name) for name, _, _ in SUMMARY}
+    if run.get("resource_read_bytes") is not None:
+        values["resource_io_bytes"] = run["resource_read_bytes"] + run.get("resource_write_bytes", 0)
+    if run.get("resource_wall_time"):
+        switches = run.get("resource_voluntary_switches", 0) + run.get("resource_involuntary_switches", 0)
+        values["resource_switch_rate"] = switches / run["resource_wall_time"]
+    return values
+
+
+class ResourceReport(CustomReport, PlanningReport):
+    """
+    Summarizes the resource samples of resource-sampler.py per algorithm
+    (and per group if *group_by* is given): the medians of peak RSS, CPU
+    time, CPU utilization, I/O and context switches per second.
+    """
+    def __init__(self, algorithms=None, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        kwargs["attributes"] = ["resource_samples", "resource_peak_rss", "resource_cpu_time",
+            "resource_cpu_utilization", "resource_read_bytes", "resource_write_bytes", "resource_wall_time",
+            "resource_voluntary_switches", "resource_involuntary_switches"]
+        super(ResourceReport, self).__init__(**kwargs)
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.group_by = group_by
+        self.group_key = make_group_key(group_by)
+
+    def _collect(self, algorithms):
+        """Return a dict from (group, algorithm) to a (runs x SUMMARY) array, NaN if missing."""
+        wanted = set(algorithms)
+        rows = defaultdict(list)
+        for run in self.props.values():
+            if run["algorithm"] not in wanted or not run.get("resource_samples"):
+                continue
+            values = _summary_values(run)
+            row = [np.nan if values[name] is None else values[name] for name, _, _ in SUMMARY]
+            rows[("Total", run["algorithm"])].append(row)
+            if self.group_by is not None:
+                rows[(self.group_key(run)[0], run["algorithm"])].append(row)
+        return {key: np.array(values, dtype=float) for key, values in rows.items()}
+
+    def _summarize(self, algorithms):
+        """Return a list of (group, algorithm, runs, medians) sorted like the groups of MemoryReport."""
+        stats = self._collect(algorithms)
+        order = {algorithm: i for i, algorithm in enumerate(algorithms)}
+        keys = sorted(stats, key=lambda key: (key[0] == "Total", key[0], order[key[1]]))
+        scales = np.array([scale for _, _, scale in SUMMARY])
+        results = []
+        for group, algorithm in keys:
+            values = stats[(group, algorithm)]
+            with warnings.catch_warnings():
+                # columns without any value, e.g. I/O without access to /proc/PID/io
+                warnings.simplefilter("ignore", RuntimeWarning)
+                medians = np.nanmedian(values, axis=0)
+            results.append((group, algorithm, len(values), medians * scales))
+        return results
+
+    def _format_number(self, value, pattern="{:.2f}"):
+        return "" if np.isnan(value) else pattern.format(value)
+
+    def _format_tex(self, results):
+        escape = lambda name: name.replace("_", r"{\_}")
+        lines = [r"\begin{center}\begin{tabular}{@{}ll|r" + "r" * len(SUMMARY) + "@{}}",
+            r"\textbf{group} & \textbf{algorithm} & \textbf{runs} & " +
+            " & ".join(r"\textbf{%s}" % title for _, title, _ in SUMMARY) + r"\\"]
+        previous = None
+        for group, algorithm, runs, medians in results:
+            if group != previous:
+                lines.append(r"\midrule")
+            lines.append(" & ".join([escape(group) if group != previous else "", escape(algorithm), str(runs)] +
+                [self._format_number(value) for value in medians]) + r"\\")
+            previous = group
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        return "\n".join(lines)
+
+    def _format_txt(self, results):
+        lines = [",".join(["group", "algorithm", "runs"] + ["median_" + name for name, _, _ in SUMMARY])]
+        for group, algorithm, runs, medians in results:
+            lines.append(",".join([group, algorithm, str(runs)] +
+                [self._format_number(value, "{:.6g}") for value in medians]))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            results = self._summarize(algorithms)
+        if not results:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        return getattr(self, "_format_" + self.output_format)(results)
+
+
+class ResourceProfileReport(CustomReport, PlanningReport):
+    """
+    Creates a CSV with the resource profiles of every algorithm (and
+    group if *group_by* is given): the mean and quantiles of the
+    sampled *series* ("rss", "cpu_time", "io_bytes" or
+    "cpu_utilization", the CPU time per wall time between samples).
+
+    The samples are resampled onto *num_points* points of wall time,
+    or of the fraction of each run's sampled time if *progress* is set.
+    A run only contributes while it runs.
+    """
+    def __init__(self, algorithms=None, series=("rss", "cpu_utilization"), quantiles=(0.25, 0.5, 0.75),
+            num_points=100, progress=False, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "txt"
+        elif kwargs["format"] != "txt":
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        for name in series:
+            if name not in SERIES:
+                raise ValueError("unknown series: {}".format(name))
+        if num_points < 2:
+            raise ValueError("Grid needs at least two points")
+        kwargs["attributes"] = ["resource_time"] + sorted(set(SERIES[name] for name in series))
+        super(ResourceProfileReport, self).__init__(**kwargs)
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.series = list(series)
+        self.quantiles = list(quantiles)
+        self.num_points = num_points
+        self.progress = progress
+        self.group_by = group_by
+        self.group_key = make_group_key(group_by)
+
+    def _collect(self, algorithms):
+        """Return a dict from (group, algorithm) to a list of runs with samples."""
+        wanted = set(algorithms)
+        runs = defaultdict(list)
+        for run in self.props.values():
+            if run["algorithm"] not in wanted or not run.get("resource_time"):
+                continue
+            runs[("Total", run["algorithm"])].append(run)
+            if self.group_by is not None:
+                runs[(self.group_key(run)[0], run["algorithm"])].append(run)
+        return runs
+
+    def _make_grid(self, runs):
+        if self.progress:
+            return np.linspace(0, 1, self.num_points)
+        first = min(run["resource_time"][0] for values in runs.values() for run in values)
+        last = max(run["resource_time"][-1] for values in runs.values() for run in values)
+        return np.linspace(first, max(last, first + 1e-3), self.num_points)
+
+    def _values(self, runs, name):
+        """Return the concatenated samples of series *name* of all runs."""
+        y = np.concatenate([np.asarray(run[SERIES[name]], dtype=float) for run in runs])
+        if name != "cpu_utilization":
+            return y
+        # CPU time per wall time since the previous sample (or the start)
+        x = np.concatenate([np.asarray(run["resource_time"], dtype=float) for run in runs])
+        starts = np.cumsum([0] + [len(run["resource_time"]) for run in runs[:-1]])
+        dx, dy = np.diff(x, prepend=0.0), np.diff(y, prepend=0.0)
+        dx[starts], dy[starts] = x[starts], y[starts]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(dx > 0, dy / dx, np.nan)
+
+    def _curves(self, runs, grid):
+        x, _, offsets = pack_series([(run["resource_time"], run["resource_time"]) for run in runs])
+        if self.progress:
+            x = normalize_progress(x, offsets)
+        columns = []
+        for name in self.series:
+            count, mean, quantiles = summarize(resample(x, self._values(runs, name), offsets, grid), self.quantiles)
+            if not columns:
+                columns.append(("count", count))
+            columns.append((name + "_mean", mean))
+            for q, values in zip(self.quantiles, quantiles):
+                columns.append(("{}_q{:g}".format(name, 100 * q), values))
+        return columns
+
+    def _format_value(self, value):
+        return "" if np.isnan(value) else "{:g}".format(value)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            runs = self._collect(algorithms)
+        if not runs:
+            return ""
+        grid = self._make_grid(runs)
+        header, columns = ["progress" if self.progress else "time"], [grid]
+        order = {algorithm: i for i, algorithm in enumerate(algorithms)}
+        with self.phase("resample"):
+            for group, algorithm in sorted(runs, key=lambda key: (key[0] == "Total", key[0], order[key[1]])):
+                prefix = algorithm if self.group_by is None else group + "_" + algorithm
+                for name, values in self._curves(runs[(group, algorithm)], grid):
+                    header.append(prefix + "_" + name)
+                    columns.append(values)
+        lines = [",".join(header)]
+        for row in np.column_stack(columns):
+            lines.append(",".join(self._format_value(value) for value in row))
+        return "\n".join(lines)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""
+Packs finished run directories into one zip archive per run batch
+(the "runs-XXXXX-YYYYY" directories lab creates) and reads runs back
+from these archives.
+
+A zip archive stores a central index, so single files of single runs
+can be read without scanning or unpacking the whole archive. This
+replaces tens of thousands of small files on the network filesystem by
+a handful of large ones.
+"""
+
+import glob
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import zipfile
+
+from lab import tools
+from lab.fetcher import Fetcher
+
+ARCHIVE_SUFFIX = ".zip"
+# a run is considered finished as soon as its parsers have written properties
+FINISHED_MARKER = "properties"
+
+
+def _batch_dirs(exp_dir):
+    return sorted(path for path in glob.glob(os.path.join(exp_dir, "runs-*-*"))
+        if os.path.isdir(path))
+
+def _archives(exp_dir):
+    return sorted(glob.glob(os.path.join(exp_dir, "runs-*-*" + ARCHIVE_SUFFIX)))
+
+def _run_dirs(batch_dir):
+    return sorted(path for path in glob.glob(os.path.join(batch_dir, "*"))
+        if os.path.isdir(path))
+
+
+class RunArchive(object):
+    """
+    Read access to the runs of one packed batch. Members are stored
+    as "<run name>/<file name>", e.g. "00001/run.log".
+    """
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "r")
+        self._members = set(self._zip.namelist())
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run_names(self):
+        return sorted(set(name.split("/", 1)[0] for name in self._members))
+
+    def has_file(self, run_name, filename):
+        return run_name + "/" + filename in self._members
+
+    def read(self, run_name, filename):
+        """Return the content of *filename* of the given run as text."""
+        return self._zip.read(run_name + "/" + filename).decode("utf-8", "replace")
+
+    def read_properties(self, run_name):
+        """
+        Return the combined static and dynamic properties of a run,
+        in the same way lab's fetcher combines them.
+        """
+        props = {}
+        for filename in ["static-properties", "properties"]:
+            if self.has_file(run_name, filename):
+                props.update(json.loads(self.read(run_name, filename)))
+        errors = []
+        if not self.has_file(run_name, "driver.log"):
+            errors.append("driver.log is missing. Probably the run was never started.")
+        for filename in ["driver.err", "run.err"]:
+            content = self.read(run_name, filename) if self.has_file(run_name, filename) else ""
+            if content:
+                errors.append("{}: {}".format(filename, content))
+        for message in errors:
+            unexplained = props.setdefault("unexplained_errors", [])
+            if message not in unexplained:
+                unexplained.append(message)
+        return props
+
+    def extract_run(self, run_name, dest_dir):
+        prefix = run_name + "/"
+        for name in self._members:
+            if name.startswith(prefix) and not name.endswith("/"):
+                self._zip.extract(name, dest_dir)
+        return os.path.join(dest_dir, run_name)
+
+
+def _write_run(archive, batch_dir, run_dir):
+    for root, dirs, files in os.walk(run_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            archive.write(path, os.path.relpath(path, batch_dir).replace(os.sep, "/"))
+
+
+def pack_runs(exp_dir, remove=True, compression=zipfile.ZIP_DEFLATED):
+    """
+    Pack all finished runs of each batch directory into
+    "<batch dir>.zip". Runs without a properties file are left on disk.
+    Runs that are already packed, e.g. after rerunning them, replace
+    their old members. If *remove* is True, packed run directories are
+    deleted.
+    """
+    for batch_dir in _batch_dirs(exp_dir):
+        archive_path = batch_dir + ARCHIVE_SUFFIX
+        packed, pending = [], 0
+        for run_dir in _run_dirs(batch_dir):
+            if os.path.exists(os.path.join(run_dir, FINISHED_MARKER)):
+                packed.append(run_dir)
+            else:
+                pending += 1
+        names = set(os.path.basename(run_dir) for run_dir in packed)
+        stale = []
+        if os.path.exists(archive_path):
+            with zipfile.ZipFile(archive_path, "r") as archive:
+                stale = [name for name in archive.namelist() if name.split("/", 1)[0] in names]
+        if stale:
+            # zip files can't drop members, so rewrite the archive without the old runs
+            new_path = archive_path + ".tmp"
+            with zipfile.ZipFile(archive_path, "r") as old, \
+                    zipfile.ZipFile(new_path, "w", compression, allowZip64=True) as new:
+                for info in old.infolist():
+                    if info.filename.split("/", 1)[0] not in names:
+                        new.writestr(info, old.read(info.filename))
+                for run_dir in packed:
+                    _write_run(new, batch_dir, run_dir)
+            os.rename(new_path, archive_path)
+        elif packed:
+            mode = "a" if os.path.exists(archive_path) else "w"
+            with zipfile.ZipFile(archive_path, mode, compression, allowZip64=True) as archive:
+                for run_dir in packed:
+                    _write_run(archive, batch_dir, run_dir)
+        logging.info("Packed {} runs into {} ({} replaced, {} unfinished)".format(
+            len(packed), archive_path, len(set(name.split("/", 1)[0] for name in stale)), pending))
+        if remove:
+            for run_dir in packed:
+                shutil.rmtree(run_dir)
+            if not pending and not os.listdir(batch_dir):
+                os.rmdir(batch_dir)
+
+
+def iter_run_properties(exp_dir):
+    """
+    Yield the properties of all runs in *exp_dir*, both packed and
+    unpacked. Unpacked runs take precedence over packed ones.
+    """
+    fetcher = Fetcher()
+    unpacked = set()
+    for batch_dir in _batch_dirs(exp_dir):
+        for run_dir in _run_dirs(batch_dir):
+            unpacked.add((os.path.basename(batch_dir), os.path.basename(run_dir)))
+            yield fetcher.fetch_dir(run_dir)
+    for archive_path in _archives(exp_dir):
+        batch_name = os.path.basename(archive_path)[:-len(ARCHIVE_SUFFIX)]
+        with RunArchive(archive_path) as archive:
+            for run_name in archive.run_names():
+                if (batch_name, run_name) not in unpacked:
+                    yield archive.read_properties(run_name)
+
+
+def fetch_runs(exp_dir, eval_dir=None, merge=False):
+    """
+    Replacement for lab's fetcher that also reads packed runs.
+    Writes the combined properties to *eval_dir*/properties.
+    """
+    eval_dir = eval_dir or exp_dir.rstrip("/") + "-eval"
+    tools.makedirs(eval_dir)
+    combined = tools.Properties(filename=os.path.join(eval_dir, "properties"))
+    if not merge:
+        combined.clear()
+    count = 0
+    for props in iter_run_properties(exp_dir):
+        combined["-".join(props["id"])] = props
+        count += 1
+    logging.info("Fetched {} runs from {}".format(count, exp_dir))
+    combined.write()
+
+
+def reparse_archives(exp_dir, parsers):
+    """
+    Run the given parser scripts again on all packed runs. Each run is
+    extracted to a local temporary directory, parsed there and its
+    updated properties are written back into a rewritten archive.
+    """
+    parsers = [os.path.abspath(parser) for parser in parsers]
+    for archive_path in _archives(exp_dir):
+        tmp_dir = tempfile.mkdtemp(prefix="reparse-")
+        try:
+            updated = {}
+            with RunArchive(archive_path) as archive:
+                for run_name in archive.run_names():
+                    run_dir = archive.extract_run(run_name, tmp_dir)
+                    for parser in parsers:
+                        subprocess.check_call(
+                            [tools.get_python_executable(), parser], cwd=run_dir)
+                    with open(os.path.join(run_dir, "properties")) as f:
+                        updated[run_name + "/properties"] = f.read()
+                    shutil.rmtree(run_dir)
+            new_path = archive_path + ".tmp"
+            with zipfile.ZipFile(archive_path, "r") as old, \
+                    zipfile.ZipFile(new_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as new:
+                for info in old.infolist():
+                    if info.filename in updated:
+                        new.writestr(info, updated.pop(info.filename))
+                    else:
+                        new.writestr(info, old.read(info.filename))
+                for member, content in updated.items():
+                    new.writestr(member, content)
+            os.rename(new_path, archive_path)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
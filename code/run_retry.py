@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Finds runs that failed because of resource limits and computes the
+escalated limits for running them again (see
+CEGARExperiment.add_retry_steps).
+"""
+
+import json
+import logging
+import os
+import re
+
+RETRY_FILE = "retry-runs.json"
+# prefix added by start-parser.py to errors that happened before the search
+NO_SEARCH_PREFIX = "no-search-due-to-"
+# lab's message when a command exceeds an output limit
+OUTPUT_LIMIT = re.compile(r"\((?:hard|soft) limit")
+KINDS = ["memory", "time", "output"]
+
+DEFAULT_MEMORY_LIMIT = "3584M"
+DEFAULT_TIME_LIMIT = "30m"
+MEMORY_UNITS = {"K": 1.0 / 1024, "M": 1, "G": 1024}
+TIME_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def failure_kinds(run):
+    """Return the resource limits (see KINDS) a run failed on."""
+    kinds = set()
+    error = run.get("error") or ""
+    if error.startswith(NO_SEARCH_PREFIX):
+        error = error[len(NO_SEARCH_PREFIX):]
+    if "out-of-memory" in error:
+        kinds.add("memory")
+    if "timeout" in error or "out-of-time" in error or error.endswith("-and-time"):
+        kinds.add("time")
+    if any(OUTPUT_LIMIT.search(message) for message in run.get("unexplained_errors") or []):
+        kinds.add("output")
+    return kinds
+
+
+def find_failed_runs(props, kinds=("memory", "output")):
+    """
+    Return a sorted list of {"id": run id, "kinds": [...]} for all runs in
+    *props* that failed on one of the given resource limits.
+    """
+    for kind in kinds:
+        if kind not in KINDS:
+            raise ValueError("unknown resource limit: {}".format(kind))
+    failed = []
+    for run in props.values():
+        failed_kinds = failure_kinds(run) & set(kinds)
+        if failed_kinds:
+            failed.append({"id": list(run["id"]), "kinds": sorted(failed_kinds)})
+    return sorted(failed, key=lambda entry: entry["id"])
+
+
+def write_retry_runs(path, failed):
+    with open(path, "w") as f:
+        json.dump(failed, f, indent=2)
+    logging.info("Wrote {} runs to retry to {}".format(len(failed), path))
+
+
+def read_retry_runs(path):
+    if not os.path.exists(path):
+        logging.critical("No runs to retry found at {}, run the retry build step first".format(path))
+    with open(path) as f:
+        return json.load(f)
+
+
+def parse_memory_limit(value):
+    """Return a memory limit like "3584M" or "4G" in MB."""
+    match = re.match(r"^(\d+(?:\.\d+)?)([KMG])?$", value)
+    if not match:
+        raise ValueError("cannot parse memory limit: {}".format(value))
+    return float(match.group(1)) * MEMORY_UNITS[match.group(2) or "M"]
+
+
+def _last_index(options, option):
+    """
+    Return the index of the last *option* in *options*, or None. lab
+    prepends its default limits, and the driver uses the last value.
+    """
+    if option not in options:
+        return None
+    return len(options) - 1 - options[::-1].index(option)
+
+
+def driver_memory_limit(driver_options):
+    """Return the overall memory limit in MB set by *driver_options*."""
+    options = list(driver_options or [])
+    index = _last_index(options, "--overall-memory-limit")
+    if index is not None:
+        return parse_memory_limit(options[index + 1])
+    return parse_memory_limit(DEFAULT_MEMORY_LIMIT)
+
+
+def _scale_memory(value, factor):
+    return "{}M".format(int(parse_memory_limit(value) * factor))
+
+
+def _scale_time(value, factor):
+    match = re.match(r"^(\d+(?:\.\d+)?)([smh])?$", value)
+    if not match:
+        raise ValueError("cannot parse time limit: {}".format(value))
+    seconds = float(match.group(1)) * TIME_UNITS[match.group(2) or "s"]
+    return "{}s".format(int(seconds * factor))
+
+
+def _escalate_option(options, option, default, scale, factor):
+    options = list(options)
+    index = _last_index(options, option)
+    if index is not None:
+        options[index + 1] = scale(options[index + 1], factor)
+    else:
+        options = [option, scale(default, factor)] + options
+    return options
+
+
+def escalate_driver_options(driver_options, memory_factor=1, time_factor=1):
+    """Return *driver_options* with multiplied overall memory and time limits."""
+    options = list(driver_options or [])
+    if memory_factor != 1:
+        options = _escalate_option(options, "--overall-memory-limit", DEFAULT_MEMORY_LIMIT,
+            _scale_memory, memory_factor)
+    if time_factor != 1:
+        options = _escalate_option(options, "--overall-time-limit", DEFAULT_TIME_LIMIT,
+            _scale_time, time_factor)
+    return options
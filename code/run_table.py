@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar export of an eval dir's properties.
+
+The table stores one row per run. Scalar numbers and booleans become
+typed NumPy columns with a mask of present values (float columns
+remember which values were ints), strings and other values become
+dictionary-encoded columns, and lists of numbers (e.g.
+h_split_statistics) are stored flat with row offsets. Every run also
+gets a "group" column with its domain group from domain_groups.
+
+The default format is a directory of .npy files that are loaded
+memory-mapped, so reading a table only touches the columns and rows
+that are actually used. With pyarrow installed, the table can be
+written as Parquet instead.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+from domain_groups import DOMAIN_GROUPING
+
+TABLE_DIR = "table"
+PARQUET_FILE = "properties.parquet"
+META_FILE = "meta.json"
+FORMATS = ["npy", "parquet"]
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:
+    STRING_TYPES = (str,)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _number_list_width(value):
+    """
+    Return 0 for a flat list of numbers, the row width for a list of
+    equally long lists of numbers, and None for anything else.
+    """
+    if not isinstance(value, list):
+        return None
+    if all(_is_number(item) for item in value):
+        return 0
+    if all(isinstance(item, list) for item in value):
+        widths = set(len(item) for item in value)
+        if len(widths) == 1 and all(_is_number(x) for item in value for x in item):
+            return widths.pop()
+    return None
+
+
+def _column_kind(values):
+    """Return (kind, dtype, width) that can hold all present *values*."""
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, bool) for value in present):
+        return "bool", "bool", None
+    if all(_is_number(value) for value in present):
+        if all(isinstance(value, int) for value in present):
+            return "number", "int64", None
+        return "number", "float64", None
+    # empty lists fit any width
+    widths = set(_number_list_width(value) for value in present if value != [])
+    if all(isinstance(value, list) for value in present) and not widths:
+        widths = set([0])
+    if len(widths) == 1 and None not in widths:
+        floats = any(isinstance(x, float) for value in present for x in np.ravel(value))
+        return "list", "float64" if floats else "int64", widths.pop()
+    if all(isinstance(value, STRING_TYPES) for value in present):
+        return "category", None, None
+    return "json", None, None
+
+
+def _has_mixed_numbers(values):
+    """True if *values* contain both ints and floats (also within lists)."""
+    numbers = [x for value in values if value is not None
+        for x in (value if isinstance(value, list) else [value])]
+    return any(isinstance(x, int) for x in numbers) and any(isinstance(x, float) for x in numbers)
+
+
+def _save_int_mask(prefix, info, values):
+    # floats written as ints come back as ints
+    np.save(prefix + ".ints.npy", np.array([isinstance(value, int) for value in values], dtype=bool))
+    info["mixed_ints"] = True
+
+
+def _column_hash(values):
+    """Digest of a column's values, stored for report fingerprints."""
+    text = json.dumps(values, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _read_properties(eval_dir):
+    with open(os.path.join(eval_dir, "properties")) as f:
+        return json.load(f)
+
+
+def _table_columns(props):
+    """Return the run ids and a dict from attribute names to value lists."""
+    run_ids = sorted(props)
+    attributes = set()
+    for run in props.values():
+        attributes.update(run)
+    columns = {attribute: [props[run_id].get(attribute) for run_id in run_ids]
+        for attribute in sorted(attributes)}
+    columns["group"] = [DOMAIN_GROUPING.group(props[run_id]["domain"]) for run_id in run_ids]
+    return run_ids, columns
+
+
+def export_table(eval_dir, format="npy"):
+    """
+    Write the properties of *eval_dir* as table into the eval dir,
+    as directory "table" (format "npy") or file "properties.parquet".
+    """
+    if format not in FORMATS:
+        raise ValueError("unknown table format: {}".format(format))
+    start = time.time()
+    run_ids, columns = _table_columns(_read_properties(eval_dir))
+    if format == "parquet":
+        path = _write_parquet(os.path.join(eval_dir, PARQUET_FILE), run_ids, columns)
+    else:
+        path = _write_npy(os.path.join(eval_dir, TABLE_DIR), run_ids, columns)
+    logging.info("Exported {} runs with {} attributes to {} in {:.2f}s".format(
+        len(run_ids), len(columns), path, time.time() - start))
+    return path
+
+
+def _write_npy(path, run_ids, columns):
+    if not os.path.exists(path):
+        os.makedirs(path)
+    meta = {"num_rows": len(run_ids), "columns": {}}
+    np.save(os.path.join(path, "_run_id.npy"), np.array(run_ids, dtype=object).astype(str))
+    for index, (name, values) in enumerate(sorted(columns.items())):
+        kind, dtype, width = _column_kind(values)
+        # attribute names may contain anything, so files are numbered
+        prefix = os.path.join(path, "c{:04d}".format(index))
+        info = {"kind": kind, "file": os.path.basename(prefix), "hash": _column_hash(values)}
+        mask = np.array([value is not None for value in values])
+        np.save(prefix + ".mask.npy", mask)
+        if kind in ["number", "bool"]:
+            data = np.array([0 if value is None else value for value in values], dtype=dtype)
+            np.save(prefix + ".npy", data)
+            if dtype == "float64" and _has_mixed_numbers(values):
+                _save_int_mask(prefix, info, values)
+        elif kind == "list":
+            lengths = [0 if value is None else len(value) for value in values]
+            offsets = np.zeros(len(values) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            flat = [item for value in values if value is not None for item in value]
+            data = np.array(flat, dtype=dtype)
+            if width:
+                data = data.reshape(-1, width)
+                if dtype == "float64":
+                    # fields like N in h_split_statistics stay integers
+                    info["int_fields"] = [i for i in range(width)
+                        if all(isinstance(item[i], int) for item in flat)]
+            elif dtype == "float64" and _has_mixed_numbers(values):
+                _save_int_mask(prefix, info, flat)
+            np.save(prefix + ".npy", data)
+            np.save(prefix + ".offsets.npy", offsets)
+        else:
+            if kind == "json":
+                values = [None if value is None else json.dumps(value, sort_keys=True) for value in values]
+            categories = sorted(set(value for value in values if value is not None))
+            codes = {value: code for code, value in enumerate(categories)}
+            np.save(prefix + ".npy", np.array([codes.get(value, -1) for value in values], dtype=np.int32))
+            info["categories"] = categories
+        info["dtype"] = dtype
+        meta["columns"][name] = info
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(meta, f)
+    return path
+
+
+def _write_parquet(path, run_ids, columns):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow, use format='npy' instead")
+    arrays, names = [pyarrow.array(run_ids)], ["_run_id"]
+    kinds = {}
+    for name, values in sorted(columns.items()):
+        kind, _, _ = _column_kind(values)
+        if kind in ["number", "list"] and _has_mixed_numbers(values):
+            # Arrow would turn the ints into floats
+            kind = "json"
+        kinds[name] = kind
+        if kind == "json":
+            values = [None if value is None else json.dumps(value, sort_keys=True) for value in values]
+        array = pyarrow.array(values)
+        if kind in ["category", "json"]:
+            array = array.dictionary_encode()
+        arrays.append(array)
+        names.append(name)
+    table = pyarrow.Table.from_arrays(arrays, names=names)
+    table = table.replace_schema_metadata({
+        "json_columns": json.dumps([name for name, kind in kinds.items() if kind == "json"]),
+        "columns": json.dumps({name: {"kind": kinds[name], "hash": _column_hash(values)}
+            for name, values in columns.items()}),
+    })
+    pyarrow.parquet.write_table(table, path)
+    return path
+
+
+class TableRun(MutableMapping):
+    """
+    A run backed by a row of a RunTable. Values are read from the
+    columns on access; changes (e.g. by report filters) only touch a
+    private overlay.
+    """
+    __slots__ = ["_table", "_row", "_overlay", "_deleted"]
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+        self._overlay = {}
+        self._deleted = set()
+
+    def __getitem__(self, key):
+        if key in self._overlay:
+            return self._overlay[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        return self._table.value(key, self._row)
+
+    def __setitem__(self, key, value):
+        self._overlay[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._overlay.pop(key, None)
+        self._deleted.add(key)
+
+    def __contains__(self, key):
+        if key in self._overlay:
+            return True
+        if key in self._deleted:
+            return False
+        return self._table.has_value(key, self._row)
+
+    def __iter__(self):
+        for key in self._overlay:
+            yield key
+        for key in self._table.column_names:
+            if key not in self._overlay and key not in self._deleted and self._table.has_value(key, self._row):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def copy(self):
+        return dict(self)
+
+
+def dict_filter(filter_):
+    """
+    Return *filter_* converting the TableRuns it returns to dicts, as
+    lab's RunFilter only accepts dicts and booleans.
+    """
+    def wrapped(run):
+        result = filter_(run)
+        if isinstance(result, TableRun):
+            result = dict(result)
+        return result
+    return wrapped
+
+
+class RunTable(object):
+    """
+    A table exported by export_table, loaded from *path* (a "table"
+    directory or a Parquet file). Only *columns* are loaded if given.
+    Can be passed as source of the custom reports.
+
+    If *accessed* is set to a set, the names of all columns looked up
+    are added to it (see CustomReport's fingerprints).
+    """
+    def __init__(self, path, columns=None):
+        self.path = path
+        self._columns = {}
+        self.accessed = None
+        if os.path.isdir(path):
+            self._load_npy(path, columns)
+        else:
+            self._load_parquet(path, columns)
+        self.column_names = sorted(self._columns)
+
+    def _load_npy(self, path, columns):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.run_ids = np.load(os.path.join(path, "_run_id.npy"), mmap_mode="r")
+        self.num_rows = meta["num_rows"]
+        for name, info in meta["columns"].items():
+            if columns is not None and name not in columns:
+                continue
+            prefix = os.path.join(path, info["file"])
+            column = dict(info)
+            column["data"] = np.load(prefix + ".npy", mmap_mode="r")
+            column["mask"] = np.load(prefix + ".mask.npy", mmap_mode="r")
+            if info["kind"] == "list":
+                column["offsets"] = np.load(prefix + ".offsets.npy", mmap_mode="r")
+            if info.get("mixed_ints"):
+                column["ints"] = np.load(prefix + ".ints.npy", mmap_mode="r")
+            self._columns[name] = column
+
+    def _load_parquet(self, path, columns):
+        import pyarrow.parquet
+        if columns is not None:
+            columns = ["_run_id"] + [name for name in columns if name != "_run_id"]
+            schema = pyarrow.parquet.read_schema(path)
+            columns = [name for name in columns if name in schema.names]
+        table = pyarrow.parquet.read_table(path, columns=columns, memory_map=True)
+        metadata = table.schema.metadata or {}
+        json_columns = set(json.loads(metadata.get(b"json_columns", b"[]")))
+        self.run_ids = table.column("_run_id").to_pylist()
+        self.num_rows = table.num_rows
+        for name in table.column_names:
+            if name == "_run_id":
+                continue
+            values = table.column(name).to_pylist()
+            self._columns[name] = {"kind": "json" if name in json_columns else "python", "values": values}
+
+    def has_value(self, name, row):
+        if self.accessed is not None:
+            self.accessed.add(name)
+        column = self._columns.get(name)
+        if column is None:
+            return False
+        if "values" in column:
+            return column["values"][row] is not None
+        return bool(column["mask"][row])
+
+    def value(self, name, row):
+        if not self.has_value(name, row):
+            raise KeyError(name)
+        column = self._columns[name]
+        kind = column["kind"]
+        if "values" in column:
+            value = column["values"][row]
+            return json.loads(value) if kind == "json" else value
+        if kind == "number":
+            value = column["data"][row].item()
+            if "ints" in column and column["ints"][row]:
+                value = int(value)
+            return value
+        if kind == "bool":
+            return bool(column["data"][row])
+        if kind == "list":
+            offsets = column["offsets"]
+            values = column["data"][offsets[row]:offsets[row + 1]].tolist()
+            if "ints" in column:
+                ints = column["ints"][offsets[row]:offsets[row + 1]]
+                values = [int(x) if is_int else x for x, is_int in zip(values, ints)]
+            for item in values:
+                for i in column.get("int_fields", ()):
+                    item[i] = int(item[i])
+            return values
+        value = column["categories"][column["data"][row]]
+        return json.loads(value) if kind == "json" else value
+
+    def column(self, name):
+        """
+        Return (values, mask) of a scalar number column as NumPy arrays,
+        for vectorized analysis without building runs.
+        """
+        column = self._columns[name]
+        if column.get("kind") != "number":
+            raise ValueError("not a number column: {}".format(name))
+        return column["data"], column["mask"]
+
+    def props(self):
+        """Return a dict from run ids to runs, like lab's properties."""
+        return {str(run_id): TableRun(self, row) for row, run_id in enumerate(self.run_ids)}
+
+
+def column_info(path):
+    """
+    Return {column name: {"kind": ..., "hash": ...}} of the table at
+    *path* without loading any columns.
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, META_FILE)) as f:
+            columns = json.load(f)["columns"]
+    else:
+        import pyarrow.parquet
+        metadata = pyarrow.parquet.read_schema(path).metadata or {}
+        columns = json.loads(metadata.get(b"columns", b"{}"))
+    return {name: {"kind": info["kind"], "hash": info.get("hash")} for name, info in columns.items()}
+
+
+def find_table(eval_dir):
+    """
+    Return the path of a table in *eval_dir* that is at least as new as
+    its properties file, or None.
+    """
+    properties = os.path.join(eval_dir, "properties")
+    for name in [TABLE_DIR, PARQUET_FILE]:
+        path = os.path.join(eval_dir, name)
+        marker = os.path.join(path, META_FILE) if name == TABLE_DIR else path
+        if not os.path.exists(marker):
+            continue
+        if os.path.exists(properties) and os.path.getmtime(marker) < os.path.getmtime(properties):
+            logging.info("Ignoring outdated table {}".format(path))
+            continue
+        return path
+    return None
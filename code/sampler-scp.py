@@ -16,6 +16,9 @@ from downward.reports.scatter import ScatterPlotReport
 from per_task_comparison import PerTaskComparison
 from relativescatter import RelativeScatterPlotReport
 from best_tabular import BestTabularReport
+from seed_report import SeedComparisonReport
+from scp_report import ScpThroughputReport
+from score_report import ScoreReport
 
 def mean(list):
     return sum(list) / len(list)
@@ -37,14 +40,18 @@ BENCHMARKS_DIR = os.environ["DOWNWARD_BENCHMARKS"]
 REVISION_CACHE = os.path.expanduser('~/lab/revision-cache')
 
 exp = CEGARExperiment(soft_limit=20*1024, hard_limit=50*1024, environment=ENV, revision_cache=REVISION_CACHE)
+DIR = os.path.dirname(os.path.abspath(__file__))
+exp.add_parser(os.path.join(DIR, "scp-parser.py"))
 exp.add_suite(BENCHMARKS_DIR, SUITE)
 
 splitters = ["RANDOM", "MAX_REFINED", "MIN_CG", "MAX_CG"]
 samplers = ["RANDOM_WALK", "RANDOM_SYN", "RANDOM_VALID"]
 algorithms = [(split, smpl) for split in splitters for smpl in samplers]
+# run three seeds per task, more where they disagree (see the seeds steps)
 for split, smpl in algorithms:
-	exp.add_algorithm(split.lower() + "-" + smpl.lower(), REPO, 'sampling-strategies',
-		['--search', 'astar(saturated_cost_partitioning([cartesian([landmarks(order=random, random_seed=0), goals(order=random, random_seed=0)], pick=' + split + ')], max_time=200, max_orders=infinity, diversify=true, sampler=' + smpl + ', max_optimization_time=0))'])
+	exp.add_seeded_algorithm(split.lower() + "-" + smpl.lower(), REPO, 'sampling-strategies',
+		['--search', 'astar(saturated_cost_partitioning([cartesian([landmarks(order=random, random_seed={seed}), goals(order=random, random_seed={seed})], pick=' + split + ')], max_time=200, max_orders=infinity, diversify=true, sampler=' + smpl + ', max_optimization_time=0))'],
+		seeds=range(10), min_seeds=3)
 alg_names = [split.lower() + "-" + smpl.lower() for split, smpl in algorithms]
 
 # Add step that writes experiment files to disk.
@@ -57,9 +64,17 @@ exp.add_step('start', exp.start_runs)
 # writes them to *-eval/properties.
 exp.add_fetcher(name='fetch')
 
+# Add steps that run further seeds on tasks with unstable results.
+exp.add_seed_steps(attribute="expansions_until_last_jump")
+
 # Add report step (AbsoluteReport is the standard report).
 exp.add_report(
 	AbsoluteReport(attributes=ATTRIBUTES), outfile='report.html')
+exp.add_report(
+	SeedComparisonReport(attributes=["coverage", "expansions_until_last_jump"]), outfile='seeds.tex')
+for fmt in ["tex", "txt"]:
+	exp.add_report(ScpThroughputReport(format=fmt), outfile='scp_throughput.' + fmt)
+	exp.add_report(ScoreReport(alg_names, format=fmt), outfile='scores.' + fmt)
 exp.add_report(
 	PerTaskComparison(sort=True, attributes=["expansions_until_last_jump"]), outfile='task_comparison.html')
 
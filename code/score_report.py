@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
+# values below these bounds score like the bound, e.g. times below a second
+LOWER_BOUNDS = {"total_time": 1.0, "search_time": 1.0, "search_start_time": 1.0, "memory": 1.0}
+
+
+def ipc_scores(values, lower_bound=1.0):
+    """
+    Return the IPC scores of a (tasks x algorithms) matrix of values of
+    solved tasks, NaN for unsolved ones: 1 / (1 + log10(value / best))
+    with the smallest value of the task as best, 0 if unsolved. Values
+    are raised to *lower_bound* first.
+    """
+    values = np.maximum(values, lower_bound)
+    with np.errstate(invalid="ignore"):
+        best = np.nanmin(np.where(np.isnan(values), np.inf, values), axis=1, keepdims=True)
+        scores = 1 / (1 + np.log10(values / best))
+    return np.where(np.isnan(values), 0.0, scores)
+
+
+class ScoreReport(CustomReport, PlanningReport):
+    """
+    Scores every algorithm IPC-style on each attribute (by default
+    total time, expansions and memory): a solved task scores
+    1 / (1 + log10(value / best)) with the best value of all algorithms
+    on the task, an unsolved task 0. So the best algorithm gets 1 and
+    ten times its cost halves the score. Values are raised to the
+    attribute's lower bound first (*lower_bounds* adds to
+    LOWER_BOUNDS, by default 1 for all attributes).
+
+    Scores are summed per group (see domain_groups.make_group_key,
+    domains by default) and in total, next to the coverage and the
+    mean of the attribute scores. The best sum of a group is bold.
+
+    For algorithms run with several seeds, coverage is the fraction of
+    seeds that solved a task (see seeds.aggregate_seeds), and the task's
+    scores are weighted by it, since the values are means over the
+    solving seeds only.
+    """
+    def __init__(self, algorithms=None, attributes=("total_time", "expansions_until_last_jump", "memory"),
+            lower_bounds=None, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        if not attributes:
+            raise ValueError("Report needs at least one attribute")
+        # PlanningReport sorts the attributes, keep the columns in order
+        self.score_attributes = [str(attribute) for attribute in attributes]
+        kwargs["attributes"] = ["coverage"] + self.score_attributes
+        super(ScoreReport, self).__init__(**kwargs)
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.lower_bounds = dict(LOWER_BOUNDS, **(lower_bounds or {}))
+        self.group_by = group_by
+        self.group_key = make_group_key(group_by)
+
+    def _get_tensor(self, algorithms):
+        """
+        Return (groups, coverage, values) with the group of each task, a
+        (tasks x algorithms) coverage matrix and a (tasks x attributes
+        x algorithms) array of the values of solved runs, NaN otherwise.
+        """
+        alg_idx = {alg: i for i, alg in enumerate(algorithms)}
+        # the coverage in the first row
+        shape = (len(self.score_attributes) + 1, len(algorithms))
+        tasks = defaultdict(lambda: np.full(shape, np.nan))
+        for run in self.props.values():
+            idx = alg_idx.get(run["algorithm"])
+            if idx is None:
+                continue
+            values = tasks[self.group_key(run)]
+            if not run.get("coverage"):
+                continue
+            values[0, idx] = run["coverage"]
+            for i, attribute in enumerate(self.score_attributes, 1):
+                value = run.get(attribute)
+                if value is not None:
+                    values[i, idx] = value
+        keys = sorted(tasks)
+        groups = np.array([group for group, _ in keys])
+        values = np.array([tasks[key] for key in keys]).reshape((len(keys),) + shape)
+        return groups, np.nan_to_num(values[:, 0]), values[:, 1:]
+
+    def _aggregate(self, algorithms):
+        """Return a list of (group, tasks, coverage, scores) with per-algorithm arrays, the total last."""
+        groups, weights, values = self._get_tensor(algorithms)
+        # (tasks x attributes x algorithms), weighted by the share of solving seeds
+        scores = np.stack([ipc_scores(values[:, i], self.lower_bounds.get(attribute, 1.0))
+            for i, attribute in enumerate(self.score_attributes)], axis=1) * weights[:, np.newaxis, :]
+        names, group_idx = np.unique(groups, return_inverse=True)
+        coverage = np.zeros((len(names), len(algorithms)))
+        np.add.at(coverage, group_idx, weights)
+        sums = np.zeros((len(names),) + scores.shape[1:])
+        np.add.at(sums, group_idx, scores)
+        counts = np.bincount(group_idx, minlength=len(names))
+        results = [(name, counts[g], coverage[g], sums[g]) for g, name in enumerate(names)]
+        results.append(("Total", len(groups), coverage.sum(axis=0), sums.sum(axis=0)))
+        return results
+
+    def _format_coverage(self, value):
+        # fractions of seeds add up to fractional coverage
+        return "{:.0f}".format(value) if float(value).is_integer() else "{:.2f}".format(value)
+
+    def _format_tex(self, algorithms, results):
+        escape = lambda name: name.replace("_", r"{\_}")
+        columns = ["coverage"] + self.score_attributes + ["score"]
+        lines = [r"\begin{center}\begin{tabular}{@{}ll|r|r" + "r" * (len(columns) - 1) + "@{}}",
+            r"\textbf{group} & \textbf{algorithm} & \textbf{tasks} & " +
+            " & ".join(r"\textbf{%s}" % escape(column) for column in columns) + r"\\"]
+        for group, tasks, coverage, sums in results:
+            lines.append(r"\midrule")
+            table = np.vstack([coverage, sums, sums.mean(axis=0)])
+            best = table.max(axis=1)
+            for idx, algorithm in enumerate(algorithms):
+                cells = []
+                for row, value in enumerate(table[:, idx]):
+                    cell = self._format_coverage(value) if row == 0 else "{:.2f}".format(value)
+                    cells.append(r"\textbf{%s}" % cell if value == best[row] else cell)
+                lines.append(" & ".join([escape(group) if idx == 0 else "", escape(algorithm),
+                    str(tasks) if idx == 0 else ""] + cells) + r"\\")
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        return "\n".join(lines)
+
+    def _format_txt(self, algorithms, results):
+        lines = [",".join(["group", "algorithm", "tasks", "coverage"] +
+            ["score_" + attribute for attribute in self.score_attributes] + ["score"])]
+        for group, tasks, coverage, sums in results:
+            for idx, algorithm in enumerate(algorithms):
+                lines.append(",".join([group, algorithm, str(tasks), self._format_coverage(coverage[idx])] +
+                    ["{:.4f}".format(value) for value in sums[:, idx]] + ["{:.4f}".format(sums[:, idx].mean())]))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            results = self._aggregate(algorithms)
+        if results[-1][1] == 0:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        return getattr(self, "_format_" + self.output_format)(algorithms, results)
@@ -0,0 +1,43 @@
+#! /usr/bin/env python
+
+import re
+
+from lab.parser import Parser
+
+SECONDS = r"([\d.]+(?:e[+-]?\d+)?)s?"
+# newer planners prefix every line with "[t=..., ... KB] "
+PREFIX = r"^(?:\[t=[^\]]*\] )?"
+# output of saturated_cost_partitioning, the first match of each pattern counts
+PATTERNS = [
+	("scp_abstractions", re.compile(PREFIX + r"Abstractions: (\d+)$", re.M), int),
+	("scp_abstraction_time", re.compile(PREFIX + r"Time for building abstractions: " + SECONDS + "$", re.M), float),
+	("scp_samples", re.compile(PREFIX + r"Samples: (\d+)$", re.M), int),
+	("scp_sampling_time", re.compile(PREFIX + r"Time for sampling(?: states)?: " + SECONDS + "$", re.M), float),
+	("scp_orders_computed", re.compile(PREFIX + r"Evaluated orders: (\d+)$", re.M), int),
+	("scp_orders_kept", re.compile(PREFIX + r"(?:Cost partitionings|Orders|Stored orders): (\d+)$", re.M), int),
+	("scp_optimization_time", re.compile(PREFIX + r"Time for computing cost partitionings: " + SECONDS + "$", re.M), float),
+]
+
+def scp(content, props):
+	for attribute, pattern, type in PATTERNS:
+		match = pattern.search(content)
+		if match is not None:
+			props[attribute] = type(match.group(1))
+	times = [props[name] for name in ["scp_abstraction_time", "scp_sampling_time", "scp_optimization_time"]
+		if name in props]
+	if times:
+		props["scp_build_time"] = sum(times)
+	# without diversification every computed order is kept
+	if "scp_orders_computed" not in props and "scp_orders_kept" in props:
+		props["scp_orders_computed"] = props["scp_orders_kept"]
+	orders = props.get("scp_orders_computed")
+	time = props.get("scp_optimization_time")
+	if orders and time is not None:
+		props["scp_time_per_order"] = time / orders
+		if time > 0:
+			props["scp_orders_per_second"] = orders / time
+
+print("Running saturated cost partitioning parser")
+parser = Parser()
+parser.add_function(scp)
+parser.parse()
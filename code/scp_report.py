@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import warnings
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
+# columns of the report, the medians over the runs of an algorithm
+COLUMNS = [
+    ("orders", "orders"),
+    ("kept", "kept"),
+    ("kept_ratio", "kept [\\%]"),
+    ("orders_per_second", "orders/s"),
+    ("time_per_order", "s/order"),
+    ("build_time", "build [s]"),
+    ("h_per_second", "$h_0$/s"),
+]
+
+
+def _column_values(run):
+    values = {
+        "orders": run.get("scp_orders_computed"),
+        "kept": run.get("scp_orders_kept"),
+        "orders_per_second": run.get("scp_orders_per_second"),
+        "time_per_order": run.get("scp_time_per_order"),
+        "build_time": run.get("scp_build_time"),
+    }
+    if values["orders"] and values["kept"] is not None:
+        values["kept_ratio"] = 100 * values["kept"] / values["orders"]
+    if values["build_time"] and run.get("initial_h_value") is not None:
+        values["h_per_second"] = run["initial_h_value"] / values["build_time"]
+    return values
+
+
+class ScpThroughputReport(CustomReport, PlanningReport):
+    """
+    Compares how productively the algorithms use the time of saturated
+    cost partitioning (see scp-parser.py), per algorithm and per group
+    if *group_by* is given: the medians of the computed and kept
+    orders, the share of kept orders, orders per second and seconds per
+    order of the optimization, the build time (abstractions, sampling
+    and optimization) and the initial h value per second of build time.
+    """
+    def __init__(self, algorithms=None, group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        kwargs["attributes"] = ["scp_orders_computed", "scp_orders_kept", "scp_orders_per_second",
+            "scp_time_per_order", "scp_build_time", "initial_h_value"]
+        super(ScpThroughputReport, self).__init__(**kwargs)
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.group_by = group_by
+        self.group_key = make_group_key(group_by)
+
+    def _collect(self, algorithms):
+        """Return a dict from (group, algorithm) to a (runs x COLUMNS) array, NaN if missing."""
+        wanted = set(algorithms)
+        rows = defaultdict(list)
+        for run in self.props.values():
+            if run["algorithm"] not in wanted or run.get("scp_build_time") is None:
+                continue
+            values = _column_values(run)
+            row = [np.nan if values.get(name) is None else values[name] for name, _ in COLUMNS]
+            rows[("Total", run["algorithm"])].append(row)
+            if self.group_by is not None:
+                rows[(self.group_key(run)[0], run["algorithm"])].append(row)
+        return {key: np.array(values, dtype=float) for key, values in rows.items()}
+
+    def _summarize(self, algorithms):
+        """Return a list of (group, algorithm, runs, medians), the total last."""
+        stats = self._collect(algorithms)
+        order = {algorithm: i for i, algorithm in enumerate(algorithms)}
+        keys = sorted(stats, key=lambda key: (key[0] == "Total", key[0], order[key[1]]))
+        results = []
+        for group, algorithm in keys:
+            values = stats[(group, algorithm)]
+            with warnings.catch_warnings():
+                # columns without any value, e.g. orders without diversification
+                warnings.simplefilter("ignore", RuntimeWarning)
+                medians = np.nanmedian(values, axis=0)
+            results.append((group, algorithm, len(values), medians))
+        return results
+
+    def _format_number(self, value, pattern="{:.2f}"):
+        return "" if np.isnan(value) else pattern.format(value)
+
+    def _format_tex(self, results):
+        escape = lambda name: name.replace("_", r"{\_}")
+        lines = [r"\begin{center}\begin{tabular}{@{}ll|r" + "r" * len(COLUMNS) + "@{}}",
+            r"\textbf{group} & \textbf{algorithm} & \textbf{runs} & " +
+            " & ".join(r"\textbf{%s}" % title for _, title in COLUMNS) + r"\\"]
+        previous = None
+        for group, algorithm, runs, medians in results:
+            if group != previous:
+                lines.append(r"\midrule")
+            lines.append(" & ".join([escape(group) if group != previous else "", escape(algorithm), str(runs)] +
+                [self._format_number(value) for value in medians]) + r"\\")
+            previous = group
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        return "\n".join(lines)
+
+    def _format_txt(self, results):
+        lines = [",".join(["group", "algorithm", "runs"] + ["median_" + name for name, _ in COLUMNS])]
+        for group, algorithm, runs, medians in results:
+            lines.append(",".join([group, algorithm, str(runs)] +
+                [self._format_number(value, "{:.6g}") for value in medians]))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            results = self._summarize(algorithms)
+        if not results:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        return getattr(self, "_format_" + self.output_format)(results)
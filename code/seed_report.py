@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from merged_data import algorithm_key
+from seeds import t_quantile
+
+
+class SeedComparisonReport(CustomReport, PlanningReport):
+    """
+    Compares algorithms replicated over seeds (see
+    CEGARExperiment.add_seeded_algorithm) on every attribute: the mean
+    and *confidence* interval of the per-seed totals, the number of
+    seeds on which an algorithm has the best total and the mean number
+    of tasks per seed on which it is strictly best.
+
+    The totals of coverage count missing values as 0, those of other
+    attributes sum the tasks solved by all algorithms with that seed.
+    Only seeds that every algorithm ran on all of its tasks are
+    compared, so extra seeds of unstable tasks (see
+    CEGARExperiment.add_seed_steps) are left out. Algorithms without
+    seeds count as having every seed with the same runs.
+    """
+    def __init__(self, algorithms=None, confidence=0.95, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        kwargs["aggregate_seeds"] = False
+        super(SeedComparisonReport, self).__init__(**kwargs)
+        if not self.attributes:
+            raise ValueError("Report needs at least one attribute")
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.confidence = confidence
+
+    def _default_algorithms(self):
+        names = {}
+        for run in self.props.values():
+            names.setdefault(run["algorithm"], run.get("replicated_algorithm", run["algorithm"]))
+        return sorted(set(names.values()))
+
+    def _get_tensor(self, algorithms):
+        """
+        Return (seeds, values) with the common seeds and a (tasks x
+        attributes x algorithms x seeds) array, NaN for missing values.
+        """
+        alg_idx = {alg: i for i, alg in enumerate(algorithms)}
+        runs = defaultdict(dict)
+        # the seeds of every seeded algorithm per task
+        task_seeds = defaultdict(lambda: defaultdict(set))
+        for run in self.props.values():
+            idx = alg_idx.get(run.get("replicated_algorithm", run["algorithm"]))
+            if idx is None:
+                continue
+            seed = run.get("seed")
+            runs[(run["domain"], run["problem"])][(idx, seed)] = run
+            if seed is not None:
+                task_seeds[idx][(run["domain"], run["problem"])].add(seed)
+        seeded = [set.intersection(*task_seeds[idx].values()) for idx in sorted(task_seeds)]
+        seeds = sorted(set.intersection(*seeded)) if seeded else [None]
+        seed_idx = {seed: i for i, seed in enumerate(seeds)}
+        shape = (len(self.attributes), len(algorithms), len(seeds))
+        keys = sorted(runs)
+        values = np.full((len(keys),) + shape, np.nan)
+        for t, key in enumerate(keys):
+            for (idx, seed), run in runs[key].items():
+                if seed is None:
+                    # unseeded runs stand for every seed
+                    columns = slice(None)
+                elif seed in seed_idx:
+                    columns = seed_idx[seed]
+                else:
+                    continue
+                for i, attribute in enumerate(self.attributes):
+                    value = run.get(attribute)
+                    if value is not None:
+                        values[t, i, idx, columns] = value
+        return seeds, values
+
+    def _strict_wins(self, oriented, axis):
+        """Return where a value is the unique smallest along *axis*."""
+        best = np.nanmin(oriented, axis=axis, keepdims=True)
+        is_best = oriented == best
+        return is_best & (is_best.sum(axis=axis, keepdims=True) == 1)
+
+    def _aggregate(self, algorithms):
+        seeds, values = self._get_tensor(algorithms)
+        tasks, attributes, k, num_seeds = values.shape
+        results = []
+        for i, attribute in enumerate(self.attributes):
+            sign = 1 if getattr(attribute, "min_wins", True) is not False else -1
+            attribute_values = values[:, i]
+            if str(attribute) == "coverage":
+                attribute_values = np.nan_to_num(attribute_values)
+            else:
+                common = ~np.isnan(attribute_values).any(axis=1)
+                attribute_values = np.where(common[:, np.newaxis, :], attribute_values, np.nan)
+            # (algorithms x seeds)
+            totals = np.nansum(attribute_values, axis=0)
+            with np.errstate(invalid="ignore"):
+                # (tasks x algorithms x seeds), tasks without values win nothing
+                oriented = np.where(np.isnan(attribute_values), np.inf, sign * attribute_values)
+                task_wins = self._strict_wins(oriented, 1) & np.isfinite(oriented)
+                seed_wins = self._strict_wins(sign * totals, 0)
+            mean = totals.mean(axis=1)
+            if num_seeds > 1:
+                ci = t_quantile(num_seeds - 1, self.confidence) * totals.std(axis=1, ddof=1) / np.sqrt(num_seeds)
+            else:
+                ci = np.full(k, np.nan)
+            results.append({
+                "attribute": attribute,
+                "mean": mean,
+                "ci": ci,
+                "seed_wins": seed_wins.sum(axis=1),
+                "task_wins": task_wins.sum(axis=0).mean(axis=1),
+            })
+        return seeds, tasks, results
+
+    def _format_ci(self, value, pattern):
+        return "" if np.isnan(value) else pattern.format(value)
+
+    def _format_tex(self, algorithms, seeds, tasks, results):
+        escape = lambda name: name.replace("_", r"{\_}")
+        lines = [r"\begin{center}\begin{tabular}{@{}l" + "|rrr" * len(results) + "@{}}"]
+        line = [""] + [r"\multicolumn{3}{c}{\textbf{%s}}" % escape(str(result["attribute"])) for result in results]
+        lines.append(" & ".join(line) + r"\\")
+        line = [r"\textbf{algorithm}"] + [r"\textbf{mean}", r"\textbf{seeds}", r"\textbf{tasks}"] * len(results)
+        lines.append(" & ".join(line) + r"\\")
+        lines.append(r"\midrule")
+        for idx, algorithm in enumerate(algorithms):
+            line = [escape(algorithm)]
+            for result in results:
+                ci = self._format_ci(result["ci"][idx], r" $\pm$ {:.2f}")
+                line += ["{:.2f}{}".format(result["mean"][idx], ci), str(int(result["seed_wins"][idx])),
+                    "{:.1f}".format(result["task_wins"][idx])]
+            lines.append(" & ".join(line) + r"\\")
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        lines.append(r"{} seeds, {} tasks, {:g}\% confidence intervals".format(
+            len(seeds), tasks, 100 * self.confidence))
+        return "\n".join(lines)
+
+    def _format_txt(self, algorithms, seeds, tasks, results):
+        lines = ["attribute,algorithm,mean,ci,seed_wins,mean_task_wins,seeds,tasks"]
+        for result in results:
+            for idx, algorithm in enumerate(algorithms):
+                lines.append(",".join([str(result["attribute"]), algorithm, "{:.6g}".format(result["mean"][idx]),
+                    self._format_ci(result["ci"][idx], "{:.6g}"), str(int(result["seed_wins"][idx])),
+                    "{:.4f}".format(result["task_wins"][idx]), str(len(seeds)), str(tasks)]))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or self._default_algorithms()
+        with self.phase("aggregate"):
+            seeds, tasks, results = self._aggregate(algorithms)
+        if tasks == 0:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        return getattr(self, "_format_" + self.output_format)(algorithms, seeds, tasks, results)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Replication of algorithms over random seeds (see
+CEGARExperiment.add_seeded_algorithm): naming of the seeded algorithms,
+aggregation of their runs and the stopping rule that decides which
+tasks need further seeds.
+
+Seeded runs have the properties "seed" and "replicated_algorithm" (the
+name without seed).
+"""
+from __future__ import division
+
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+
+SEED_FILE = "seed-runs.json"
+SEPARATOR = "-seed"
+# two-sided 95% quantiles of Student's t distribution for 1..30 degrees of freedom
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+RANDOM_SEED = re.compile(r"random_seed=-?\d+")
+
+
+def seeded_name(name, seed):
+    return "{}{}{}".format(name, SEPARATOR, seed)
+
+
+def seed_options(options, seed):
+    """
+    Return *options* with "{seed}" replaced by *seed*, or with every
+    random_seed=... option set to it if there is no "{seed}".
+    """
+    if any("{seed}" in option for option in options):
+        return [option.replace("{seed}", str(seed)) for option in options]
+    if not any(RANDOM_SEED.search(option) for option in options):
+        raise ValueError("options contain neither {seed} nor random_seed: {}".format(options))
+    return [RANDOM_SEED.sub("random_seed={}".format(seed), option) for option in options]
+
+
+def t_quantile(df, confidence=0.95):
+    """Two-sided quantile of Student's t distribution, vectorized over *df*."""
+    df = np.asarray(df)
+    if confidence == 0.95:
+        table = np.array(T_95)
+        return np.where(df > len(table), 1.96, table[np.clip(df, 1, len(table)) - 1])
+    try:
+        from scipy.stats import t
+    except ImportError:
+        raise ValueError("confidence {} needs scipy".format(confidence))
+    return t.ppf(0.5 + confidence / 2, np.maximum(df, 1))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def aggregate_seeds(props, confidence=0.95):
+    """
+    Merge the runs of all seeds of an algorithm on a task into one run
+    of the replicated algorithm. Numeric attributes become the mean over
+    the seeds that have a value, with the half-width of its confidence
+    interval in "<attribute>_ci"; other attributes are taken from the
+    run with the smallest seed. "seeds" counts the merged runs.
+    Coverage thus becomes the fraction of seeds that solved the task.
+    """
+    seeded = [run for run in props.values() if run.get("seed") is not None]
+    if not seeded:
+        return props
+    result = {run_id: run for run_id, run in props.items() if run.get("seed") is None}
+    keys, index = [], {}
+    groups = np.empty(len(seeded), dtype=np.int64)
+    for i, run in enumerate(seeded):
+        key = (run["replicated_algorithm"], run["domain"], run["problem"])
+        if key not in index:
+            index[key] = len(keys)
+            keys.append(key)
+        groups[i] = index[key]
+    # the run with the smallest seed provides the other attributes
+    order = sorted(range(len(seeded)), key=lambda i: (groups[i], seeded[i]["seed"]))
+    merged = [None] * len(keys)
+    for i in order:
+        if merged[groups[i]] is None:
+            merged[groups[i]] = dict(seeded[i])
+    attributes, non_numeric = set(), set(["seed"])
+    for run in seeded:
+        for attribute, value in run.items():
+            attributes.add(attribute)
+            if value is not None and not _is_number(value):
+                non_numeric.add(attribute)
+    num_groups = len(keys)
+    counts = np.bincount(groups, minlength=num_groups)
+    for attribute in sorted(attributes - non_numeric):
+        values = np.array([run.get(attribute) for run in seeded], dtype=float)
+        present = ~np.isnan(values)
+        n = np.bincount(groups[present], minlength=num_groups)
+        sums = np.bincount(groups[present], weights=values[present], minlength=num_groups)
+        squares = np.bincount(groups[present], weights=values[present] ** 2, minlength=num_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / n
+            variances = np.maximum(squares - n * means ** 2, 0) / (n - 1)
+            ci = t_quantile(np.maximum(n - 1, 1), confidence) * np.sqrt(variances / n)
+        for g in np.flatnonzero(n):
+            merged[g][attribute] = means[g].item()
+            if n[g] > 1:
+                merged[g][attribute + "_ci"] = ci[g].item()
+    for (algorithm, domain, problem), run, count in zip(keys, merged, counts):
+        run["algorithm"] = algorithm
+        run["id"] = [algorithm, domain, problem]
+        run["seeds"] = int(count)
+        del run["seed"]
+        result["-".join(run["id"])] = run
+    return result
+
+
+def find_unstable_tasks(props, attribute, relative_ci=0.05, min_seeds=3, confidence=0.95):
+    """
+    Return a dict from (replicated algorithm, domain, problem) to the
+    seeds run so far for all tasks that need further seeds: fewer than
+    *min_seeds* seeds, solved by only some seeds, or a confidence
+    interval of the mean of *attribute* wider than *relative_ci* times
+    the mean.
+    """
+    seeds = defaultdict(list)
+    values = defaultdict(list)
+    for run in props.values():
+        if run.get("seed") is None:
+            continue
+        key = (run["replicated_algorithm"], run["domain"], run["problem"])
+        seeds[key].append(run["seed"])
+        values[key].append(run.get(attribute))
+    unstable = {}
+    for key, samples in values.items():
+        present = np.array([value for value in samples if value is not None], dtype=float)
+        n = len(samples)
+        if n < min_seeds or 0 < len(present) < n:
+            unstable[key] = sorted(seeds[key])
+            continue
+        if len(present) < 2:
+            # unsolved by all seeds
+            continue
+        mean = present.mean()
+        ci = t_quantile(len(present) - 1, confidence) * present.std(ddof=1) / np.sqrt(len(present))
+        if ci > relative_ci * abs(mean):
+            unstable[key] = sorted(seeds[key])
+    return unstable
+
+
+def next_seed_runs(unstable, seeds, batch=1):
+    """
+    Return the run ids of the next *batch* seeds for every unstable task,
+    sorted. *seeds* maps replicated algorithms to the list of all their
+    seeds.
+    """
+    runs = []
+    for (algorithm, domain, problem), done in unstable.items():
+        remaining = [seed for seed in seeds.get(algorithm, []) if seed not in done]
+        for seed in remaining[:batch]:
+            runs.append([seeded_name(algorithm, seed), domain, problem])
+    return sorted(runs)
+
+
+def write_seed_runs(path, runs):
+    with open(path, "w") as f:
+        json.dump(runs, f, indent=2)
+    logging.info("Wrote {} runs of further seeds to {}".format(len(runs), path))
+
+
+def read_seed_runs(path):
+    if not os.path.exists(path):
+        logging.critical("No seed runs found at {}, run the seeds build step first".format(path))
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for list-valued attributes that describe a run over time, such
+as h_split_statistics. All series are resampled onto a common grid in
+one vectorized pass, so aggregating thousands of runs stays cheap.
+"""
+from __future__ import division
+
+import warnings
+
+import numpy as np
+
+
+def pack_series(series):
+    """
+    Concatenate a list of (x, y) array pairs with ascending x values.
+    Returns (x, y, offsets) where series i is x[offsets[i]:offsets[i+1]].
+    """
+    lengths = [len(x) for x, _ in series]
+    offsets = np.zeros(len(series) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if not series:
+        return np.zeros(0), np.zeros(0), offsets
+    x = np.concatenate([np.asarray(x, dtype=float) for x, _ in series])
+    y = np.concatenate([np.asarray(y, dtype=float) for _, y in series])
+    return x, y, offsets
+
+
+def normalize_progress(x, offsets):
+    """Map the x values of every packed series to [0, 1] by dividing by its last x."""
+    nonempty = offsets[1:] > offsets[:-1]
+    last = np.ones(len(offsets) - 1)
+    last[nonempty] = x[offsets[1:][nonempty] - 1]
+    last[last == 0] = 1
+    return x / np.repeat(last, np.diff(offsets))
+
+
+def resample(x, y, offsets, grid, hold_last=False):
+    """
+    Linearly interpolate every packed series at the points of *grid*.
+    Returns a (series x grid) matrix; points before the first or after
+    the last sample of a series are NaN, unless *hold_last* is set, in
+    which case the last value is carried forward.
+    """
+    grid = np.asarray(grid, dtype=float)
+    num_series = len(offsets) - 1
+    result = np.full((num_series, len(grid)), np.nan)
+    if num_series == 0 or len(x) == 0:
+        return result
+    # shift every series into its own disjoint x range, so a single
+    # searchsorted on the concatenated data locates all grid points
+    span = max(x.max(), grid.max()) - min(x.min(), grid.min()) + 1
+    series_idx = np.repeat(np.arange(num_series), np.diff(offsets))
+    shifted = x + series_idx * span
+    queries = grid[np.newaxis, :] + (np.arange(num_series) * span)[:, np.newaxis]
+    right = np.searchsorted(shifted, queries, side="right")
+    start, end = offsets[:-1, np.newaxis], offsets[1:, np.newaxis]
+    left = np.clip(right - 1, start, np.maximum(end - 1, start))
+    right = np.clip(right, start, np.maximum(end - 1, start))
+    left, right = np.minimum(left, len(x) - 1), np.minimum(right, len(x) - 1)
+    dx = x[right] - x[left]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = np.where(dx > 0, (grid[np.newaxis, :] - x[left]) / dx, 0)
+    values = y[left] + np.clip(weight, 0, 1) * (y[right] - y[left])
+    # clipping already carries the last value forward beyond the end
+    last = x[np.maximum(end - 1, 0)]
+    outside = (grid[np.newaxis, :] < x[np.minimum(start, len(x) - 1)]) | (end == start)
+    if not hold_last:
+        outside |= grid[np.newaxis, :] > last
+    values[outside] = np.nan
+    return values
+
+
+def summarize(matrix, quantiles=(0.25, 0.5, 0.75)):
+    """
+    Return (count, mean, [quantile rows]) over the series (rows) of a
+    resampled matrix, ignoring NaN. Grid points without any value are NaN.
+    """
+    count = (~np.isnan(matrix)).sum(axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(matrix, axis=0) if matrix.shape[0] else np.full(matrix.shape[1], np.nan)
+        rows = [np.nanpercentile(matrix, 100 * q, axis=0) if matrix.shape[0]
+            else np.full(matrix.shape[1], np.nan) for q in quantiles]
+    return count, mean, rows
@@ -1,8 +1,47 @@
 #! /usr/bin/env python
 
+import bisect
+import re
+
 from lab.parser import Parser
 
+# keep the properties small for many refinement steps
+MAX_POINTS = 1000
+SECONDS = r"([\d.]+(?:e[+-]?\d+)?)s"
+SPLIT_TIME = re.compile(r"^.*Time for picking split: " + SECONDS, re.M)
+BUILD_TIME = re.compile(r"^.*Time for building abstraction: " + SECONDS, re.M)
+ABSTRACTION_DONE = re.compile(r"^.*Done building abstraction.*$", re.M)
+
+def bucket(values):
+	# sum consecutive entries so the total stays exact
+	size = -(-len(values) // MAX_POINTS)
+	return [sum(values[i:i + size]) for i in range(0, len(values), size)], size
+
+def split_time(content, props):
+	ends = [match.end() for match in ABSTRACTION_DONE.finditer(content)]
+	# the steps logged while building each abstraction (the last one may
+	# be unfinished) and the summary that follows when it is done
+	steps = [[] for _ in range(len(ends) + 1)]
+	totals = {}
+	for match in SPLIT_TIME.finditer(content):
+		abstraction = bisect.bisect_right(ends, match.start())
+		if abstraction > 0 and abstraction - 1 not in totals:
+			totals[abstraction - 1] = float(match.group(1))
+		else:
+			steps[abstraction].append(float(match.group(1)))
+	build_times = [float(match.group(1)) for match in BUILD_TIME.finditer(content)]
+	if build_times:
+		props["abstraction_build_time"] = sum(build_times)
+	all_steps = [step for abstraction_steps in steps for step in abstraction_steps]
+	if all_steps:
+		props["split_time_steps"], props["split_time_step_size"] = bucket(all_steps)
+		props["split_steps"] = len(all_steps)
+	# the summary of every complete abstraction, else its logged steps
+	if totals or all_steps:
+		props["split_time"] = sum(totals.get(i, sum(abstraction_steps))
+			for i, abstraction_steps in enumerate(steps))
+
 print("Running split time parser")
 parser = Parser()
-parser.add_pattern("split_time", r"Time for picking split: (\d+)s", type=float)
+parser.add_function(split_time)
 parser.parse()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from merged_data import algorithm_key
+
+class SplitTimeReport(CustomReport, PlanningReport):
+    """
+    Splits the abstraction build time of every algorithm into the time
+    for picking splits and the rest of the refinement.
+
+    Times are summed over the runs reporting both split_time and
+    abstraction_build_time. To show whether a strategy pays for its
+    overhead, the report also sums *time_attribute* over the tasks
+    solved by all algorithms and compares it to the *baseline*. For
+    algorithms run with several seeds, a task only counts as solved if
+    all seeds solved it (see seeds.aggregate_seeds).
+    """
+    def __init__(self, algorithms=None, time_attribute="total_time", baseline="random", **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        kwargs["attributes"] = ["split_time", "abstraction_build_time", "split_steps", time_attribute]
+        super(SplitTimeReport, self).__init__(**kwargs)
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms] if algorithms else None
+        self.time_attribute = time_attribute
+        self.baseline = algorithm_key(baseline) if baseline else None
+
+    def _collect(self, algorithms):
+        """
+        Return per-algorithm arrays of (split time, build time, steps)
+        and a (tasks x algorithms) matrix of times on commonly solved tasks.
+        """
+        alg_idx = {alg: i for i, alg in enumerate(algorithms)}
+        timings = defaultdict(list)
+        times = defaultdict(lambda: np.full(len(algorithms), np.nan))
+        for run in self.props.values():
+            idx = alg_idx.get(run["algorithm"])
+            if idx is None:
+                continue
+            split, build = run.get("split_time"), run.get("abstraction_build_time")
+            if split is not None and build is not None:
+                timings[run["algorithm"]].append((split, build, run.get("split_steps") or 0))
+            if run.get("coverage") == 1 and run.get(self.time_attribute) is not None:
+                times[(run["domain"], run["problem"])][idx] = run[self.time_attribute]
+        timings = {alg: np.array(values, dtype=float) for alg, values in timings.items()}
+        matrix = np.array(list(times.values())).reshape(len(times), len(algorithms))
+        return timings, matrix[~np.isnan(matrix).any(axis=1)]
+
+    def _summarize(self, algorithms):
+        timings, matrix = self._collect(algorithms)
+        totals = matrix.sum(axis=0)
+        base = None
+        if self.baseline in algorithms:
+            base = totals[algorithms.index(self.baseline)]
+        rows = []
+        for i, algorithm in enumerate(algorithms):
+            values = timings.get(algorithm)
+            if values is None:
+                continue
+            split, build, steps = values.sum(axis=0)
+            # only runs that logged their refinement steps
+            stepped = values[values[:, 2] > 0]
+            rows.append({
+                "algorithm": algorithm,
+                "runs": len(values),
+                "build": build,
+                "split": split,
+                "rest": build - split,
+                "share": split / build if build > 0 else np.nan,
+                "step": stepped[:, 0].sum() / steps if steps > 0 else np.nan,
+                "time": totals[i] if len(matrix) else np.nan,
+                "relative": totals[i] / base if base else np.nan,
+            })
+        return rows, len(matrix)
+
+    def _format_number(self, value, pattern="{:.2f}"):
+        return "" if np.isnan(value) else pattern.format(value)
+
+    def _format_tex(self, rows, common):
+        escape = lambda name: name.replace("_", r"{\_}")
+        lines = [r"\begin{center}\begin{tabular}{@{}l|rrrrrrr@{}}",
+            r"\textbf{algorithm} & \textbf{build [s]} & \textbf{split [s]} & \textbf{rest [s]} & "
+            r"\textbf{split share} & \textbf{per step [ms]} & \textbf{%s (%d) [s]} & \textbf{vs. %s}\\" % (
+                escape(self.time_attribute), common, escape(self.baseline or "-")),
+            r"\midrule"]
+        for row in rows:
+            lines.append(" & ".join([escape(row["algorithm"])] +
+                [self._format_number(row[name]) for name in ["build", "split", "rest"]] +
+                [self._format_number(100 * row["share"], "{:.1f}\\%"),
+                self._format_number(1000 * row["step"], "{:.3f}"),
+                self._format_number(row["time"]), self._format_number(row["relative"])]) + r"\\")
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        return "\n".join(lines)
+
+    def _format_txt(self, rows, common):
+        lines = ["algorithm,runs,build_time,split_time,rest_time,split_share,time_per_step,common_tasks,time,relative_time"]
+        for row in rows:
+            lines.append(",".join([row["algorithm"], str(row["runs"])] +
+                [self._format_number(row[name], "{:.6f}") for name in ["build", "split", "rest", "share", "step"]] +
+                [str(common), self._format_number(row["time"], "{:.6f}"), self._format_number(row["relative"], "{:.6f}")]))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        algorithms = self.algorithm_names or list(self.algorithms)
+        with self.phase("aggregate"):
+            rows, common = self._summarize(algorithms)
+        if not rows:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        return getattr(self, "_format_" + self.output_format)(rows, common)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+from collections import defaultdict
+
+import numpy as np
+
+from downward.reports import PlanningReport
+
+from custom_report import CustomReport
+from domain_groups import make_group_key
+from merged_data import algorithm_key
+
+FEATURES = ["translator_operators", "translator_variables", "translator_facts"]
+
+class StrategySelectorReport(CustomReport, PlanningReport):
+    """
+    Trains a k-nearest-neighbour strategy selector on task features and
+    evaluates it by leave-one-group-out cross-validation.
+
+    Features are log-scaled and standardized on the training folds. For
+    a test task, the selector picks the strategy with the lowest mean
+    log-ratio to the per-task best value of *attribute* among its *k*
+    nearest training tasks. The table compares the summed attribute
+    value of the selected strategies with the *baseline* algorithm (or a
+    uniformly random pick if it isn't part of the comparison), the best
+    single strategy of the training folds and the oracle.
+    """
+    def __init__(self, algorithms, attribute="expansions_until_last_jump", features=FEATURES,
+            k=5, baseline="random", group_by=None, **kwargs):
+        if "format" not in kwargs:
+            kwargs["format"] = "tex"
+        elif kwargs["format"] not in ["tex", "txt"]:
+            raise ValueError("unsupported format: {}".format(kwargs["format"]))
+        kwargs["attributes"] = [attribute]
+        super(StrategySelectorReport, self).__init__(**kwargs)
+        if len(algorithms) < 2:
+            raise ValueError("Selector needs at least two algorithms")
+        if k < 1:
+            raise ValueError("Selector needs at least one neighbour")
+        self.algorithm_names = [algorithm_key(alg) for alg in algorithms]
+        self.attribute = attribute
+        self.features = list(features)
+        self.k = k
+        self.baseline = algorithm_key(baseline) if baseline else None
+        self.group_key = make_group_key(group_by)
+
+    def _get_data(self):
+        """
+        Return (groups, features, values) for all tasks with all features
+        and a value of the attribute for every algorithm.
+        """
+        alg_idx = {alg: i for i, alg in enumerate(self.algorithm_names)}
+        values = defaultdict(lambda: [None] * len(self.algorithm_names))
+        features = {}
+        for run in self.props.values():
+            idx = alg_idx.get(run["algorithm"])
+            if idx is None:
+                continue
+            key = self.group_key(run)
+            values[key][idx] = run.get(self.attribute)
+            if key not in features and all(run.get(f) is not None for f in self.features):
+                features[key] = [run[f] for f in self.features]
+        keys = sorted(key for key, row in values.items()
+            if key in features and all(v is not None for v in row))
+        groups = np.array([group for group, _ in keys])
+        X = np.log1p(np.array([features[key] for key in keys], dtype=float)).reshape(len(keys), -1)
+        Y = np.array([values[key] for key in keys], dtype=float).reshape(len(keys), -1)
+        return groups, X, Y
+
+    def _select(self, X_train, R_train, X_test):
+        """Return the index of the selected algorithm for each test task."""
+        mean, std = X_train.mean(axis=0), X_train.std(axis=0)
+        std[std == 0] = 1
+        X_train, X_test = (X_train - mean) / std, (X_test - mean) / std
+        distances = ((X_test[:, np.newaxis, :] - X_train[np.newaxis, :, :]) ** 2).sum(axis=2)
+        k = min(self.k, X_train.shape[0])
+        neighbours = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        return R_train[neighbours].mean(axis=1).argmin(axis=1)
+
+    def _evaluate(self, groups, X, Y):
+        """
+        Return a dict from group names (and "Total") to the summed
+        values of the selector, baseline, best single strategy and
+        oracle, the number of tasks and the selector accuracy.
+        """
+        # log-ratio to the per-task best, +1 keeps zero expansions finite
+        R = np.log((Y + 1) / (Y.min(axis=1, keepdims=True) + 1))
+        selected = np.empty(len(groups), dtype=int)
+        single = np.empty(len(groups), dtype=int)
+        for group in set(groups):
+            test = groups == group
+            if test.all():
+                # a single group leaves nothing to train on
+                selected[test] = single[test] = R.mean(axis=0).argmin()
+                continue
+            selected[test] = self._select(X[~test], R[~test], X[test])
+            single[test] = R[~test].mean(axis=0).argmin()
+        rows = np.arange(len(groups))
+        if self.baseline in self.algorithm_names:
+            baseline = Y[:, self.algorithm_names.index(self.baseline)]
+        else:
+            baseline = Y.mean(axis=1)
+        columns = {
+            "selector": Y[rows, selected],
+            "baseline": baseline,
+            "single": Y[rows, single],
+            "oracle": Y.min(axis=1),
+            "hits": (R[rows, selected] == 0).astype(float),
+        }
+        results = {}
+        for group in sorted(set(groups)) + ["Total"]:
+            mask = groups == group if group != "Total" else np.ones(len(groups), dtype=bool)
+            result = {name: column[mask].sum() for name, column in columns.items()}
+            result["count"] = int(mask.sum())
+            results[group] = result
+        return results
+
+    def _savings(self, result):
+        if result["baseline"] == 0:
+            return 0.0
+        return 1 - result["selector"] / result["baseline"]
+
+    def _format_tex(self, results):
+        header = ["", r"\textbf{selector}", r"\textbf{%s}" % (self.baseline or "uniform").replace("_", r"{\_}"),
+            r"\textbf{best single}", r"\textbf{oracle}", r"\textbf{saved}", r"\textbf{hit rate}"]
+        lines = [r"\begin{center}\begin{tabular}{@{}l|cccccc@{}}", " & ".join(header) + r"\\", r"\midrule"]
+        for group, result in sorted(results.items(), key=lambda item: item[0] == "Total"):
+            if group == "Total":
+                lines.append(r"\midrule")
+            line = ["{} ({})".format(group, result["count"])]
+            line += ["{:.0f}".format(result[name]) for name in ["selector", "baseline", "single", "oracle"]]
+            line.append("{:.1f}\\%".format(100 * self._savings(result)))
+            line.append("{:.2f}".format(result["hits"] / result["count"]))
+            lines.append(" & ".join(line) + r"\\")
+        lines[-1] = lines[-1][:-2]
+        lines.append(r"\end{tabular}\end{center}")
+        return "\n".join(lines)
+
+    def _format_txt(self, results):
+        lines = ["group,count,selector,baseline,single,oracle,saved,hit_rate"]
+        for group, result in sorted(results.items(), key=lambda item: item[0] == "Total"):
+            lines.append(",".join([group, str(result["count"])] +
+                ["{:.0f}".format(result[name]) for name in ["selector", "baseline", "single", "oracle"]] +
+                ["{:.4f}".format(self._savings(result)), "{:.4f}".format(result["hits"] / result["count"])]))
+        return "\n".join(lines)
+
+    def get_text(self):
+        return self.get_markup()
+
+    def get_markup(self):
+        with self.phase("aggregate"):
+            groups, X, Y = self._get_data()
+        if len(groups) == 0:
+            return r"\textbf{NO DATA}" if self.output_format == "tex" else ""
+        with self.phase("cross-validate"):
+            results = self._evaluate(groups, X, Y)
+        return getattr(self, "_format_" + self.output_format)(results)